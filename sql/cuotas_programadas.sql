@@ -0,0 +1,13 @@
+-- cronograma completo (una fila por cuota, pagadas o no) para el aging FIFO de src/cobranzas/aging.py;
+-- cuentas_por_cobrar.sql agrega y filtra pendientes, con eso no se puede asignar pagos por vencimiento
+select
+  c.nombres_cliente as cliente,
+  u.codigo_proforma as unidad,
+  case when u.tipo = 'estacionamiento' then 'EST' else 'DEP' end as tipo_item,
+  p.id as id_cuota,
+  p.monto_programado,
+  p.fecha_vcto,
+  p.estado
+from grupocygnus.pagos p
+join grupocygnus.unidades u on u.id = p.unidad_id
+join grupocygnus.clientes c on c.id = p.cliente_id;
@@ -196,5 +196,5 @@ LEFT JOIN p
   ON p.codigo_proforma = fb.codigo_proforma
 WHERE fb.fecha_minuta >= DATE '2022-01-01'
   AND fb.estado = 'Activo'
-  AND fb.proyecto = 'Edificio Urbanzen'
+  AND pr.nombre = 'Edificio Urbanzen'
 ORDER BY fb.fecha_minuta ASC;
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+# prorrata: en proporción al precio_item, con tope en el saldo de cada item (lo que no entra por el tope
+# se reparte en orden entre los items con saldo libre)
+# departamento_primero / prioridad: en cascada por tipo_item (orden fijo / orden dado), FIFO dentro del tipo
+POLICIES = ("prorrata", "departamento_primero", "prioridad")
+DEPARTAMENTO_PRIMERO = ("departamento", "estacionamiento", "deposito")
+
+def _cents(s: pd.Series) -> np.ndarray:
+    return pd.to_numeric(s, errors="coerce").fillna(0).to_numpy(dtype=np.int64)
+
+def allocate_proforma_payments(items: pd.DataFrame, pagado_proforma: pd.Series, policy: str = "prorrata",
+                               priority: list[str] | tuple[str, ...] | None = None) -> np.ndarray:
+    """Reparte lo pagado a nivel proforma entre sus items; devuelve céntimos por fila de `items`.
+
+    items: codigo_proforma, tipo_item, precio_item y pagado_directo (pagos propios del item), en céntimos.
+    pagado_proforma: céntimos por codigo_proforma (index). Cada item recibe a lo más su saldo
+    (precio - pagado directo); lo que sobra queda sin asignar (excedente de la proforma).
+
+    Todo por grupos ordenados + cumsum: en cascada, item = clip(P - (C - saldo), 0, saldo); a prorrata,
+    con W = precio acumulado, item = floor(P·W/T) - floor(P·(W - precio)/T), que suma exacto P sin residuos
+    de redondeo; lo que pasa del saldo (items con pagos propios) vuelve a repartirse en cascada.
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"Política de asignación no soportada: {policy!r} (usa {', '.join(POLICIES)})")
+    n = len(items)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    codes, uniques = pd.factorize(items["codigo_proforma"], use_na_sentinel=False)
+    precio = np.clip(_cents(items["precio_item"]), 0, None)
+    saldo = np.clip(precio - _cents(items["pagado_directo"]), 0, None)
+    pagado = pd.Series(pagado_proforma).groupby(level=0).first()
+    p = np.clip(pagado.reindex(uniques).fillna(0).to_numpy(dtype=np.int64), 0, None)
+
+    if policy == "prorrata":
+        order = np.lexsort((np.arange(n), codes))
+    else:
+        orden = list(priority or DEPARTAMENTO_PRIMERO) if policy == "prioridad" else list(DEPARTAMENTO_PRIMERO)
+        tipo = items["tipo_item"].astype("string").str.strip().str.lower()
+        rank = tipo.map({t: i for i, t in enumerate(orden)}).fillna(len(orden)).to_numpy(dtype=np.int64)
+        order = np.lexsort((np.arange(n), rank, codes))
+
+    g = codes[order]
+    s = saldo[order]
+    starts = np.flatnonzero(np.r_[True, g[1:] != g[:-1]])
+    sizes = np.diff(np.r_[starts, n])
+
+    def group_cumsum(v: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        # acumulado dentro de cada proforma y total de la proforma en cada fila
+        cs = np.cumsum(v)
+        cum = cs - np.repeat(cs[starts] - v[starts], sizes)
+        return cum, np.repeat(cum[starts + sizes - 1], sizes)
+
+    cum, total = group_cumsum(s)
+    pay = np.minimum(p[g], total)
+
+    if policy == "prorrata":
+        # enteros: P y W en céntimos de una proforma (< 1e9 c/u) -> el producto entra en int64
+        w = precio[order]
+        wcum, wtotal = group_cumsum(w)
+        den = np.where(wtotal > 0, wtotal, 1)
+        alloc = np.where(wtotal > 0, pay * wcum // den - pay * (wcum - w) // den, 0)
+        alloc = np.minimum(alloc, s)
+        # lo recortado por el tope (y todo P si los precios suman 0) entra en cascada en el saldo libre;
+        # pay <= suma de saldos, así que siempre cabe
+        resto = pay - np.repeat(np.add.reduceat(alloc, starts), sizes)
+        libre = s - alloc
+        lcum, _ = group_cumsum(libre)
+        alloc = alloc + np.clip(resto - (lcum - libre), 0, libre)
+    else:
+        alloc = np.clip(pay - (cum - s), 0, s)
+
+    out = np.empty(n, dtype=np.int64)
+    out[order] = alloc
+    return out
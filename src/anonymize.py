@@ -1,5 +1,11 @@
 from __future__ import annotations
 import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
 
 def stable_hash(value: str, salt: str) -> str:
     raw = f"{salt}|{value}".encode("utf-8")
@@ -12,3 +18,89 @@ def anon_client(nombres: str, apellidos: str, documento: str | None, salt: str)
 
 def anon_unit(codigo_proforma: str, salt: str) -> str:
     return stable_hash(str(codigo_proforma), salt)
+
+# --- batch: hashea solo las claves únicas y mapea de vuelta por posición ---
+
+# debajo de esto el costo de levantar procesos supera al de hashear
+POOL_MIN_KEYS = 200_000
+
+def _as_str(values) -> pd.Series:
+    # mismo resultado que str(x) por elemento (NaN -> "nan", None -> "None"), sin loop python
+    arr = np.asarray(values, dtype=object)
+    return pd.Series(arr.astype(str), dtype=object)
+
+def client_keys(nombres, apellidos, documentos) -> pd.Series:
+    """Clave de anon_client por fila: documento si no está vacío, sino "nombres apellidos"."""
+    doc = pd.Series(np.asarray(documentos, dtype=object))
+    doc_str = _as_str(doc).str.strip()
+    nombre = (_as_str(nombres) + " " + _as_str(apellidos)).str.strip()
+    use_doc = doc.notna().to_numpy() & (doc_str != "").to_numpy()
+    return pd.Series(np.where(use_doc, doc_str.to_numpy(), nombre.to_numpy()), dtype=object)
+
+def _hash_chunk(keys: list[str], salt: str) -> list[str]:
+    return [stable_hash(k, salt) for k in keys]
+
+def _hash_unique(keys: np.ndarray, salt: str, workers: int | None) -> np.ndarray:
+    n = len(keys)
+    if n >= POOL_MIN_KEYS and workers != 1:
+        size = max(1, -(-n // ((workers or 4) * 4)))
+        chunks = [keys[i:i + size].tolist() for i in range(0, n, size)]
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            out = [h for part in ex.map(_hash_chunk, chunks, repeat(salt)) for h in part]
+    else:
+        out = _hash_chunk(keys.tolist(), salt)
+    return np.asarray(out, dtype=object)
+
+class HashCache:
+    """Cache persistente clave -> hash, un archivo por salt (el nombre usa un digest del salt, nunca el salt).
+
+    Ojo: guarda las claves en claro (documento / nombre); mantenerlo fuera de artifacts/.
+    """
+
+    def __init__(self, cache_dir: Path, salt: str):
+        tag = hashlib.sha256(salt.encode("utf-8")).hexdigest()[:12]
+        self.path = cache_dir / f"anon_cache_{tag}.parquet"
+        self._map = pd.Series(dtype=object)
+        if self.path.exists():
+            t = pd.read_parquet(self.path)
+            self._map = pd.Series(t["hash"].to_numpy(dtype=object), index=t["key"].to_numpy(dtype=object))
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, keys: np.ndarray) -> np.ndarray:
+        found = pd.Series(keys, dtype=object).map(self._map).to_numpy(dtype=object)
+        n_miss = int(pd.isna(found).sum())
+        self.hits += len(keys) - n_miss
+        self.misses += n_miss
+        return found
+
+    def add(self, keys: np.ndarray, hashes: np.ndarray) -> None:
+        if len(keys):
+            self._map = pd.concat([self._map, pd.Series(hashes, index=keys, dtype=object)])
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        pd.DataFrame({"key": self._map.index.to_numpy(dtype=object), "hash": self._map.to_numpy(dtype=object)}) \
+          .to_parquet(self.path, index=False)
+
+def hash_batch(keys, salt: str, cache: HashCache | None = None, workers: int | None = None) -> np.ndarray:
+    """stable_hash para cada clave, calculando una sola vez por clave distinta."""
+    codes, uniques = pd.factorize(_as_str(keys))
+    uniques = np.array(uniques, dtype=object)  # copia: factorize puede devolver vistas de solo lectura
+    if cache is not None:
+        hashed = np.array(cache.lookup(uniques), dtype=object)
+        miss = pd.isna(hashed)
+        if miss.any():
+            hashed[miss] = _hash_unique(uniques[miss], salt, workers)
+            cache.add(uniques[miss], hashed[miss])
+    else:
+        hashed = _hash_unique(uniques, salt, workers)
+    return hashed[codes]
+
+def anon_clients_batch(nombres, apellidos, documentos, salt: str,
+                       cache: HashCache | None = None, workers: int | None = None) -> np.ndarray:
+    return hash_batch(client_keys(nombres, apellidos, documentos), salt, cache, workers)
+
+def anon_units_batch(codigos, salt: str, cache: HashCache | None = None, workers: int | None = None) -> np.ndarray:
+    # mismo paso previo que el flujo fila a fila: Series.astype(str) y luego anon_unit
+    return hash_batch(pd.Series(codigos).astype(str), salt, cache, workers)
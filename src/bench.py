@@ -0,0 +1,270 @@
+from __future__ import annotations
+import argparse
+import itertools
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from . import cashflow, engine_duckdb, risk
+from .changes import detect_changes
+from .cobranzas.aging import aging_summary, allocate_fifo
+from .cobranzas.render import render_reports
+from .cobranzas.schema import apply_schema
+from .cobranzas.transform import compute_cobranzas
+from .perf import StagePerf
+from .rollup import build_cube
+from .pipeline import (ENGINES, _agg_pagos_item, _agg_pagos_proforma, _transform_pandas, build_summary,
+                       transform_cobranzas)
+from .snapshots import SnapshotStore
+from .stages import ts
+from .synth import make_cuotas, make_dataset, parse_rows
+from .validate import validate_frames
+
+DEFAULT_SCALES = "1k,10k,100k"
+_RUNS = itertools.count()
+
+def _rows(obj) -> int | None:
+    return int(len(obj)) if isinstance(obj, pd.DataFrame) else None
+
+def _previous_day(df: pd.DataFrame, seed: int) -> pd.DataFrame:
+    # "ayer": 1% de proformas que no existían y 5% con menos pagado -> cambios realistas para el diff
+    rng = np.random.default_rng(seed + 2)
+    prev = df.loc[rng.random(len(df)) > 0.01].copy()
+    menos = rng.random(len(prev)) < 0.05
+    prev.loc[menos, "total_pagado"] = prev.loc[menos, "total_pagado"] // 2
+    prev["deuda_pendiente"] = (prev["precio_total_venta"] - prev["total_pagado"]).clip(lower=0)
+    return prev
+
+def _cases(ventas: pd.DataFrame, pagos: pd.DataFrame, work: Path, seed: int,
+           engines: tuple[str, ...] = ("pandas",)) -> list[tuple[str, int, callable]]:
+    # (etapa, filas de entrada, fn); las que dependen de otras usan resultados ya calculados
+    df = transform_cobranzas(ventas, pagos, work)
+    prev = _previous_day(df, seed)
+    changes = detect_changes(df, prev)
+    cube = build_cube(df)
+    cuotas = make_cuotas(ventas, seed)
+    _, xpagos = _xcobrar(ventas, pagos)
+
+    def snapshot():
+        root = Path(tempfile.mkdtemp(dir=work))
+        store = SnapshotStore(root, checkpoint_every=30)
+        store.write(prev, "2025-12-30")
+        return store.write(df, "2025-12-31")
+
+    transforms = [("transform_cobranzas" + ("" if e == "pandas" else f"_{e}"), len(ventas) + len(pagos),
+                   lambda e=e: transform_cobranzas(ventas, pagos, work, engine=e))
+                  for e in engines]
+    return [
+        # todas las reglas sin muestreo (el peor caso); debe quedar muy por debajo de transform_cobranzas
+        ("validate", len(ventas) + len(pagos), lambda: validate_frames(ventas, pagos, hoy="2025-12-31")),
+        ("agg_pagos_proforma", len(pagos), lambda: _agg_pagos_proforma(pagos)),
+        ("agg_pagos_item", len(pagos), lambda: _agg_pagos_item(pagos)),
+        *transforms,
+        ("detect_changes", len(df) + len(prev), lambda: detect_changes(df, prev)),
+        ("build_cube", len(df), lambda: build_cube(df).aggs),
+        ("build_summary", len(df), lambda: build_summary(df, work, changes, cube)),
+        # reportes por asesor / proyecto desde cero (sin manifest: mide render + escritura, no el skip)
+        ("render_reports", len(df), lambda: render_reports(df, work / f"reports_{next(_RUNS)}")),
+        ("risk_scores", len(df), lambda: risk.score(df, hoy="2025-12-31")),
+        # 200 escenarios × 26 semanas: el costo crece lineal con proformas × escenarios × semanas
+        ("cashflow_forecast", len(df) + len(pagos),
+         lambda: cashflow.simulate(cashflow.estimate_timing(df, pagos, hoy="2025-12-31"), 200, 26)[1]),
+        ("snapshot_write", 2 * len(df), snapshot),
+        # fecha fija: el tramo de cada cuota no depende del día en que corre el bench
+        ("aging_fifo", len(cuotas) + len(xpagos),
+         lambda: aging_summary(allocate_fifo(cuotas, xpagos, hoy="2025-12-31"), xpagos)),
+    ]
+
+def measure(name: str, rows_in: int, fn, repeat: int = 3, memory: bool = True) -> dict:
+    """Mejor de `repeat` corridas (wall/cpu) + una corrida aparte con tracemalloc para el pico de memoria."""
+    best = None
+    for _ in range(repeat):
+        perf = StagePerf(name, rows_in=rows_in)
+        out = fn()
+        m = perf.stop(rows_out=_rows(out))
+        if best is None or m["wall_s"] < best["wall_s"]:
+            best = m
+    if memory:
+        # corrida separada: tracemalloc distorsiona el tiempo
+        tracemalloc.start()
+        try:
+            fn()
+            best["py_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+        finally:
+            tracemalloc.stop()
+    # high-water del proceso: en corridas repetidas no dice nada por etapa
+    best.pop("process_peak_rss_mb", None)
+    best.pop("rss_growth_mb", None)
+    return {"stage": name, **best}
+
+def run_bench(scales: list[int], seed: int = 0, repeat: int = 3, memory: bool = True,
+              engines: tuple[str, ...] = ("pandas",)) -> list[dict]:
+    results = []
+    for rows in scales:
+        ventas, pagos = make_dataset(rows, seed)
+        with tempfile.TemporaryDirectory() as tmp:
+            for name, rows_in, fn in _cases(ventas, pagos, Path(tmp), seed, engines):
+                r = measure(name, rows_in, fn, repeat, memory)
+                results.append({"scale": rows, "ventas": len(ventas), "pagos": len(pagos), **r})
+                print(f"{rows:>10,} {name:<28} {r['wall_s']:>9.4f}s  cpu {r['cpu_s']:>8.4f}s"
+                      f"  {r.get('py_peak_mb') or '':>8} MB")
+    return results
+
+def _xcobrar(ventas: pd.DataFrame, pagos: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    # entradas de cobranzas.transform.compute_cobranzas derivadas del dataset sintético
+    keys = ventas[["codigo_proforma", "cliente", "unidad"]]
+    xcobrar = ventas[["cliente", "unidad", "precio_total_venta"]].rename(columns={"precio_total_venta": "total_por_cobrar"})
+    p = pagos.merge(keys, on="codigo_proforma", how="left").rename(columns={"monto_pagado": "monto"})
+    return xcobrar, p[["cliente", "unidad", "monto", "fecha_pago"]]
+
+def check_parity(scales: list[int], seed: int = 0) -> list[dict]:
+    """Compara engine pandas vs duckdb sobre datos sintéticos; devuelve una entrada por frame distinto."""
+    out = []
+    for rows in scales:
+        ventas, pagos = make_dataset(rows, seed)
+        v, p = apply_schema(ventas), apply_schema(pagos)
+        xcobrar, xpagos = _xcobrar(ventas, pagos)
+        (df_a, items_a), (df_b, items_b) = _transform_pandas(v, p), engine_duckdb.transform_frames(v, p)
+        pairs = [
+            ("cobranzas_report", df_a, df_b),
+            ("cobranzas_items_report", items_a, items_b),
+            ("compute_cobranzas", compute_cobranzas(xcobrar, xpagos), compute_cobranzas(xcobrar, xpagos, engine="duckdb")),
+        ]
+        n_bad = len(out)
+        for name, left, right in pairs:
+            try:
+                if (left is None) != (right is None):
+                    raise AssertionError(f"pandas={left is None} duckdb={right is None} (None = sin items)")
+                if left is not None:
+                    pd.testing.assert_frame_equal(left, right)
+            except AssertionError as e:
+                out.append({"kind": "parity", "stage": name, "scale": rows, "detail": str(e).strip().splitlines()[0]})
+        print(f"{rows:>10,} paridad pandas/duckdb: {'OK' if len(out) == n_bad else 'DIFERENTE'}")
+    return out
+
+def check_regressions(results: list[dict], baseline: list[dict] | None, threshold: float,
+                      max_exponent: float, min_seconds: float) -> list[dict]:
+    """Regresiones vs baseline (wall > threshold × baseline) y crecimiento superlineal entre escalas."""
+    out = []
+    if baseline:
+        base = {(b["scale"], b["stage"]): b["wall_s"] for b in baseline}
+        for r in results:
+            b = base.get((r["scale"], r["stage"]))
+            if b is not None and r["wall_s"] > threshold * b and r["wall_s"] - b >= min_seconds:
+                out.append({"kind": "baseline", "stage": r["stage"], "scale": r["scale"],
+                            "wall_s": r["wall_s"], "baseline_s": b, "ratio": round(r["wall_s"] / b, 2)})
+
+    # exponente empírico t ~ n^k entre escalas consecutivas: ~1 lineal, ~2 cuadrático
+    by_stage: dict[str, list[dict]] = {}
+    for r in results:
+        by_stage.setdefault(r["stage"], []).append(r)
+    for stage, rs in by_stage.items():
+        rs = sorted(rs, key=lambda r: r["scale"])
+        for a, b in zip(rs, rs[1:]):
+            if b["wall_s"] < min_seconds or a["wall_s"] <= 0:
+                continue  # tiempos chicos = overhead fijo, el exponente no significa nada
+            k = math.log(b["wall_s"] / a["wall_s"]) / math.log(b["scale"] / a["scale"])
+            if k > max_exponent:
+                out.append({"kind": "scaling", "stage": stage, "scale": b["scale"], "from_scale": a["scale"],
+                            "exponent": round(k, 2)})
+    return out
+
+# arranque del CLI: estos comandos no deben importar dependencias pesadas (ver src/cobranzas/main.py)
+CLI_COMMANDS = {"help": ["--help"], "status": ["status", "--out", "{tmp}"]}
+HEAVY_MODULES = ("pandas", "numpy", "pyarrow", "duckdb", "psycopg2", "dotenv", "sklearn")
+
+def check_cli_startup(budget_ms: float = 100.0, repeat: int = 5) -> tuple[dict, list[dict]]:
+    """Tiempo de arranque de `python -m src.cobranzas <cmd>` (mejor de `repeat`, proceso nuevo) y módulos pesados
+    que importa (`-X importtime`). Regresión si pasa `budget_ms` o si importa alguno de HEAVY_MODULES."""
+    root = Path(__file__).resolve().parents[1]
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [str(root), os.environ.get("PYTHONPATH")]))}
+    results, out = {}, []
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, args in CLI_COMMANDS.items():
+            cmd = [sys.executable, "-m", "src.cobranzas", *(a.format(tmp=tmp) for a in args)]
+            best = math.inf
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                subprocess.run(cmd, cwd=root, env=env, check=True, capture_output=True)
+                best = min(best, time.perf_counter() - t0)
+            trace = subprocess.run([sys.executable, "-X", "importtime", *cmd[1:]], cwd=root, env=env, check=True,
+                                   capture_output=True, text=True).stderr
+            imported = {line.rsplit("|", 1)[-1].strip().split(".")[0] for line in trace.splitlines() if "|" in line}
+            heavy = sorted(m for m in HEAVY_MODULES if m in imported)
+            results[name] = {"wall_ms": round(best * 1000, 1), "heavy_imports": heavy}
+            if best * 1000 > budget_ms or heavy:
+                out.append({"kind": "cli_startup", "stage": f"cli {name}", "scale": 0,
+                            "wall_ms": results[name]["wall_ms"], "budget_ms": budget_ms, "heavy_imports": heavy})
+    return results, out
+
+def main(argv: list[str] | None = None, prog: str | None = None) -> int:
+    ap = argparse.ArgumentParser(prog=prog, description="Benchmark por etapa del pipeline de cobranzas sobre datos sintéticos")
+    ap.add_argument("--scales", default=DEFAULT_SCALES, help="filas de pagos por escala (ej. 1k,10k,100k,1M,10M)")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--no-memory", action="store_true", help="sin pasada de tracemalloc (escalas grandes)")
+    ap.add_argument("--out", default="artifacts/bench/bench_results.json")
+    ap.add_argument("--baseline", default=None, help="bench_results.json previo para comparar")
+    ap.add_argument("--threshold", type=float, default=1.25, help="falla si wall > threshold × baseline")
+    ap.add_argument("--max-exponent", type=float, default=1.5,
+                    help="falla si el tiempo crece más que n^k entre escalas (1 = lineal, 2 = cuadrático)")
+    ap.add_argument("--min-seconds", type=float, default=0.05,
+                    help="ignora diferencias/tiempos por debajo de esto (ruido)")
+    ap.add_argument("--engines", default="pandas", help=f"engines del transform a medir ({','.join(ENGINES)})")
+    ap.add_argument("--parity", action="store_true",
+                    help="verifica que pandas y duckdb den frames idénticos en cada escala (falla si no)")
+    ap.add_argument("--cli-budget-ms", type=float, default=100.0,
+                    help="falla si `python -m src.cobranzas --help` / `status` tarda más que esto en arrancar")
+    args = ap.parse_args(argv)
+
+    scales = sorted(parse_rows(s) for s in args.scales.split(","))
+    engines = tuple(e.strip() for e in args.engines.split(",") if e.strip())
+    bad = [e for e in engines if e not in ENGINES]
+    if bad:
+        ap.error(f"engines no soportados: {bad}")
+    started = ts()
+    results = run_bench(scales, args.seed, args.repeat, memory=not args.no_memory, engines=engines)
+
+    baseline = None
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))["results"]
+    regressions = check_regressions(results, baseline, args.threshold, args.max_exponent, args.min_seconds)
+    if args.parity:
+        regressions += check_parity(scales, args.seed)
+    cli_startup, cli_regressions = check_cli_startup(args.cli_budget_ms)
+    regressions += cli_regressions
+
+    payload = {
+        "started_at": started,
+        "finished_at": ts(),
+        "env": {"python": sys.version.split()[0], "pandas": pd.__version__, "numpy": np.__version__,
+                "platform": platform.platform()},
+        "config": {"scales": scales, "seed": args.seed, "repeat": args.repeat, "engines": list(engines),
+                   "parity": args.parity, "baseline": args.baseline,
+                   "threshold": args.threshold, "max_exponent": args.max_exponent, "min_seconds": args.min_seconds,
+                   "cli_budget_ms": args.cli_budget_ms},
+        "results": results,
+        "cli_startup": cli_startup,
+        "regressions": regressions,
+    }
+    out = Path(args.out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"OK: {out}")
+
+    for r in regressions:
+        print(f"REGRESIÓN [{r['kind']}] {r['stage']} @ {r['scale']:,}: {r}", file=sys.stderr)
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
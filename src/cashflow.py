@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from .cobranzas.schema import CENTS, as_cents, epoch_days
+
+KEY = "codigo_proforma"
+# semanas de "historia previa" con la tasa del proyecto: una proforma con pocos pagos se parece a su proyecto
+PRIOR_WEEKS = 8.0
+# semanas de atraso (más allá de 2 intervalos esperados) en que la tasa de pago cae a 1/e
+DORMANCY_WEEKS = 26.0
+# proformas por stream de números aleatorios: el resultado no depende del tamaño de chunk
+BLOCK = 64
+# bytes por celda proforma × escenario × semana: dos buffers float32 (uniformes / flujo y montos acumulados)
+# + temporales por bloque; el doble de lo justo para dejar margen
+BYTES_PER_CELL = 16
+PERCENTILES = (10, 50, 90)
+
+def estimate_timing(report: pd.DataFrame, pagos: pd.DataFrame, hoy=None) -> pd.DataFrame:
+    """Por proforma con deuda: prob. de pagar en una semana (q_semanal), monto medio por pago y deuda (soles).
+
+    Tasa de pagos = pagos / semanas observadas (desde el primer pago o la separación / minuta), encogida hacia la
+    del proyecto y atenuada si el cliente lleva más de dos intervalos sin pagar. `attrs["sigma"]`: dispersión
+    (log) de los montos alrededor de la media de cada proforma.
+    """
+    hoy = np.datetime64(pd.Timestamp(hoy if hoy is not None else pd.Timestamp.today()).date(), "D").astype("int64")
+    keys = pd.Index(report[KEY])
+    n = len(keys)
+    deuda = as_cents(report["deuda_pendiente"]).fillna(0).to_numpy(dtype=float) / CENTS
+
+    # historia de pagos alineada al reporte (todas las filas de la proforma, con o sin item)
+    idx = keys.get_indexer(pagos[KEY]) if len(pagos) else np.empty(0, dtype=np.intp)
+    monto = as_cents(pagos["monto_pagado"]).to_numpy(dtype=float, na_value=np.nan) / CENTS if len(pagos) else np.empty(0)
+    dia = epoch_days(pagos["fecha_pago"]) if len(pagos) else np.empty(0)
+    ok = (idx >= 0) & (monto > 0) & ~np.isnan(dia) & (dia <= hoy)
+    idx, monto, dia = idx[ok], monto[ok], dia[ok]
+    n_pagos = np.bincount(idx, minlength=n).astype(float)
+    suma = np.bincount(idx, weights=monto, minlength=n)
+    primero = np.full(n, np.inf)
+    np.minimum.at(primero, idx, dia)
+    ultimo = np.full(n, -np.inf)
+    np.maximum.at(ultimo, idx, dia)
+    medio = np.divide(suma, n_pagos, out=np.zeros(n), where=n_pagos > 0)
+    resid = np.log(monto) - np.log(medio[idx])
+    sigma = float(np.clip(resid.std(), 0.05, 1.5)) if len(resid) > 1 else 0.5
+
+    # inicio de la observación: primer pago o separación / minuta, lo que sea antes
+    inicio = primero.copy()
+    for col in ("fecha_separacion", "fecha_minuta"):
+        if col in report.columns:
+            inicio = np.fmin(inicio, epoch_days(report[col]))
+    semanas = np.maximum(1.0, np.where(np.isfinite(inicio), (hoy - inicio) / 7, 1.0))
+
+    proyecto = report["proyecto"] if "proyecto" in report.columns else pd.Series("", index=report.index)
+    codes, proyectos = pd.factorize(proyecto.astype(object).fillna("(sin proyecto)"))
+    tasa_proy = np.bincount(codes, weights=n_pagos) / np.maximum(np.bincount(codes, weights=semanas), 1.0)
+    tasa = (n_pagos + PRIOR_WEEKS * tasa_proy[codes]) / (semanas + PRIOR_WEEKS)
+    # atraso: semanas sin pagar más allá de dos intervalos esperados
+    gap = np.where(np.isfinite(ultimo), (hoy - ultimo) / 7, semanas)
+    atraso = np.maximum(0.0, gap - 2.0 / np.maximum(tasa, 1e-9))
+    tasa = tasa * np.exp(-atraso / DORMANCY_WEEKS)
+
+    # sin historia: mediana de montos medios del proyecto (o de toda la cartera)
+    con = n_pagos > 0
+    global_ = float(np.median(medio[con])) if con.any() else 0.0
+    med_proy = pd.Series(medio[con]).groupby(codes[con]).median().reindex(range(len(proyectos))).fillna(global_)
+    medio = np.where(con, medio, med_proy.to_numpy()[codes])
+
+    out = pd.DataFrame({
+        KEY: report[KEY].to_numpy(),
+        "proyecto": np.asarray(proyectos, dtype=object)[codes],
+        "deuda": deuda,
+        "n_pagos": n_pagos.astype(int),
+        "pagos_por_semana": tasa,
+        "q_semanal": -np.expm1(-tasa),
+        "monto_medio": np.minimum(medio, deuda),
+    })
+    out = out[(out["deuda"] > 0) & (out["q_semanal"] > 0) & (out["monto_medio"] > 0)].reset_index(drop=True)
+    out.attrs["sigma"] = sigma
+    return out
+
+def chunk_rows(scenarios: int, weeks: int, memory_mb: float) -> int:
+    """Proformas por chunk (múltiplo de BLOCK) para que un chunk entre en `memory_mb`."""
+    per_row = scenarios * weeks * BYTES_PER_CELL
+    return max(BLOCK, int(memory_mb * 2**20 // per_row) // BLOCK * BLOCK)
+
+def simulate(timing: pd.DataFrame, scenarios: int = 1000, weeks: int = 26, memory_mb: float = 512,
+             seed: int = 0) -> tuple[list[str], np.ndarray, dict]:
+    """Cobros semanales simulados por proyecto: (proyectos, array proyecto × escenario × semana en soles, info).
+
+    Cada escenario sortea por proforma y semana si paga (q_semanal) y cuánto (lognormal alrededor de monto_medio),
+    y corta el acumulado en la deuda. Se simula en chunks de proformas (proformas × escenarios × semanas en float32)
+    que entran en `memory_mb`; cada bloque de BLOCK proformas usa su propio stream aleatorio (seed, bloque).
+    """
+    timing = timing.sort_values("proyecto", kind="stable").reset_index(drop=True)
+    codes, proyectos = pd.factorize(timing["proyecto"])
+    acc = np.zeros((len(proyectos), scenarios, weeks))
+    q = timing["q_semanal"].to_numpy(dtype=np.float32)
+    mu = timing["monto_medio"].to_numpy(dtype=np.float32)
+    deuda = timing["deuda"].to_numpy(dtype=np.float32)
+    sigma = np.float32(timing.attrs.get("sigma", 0.5))
+    rows = chunk_rows(scenarios, weeks, memory_mb)
+    shape = (min(rows, len(timing)), scenarios, weeks)
+    # buffers reusados entre chunks
+    u = np.empty(shape, dtype=np.float32)
+    amt = np.empty(shape, dtype=np.float32)
+    for start in range(0, len(timing), rows):
+        stop = min(start + rows, len(timing))
+        b = stop - start
+        U, A = u[:b], amt[:b]
+        A.fill(0)
+        for blk in range(start, stop, BLOCK):
+            sl = slice(blk - start, min(blk + BLOCK, stop) - start)
+            rng = np.random.default_rng([seed, blk // BLOCK])
+            rng.random(dtype=np.float32, out=U[sl])
+            pay = U[sl] < q[blk:blk + BLOCK, None, None]
+            # los True salen en orden C (proforma por proforma): el monto medio se repite por conteo
+            mu_pay = np.repeat(mu[blk:blk + BLOCK], pay.reshape(len(pay), -1).sum(axis=1))
+            z = rng.standard_normal(len(mu_pay), dtype=np.float32)
+            np.place(A[sl], pay, mu_pay * np.exp(sigma * z - sigma * sigma / 2))
+        np.cumsum(A, axis=2, out=A)
+        np.minimum(A, deuda[start:stop, None, None], out=A)
+        # flujo semanal = diferencia del acumulado (en U, que ya no se usa)
+        U[:, :, 0] = A[:, :, 0]
+        np.subtract(A[:, :, 1:], A[:, :, :-1], out=U[:, :, 1:])
+        # proformas ordenadas por proyecto: cada proyecto es un tramo contiguo del chunk
+        c = codes[start:stop]
+        bounds = np.flatnonzero(np.r_[True, c[1:] != c[:-1], True])
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            acc[c[lo]] += U[lo:hi].sum(axis=0, dtype=np.float64)
+    info = {"proformas": int(len(timing)), "chunk_rows": int(min(rows, len(timing))),
+            "chunks": int(-(-len(timing) // rows)), "chunk_mb": round(shape[0] * scenarios * weeks * BYTES_PER_CELL / 2**20, 1),
+            "sigma": float(sigma)}
+    return [str(p) for p in proyectos], acc, info
+
+def summarize(proyectos: list[str], acc: np.ndarray, hoy=None) -> pd.DataFrame:
+    """Por proyecto (+ TOTAL) y semana: cobro esperado y bandas P10/P50/P90 sobre escenarios, en céntimos."""
+    hoy = pd.Timestamp(hoy if hoy is not None else pd.Timestamp.today()).normalize()
+    weeks = acc.shape[2]
+    # el total se suma escenario a escenario (los percentiles no se suman)
+    groups = np.concatenate([acc, acc.sum(axis=0, keepdims=True)]) if len(proyectos) else acc
+    names = [*proyectos, "TOTAL"] if len(proyectos) else []
+    pct = np.percentile(groups, PERCENTILES, axis=1) if len(names) else np.empty((len(PERCENTILES), 0, weeks))
+    def cents(a: np.ndarray) -> pd.Series:
+        return pd.Series(np.round(a.reshape(-1) * CENTS)).astype("Int64")
+    return pd.DataFrame({
+        "proyecto": np.repeat(names, weeks),
+        "semana": np.tile(np.arange(1, weeks + 1), len(names)),
+        "semana_inicio": np.tile(hoy + pd.to_timedelta(7 * np.arange(weeks), unit="D"), len(names)),
+        "cobro_esperado": cents(groups.mean(axis=1)),
+        **{f"cobro_p{p}": cents(pct[i]) for i, p in enumerate(PERCENTILES)},
+    })
+
+def horizon_totals(proyectos: list[str], acc: np.ndarray) -> dict:
+    """Cobro total del horizonte por proyecto (+ TOTAL): esperado y P10/P50/P90 en soles."""
+    tot = acc.sum(axis=2)
+    tot = np.concatenate([tot, tot.sum(axis=0, keepdims=True)]) if len(proyectos) else tot
+    names = [*proyectos, "TOTAL"] if len(proyectos) else []
+    pct = np.percentile(tot, PERCENTILES, axis=1) if len(names) else None
+    return {name: {"esperado": round(float(tot[i].mean()), 2),
+                   **{f"p{p}": round(float(pct[j, i]), 2) for j, p in enumerate(PERCENTILES)}}
+            for i, name in enumerate(names)}
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from .cobranzas.schema import CENTS, as_cents
+
+KEY = "codigo_proforma"
+DIMS = ["proyecto", "cliente", "asesor"]
+VALUES = ["precio_total_venta", "total_pagado", "n_pagos", "deuda_pendiente", "prioridad"]
+
+# orden = precedencia para `tipo_cambio` cuando una proforma cae en varias categorías
+CHANGE_TYPES = ["nueva_venta", "proforma_desaparecida", "nuevo_pago", "cambio_prioridad", "cambio_deuda"]
+
+def _side(df: pd.DataFrame, dims: list[str]) -> pd.DataFrame:
+    # `dims`: las de cualquiera de los dos lados; la que falta (snapshot anterior a la columna) va nula
+    cols = [c for c in [KEY, *dims, *VALUES] if c in df.columns]
+    out = df[cols].drop_duplicates(KEY, keep="last")
+    missing = [c for c in dims if c not in out.columns]
+    if missing:
+        out = out.assign(**dict.fromkeys(missing))
+    if "prioridad" in out.columns:
+        out = out.assign(prioridad=out["prioridad"].astype("string"))
+    return out
+
+def detect_changes(today: pd.DataFrame, prev: pd.DataFrame, tol: float = 0.005) -> pd.DataFrame:
+    """Cambios por proforma entre el reporte de hoy y un snapshot anterior (hash join por codigo_proforma).
+
+    Montos en céntimos (snapshots en soles float se convierten); `tol` va en soles.
+    """
+    dims = [c for c in DIMS if c in today.columns or c in prev.columns]
+    m = _side(today, dims).merge(_side(prev, dims), on=KEY, how="outer", suffixes=("", "_prev"), indicator=True)
+    nuevo = (m["_merge"] == "left_only").to_numpy()
+    baja = (m["_merge"] == "right_only").to_numpy()
+    ambos = ~(nuevo | baja)
+
+    def num(col: str) -> np.ndarray:
+        if col not in m.columns:
+            return np.zeros(len(m))
+        return pd.to_numeric(m[col], errors="coerce").fillna(0.0).to_numpy(dtype=float)
+
+    def txt(col: str) -> np.ndarray:
+        if col not in m.columns:
+            return np.full(len(m), "", dtype=object)
+        return m[col].astype(object).fillna("").to_numpy(dtype=object)
+
+    def cents(col: str) -> np.ndarray:
+        if col not in m.columns:
+            return np.zeros(len(m), dtype=np.int64)
+        return as_cents(m[col]).fillna(0).to_numpy(dtype=np.int64)
+
+    tol = tol * CENTS
+    d_deuda = cents("deuda_pendiente") - cents("deuda_pendiente_prev")
+    d_pagado = cents("total_pagado") - cents("total_pagado_prev")
+    d_npagos = num("n_pagos") - num("n_pagos_prev")
+    pri = txt("prioridad")
+    pri_prev = txt("prioridad_prev")
+
+    flags = {
+        "nueva_venta": nuevo,
+        "proforma_desaparecida": baja,
+        "nuevo_pago": ambos & ((d_npagos > 0) | (d_pagado > tol)),
+        "cambio_prioridad": ambos & (pri != pri_prev),
+        "cambio_deuda": ambos & (np.abs(d_deuda) > tol),
+    }
+    any_change = np.logical_or.reduce(list(flags.values()))
+
+    out = pd.DataFrame({KEY: m[KEY].to_numpy()})
+    for c in dims:
+        # las desaparecidas solo tienen datos del snapshot anterior
+        out[c] = m[c].astype(object).combine_first(m[f"{c}_prev"].astype(object)).to_numpy()
+    out["tipo_cambio"] = np.select([flags[t] for t in CHANGE_TYPES], CHANGE_TYPES, default="")
+    for t in CHANGE_TYPES:
+        out[t] = flags[t]
+    out["deuda_prev"] = cents("deuda_pendiente_prev")
+    out["deuda_hoy"] = cents("deuda_pendiente")
+    out["delta_deuda"] = d_deuda
+    out["pagado_prev"] = cents("total_pagado_prev")
+    out["pagado_hoy"] = cents("total_pagado")
+    out["delta_pagado"] = d_pagado
+    out["prioridad_prev"] = pri_prev
+    out["prioridad"] = pri
+    money = ["deuda_prev", "deuda_hoy", "delta_deuda", "pagado_prev", "pagado_hoy", "delta_pagado"]
+    out[money] = out[money].astype("Int64")
+
+    out = out.loc[any_change]
+    order = np.argsort(-np.abs(out["delta_deuda"].to_numpy()), kind="stable")
+    return out.iloc[order].reset_index(drop=True)
+
+def summarize_changes(changes: pd.DataFrame) -> dict:
+    return {
+        "proformas_con_cambios": int(len(changes)),
+        **{f"n_{t}": int(changes[t].sum()) for t in CHANGE_TYPES},
+        "delta_deuda_total": int(changes["delta_deuda"].sum()) / CENTS if len(changes) else 0.0,
+        "pagos_recibidos": int(changes["delta_pagado"].clip(lower=0).sum()) / CENTS if len(changes) else 0.0,
+    }
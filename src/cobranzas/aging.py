@@ -0,0 +1,148 @@
+from __future__ import annotations
+import numpy as np
+import pandas as pd
+
+from .schema import as_cents, parse_dates
+
+KEY = ["cliente", "unidad"]
+# tramo de cada cuota: cancelada, por vencer (o sin fecha) y días de atraso del saldo vencido
+TRAMOS = ("cancelada", "por_vencer", "0-30", "31-60", "61-90", "90+")
+# saldo por tramo en aging_summary
+TRAMO_COLUMNS = {"por_vencer": "por_vencer", "0-30": "vencido_0_30", "31-60": "vencido_31_60",
+                 "61-90": "vencido_61_90", "90+": "vencido_90_mas"}
+_NO_DATE = np.iinfo(np.int64).max
+
+def _key_codes(cuotas: pd.DataFrame, pagos: pd.DataFrame, key: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    # códigos de grupo compartidos entre cuotas y pagos (misma clave -> mismo código)
+    both = pd.concat([cuotas[key], pagos[key]], ignore_index=True)
+    codes = both.groupby(key, sort=False, dropna=False).ngroup().to_numpy(dtype=np.int64)
+    return codes[:len(cuotas)], codes[len(cuotas):]
+
+def _groups(codes: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # inicio y tamaño de cada grupo en un array ordenado por código
+    if len(codes) == 0:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    return starts, np.diff(np.r_[starts, len(codes)])
+
+def _group_cumsum(values: np.ndarray, starts: np.ndarray, sizes: np.ndarray) -> np.ndarray:
+    # cumsum global menos lo acumulado antes de cada grupo
+    cs = np.cumsum(values)
+    return cs - np.repeat(cs[starts] - values[starts], sizes)
+
+def _days(s: pd.Series) -> np.ndarray:
+    # fecha como día entero; NaT -> _NO_DATE (al final del orden FIFO)
+    d, _ = parse_dates(s)
+    return np.where(np.isnat(d), _NO_DATE, d.astype(np.int64))
+
+def allocate_fifo(cuotas: pd.DataFrame, pagos: pd.DataFrame, hoy=None, key: list[str] | None = None,
+                  monto_col: str = "monto") -> pd.DataFrame:
+    """Asigna los pagos de cada `key` a sus cuotas en orden de vencimiento (FIFO), sin loops.
+
+    cuotas: key + monto_programado + fecha_vcto (el cronograma completo, pagadas o no).
+    pagos: key + `monto_col` (+ fecha_pago para la fecha de cancelación de cada cuota).
+
+    Con S = pagado total de la clave y C = programado acumulado hasta la cuota, lo asignado a la
+    cuota es clip(S - (C - monto), 0, monto). La cuota se cancela con el primer pago cuyo acumulado
+    llega a C (searchsorted sobre el acumulado de pagos). Devuelve las cuotas en orden FIFO con
+    `pagado_cuota`/`saldo_cuota` (céntimos Int64), `fecha_cancelacion`, `dias_vencido` y `tramo`.
+    """
+    key = key or KEY
+    hoy = pd.Timestamp(hoy if hoy is not None else pd.Timestamp.today()).normalize()
+    hoy_d = np.datetime64(hoy.date(), "D").astype(np.int64)
+    c_codes, p_codes = _key_codes(cuotas, pagos, key)
+
+    # cuotas por (clave, vencimiento, orden original) y programado acumulado por clave
+    vcto = _days(cuotas["fecha_vcto"])
+    c_order = np.lexsort((np.arange(len(cuotas)), vcto, c_codes))
+    codes = c_codes[c_order]
+    monto = as_cents(cuotas["monto_programado"]).fillna(0).to_numpy(dtype=np.int64)[c_order]
+    vcto = vcto[c_order]
+    c_starts, c_sizes = _groups(codes)
+    cum_end = _group_cumsum(monto, c_starts, c_sizes)
+
+    # pagos por (clave, fecha) y pagado acumulado por clave
+    fpago = _days(pagos["fecha_pago"]) if "fecha_pago" in pagos.columns else np.zeros(len(pagos), dtype=np.int64)
+    p_order = np.lexsort((np.arange(len(pagos)), fpago, p_codes))
+    p_codes, fpago = p_codes[p_order], fpago[p_order]
+    p_starts, p_sizes = _groups(p_codes)
+    cum_pay = _group_cumsum(as_cents(pagos[monto_col]).fillna(0).to_numpy(dtype=np.int64)[p_order],
+                            p_starts, p_sizes)
+
+    n_codes = int(max(c_codes.max(initial=-1), p_codes.max(initial=-1))) + 1
+    total = np.zeros(n_codes, dtype=np.int64)
+    total[p_codes[p_starts + p_sizes - 1]] = cum_pay[p_starts + p_sizes - 1]
+    asignado = np.clip(total[codes] - (cum_end - monto), 0, monto)
+    saldo = monto - asignado
+
+    # fecha de cancelación: una sola búsqueda de (código, C) sobre (código, acumulado pagado); el código va
+    # en la parte alta de la clave y el acumulado se hace monótono (devoluciones = montos negativos)
+    cancel = np.full(len(codes), _NO_DATE, dtype=np.int64)
+    if len(p_codes):
+        scale = int(max(cum_end.max(initial=0), cum_pay.max())) + 1
+        if n_codes * scale >= 2**62:
+            raise ValueError("Montos acumulados demasiado grandes para la clave compuesta del searchsorted.")
+        p_key = np.maximum.accumulate(p_codes * scale + np.maximum(cum_pay, 0))
+        pos = np.minimum(np.searchsorted(p_key, codes * scale + cum_end, side="left"), len(p_codes) - 1)
+        ok = (saldo == 0) & (monto > 0) & (p_codes[pos] == codes) & (p_key[pos] >= codes * scale + cum_end)
+        cancel[ok] = fpago[pos[ok]]
+
+    sin_fecha = vcto == _NO_DATE
+    dias = np.where((saldo > 0) & ~sin_fecha, hoy_d - vcto, 0).clip(min=0)
+    tramo = np.select([saldo == 0, dias == 0, dias <= 30, dias <= 60, dias <= 90], [0, 1, 2, 3, 4], default=5)
+
+    out = cuotas.iloc[c_order].reset_index(drop=True)
+    out["monto_programado"] = pd.array(monto, dtype="Int64")
+    out["orden_cuota"] = np.arange(len(out)) - np.repeat(c_starts, c_sizes) + 1
+    out["pagado_cuota"] = pd.array(asignado, dtype="Int64")
+    out["saldo_cuota"] = pd.array(saldo, dtype="Int64")
+    out["fecha_cancelacion"] = pd.to_datetime(np.where(cancel == _NO_DATE, np.datetime64("NaT", "D"),
+                                                       cancel.astype("datetime64[D]")))
+    out["dias_vencido"] = dias.astype(np.int64)
+    out["tramo"] = pd.Categorical.from_codes(tramo, categories=list(TRAMOS))
+    return out
+
+def _group_starts(frame: pd.DataFrame, key: list[str]) -> np.ndarray:
+    # inicio de cada clave en un frame ya agrupado (contiguo), sin volver a hashear las claves
+    n = len(frame)
+    change = np.zeros(max(n - 1, 0), dtype=bool)
+    for k in key:
+        a = frame[k].to_numpy(dtype=object)
+        na = pd.isna(a)
+        change |= (a[1:] != a[:-1]) & ~(na[1:] & na[:-1])
+    return np.flatnonzero(np.r_[n > 0, change])
+
+def aging_summary(alloc: pd.DataFrame, pagos: pd.DataFrame | None = None, key: list[str] | None = None,
+                  monto_col: str = "monto") -> pd.DataFrame:
+    """Aging por clave: programado, pagado, saldo por tramo, saldo vencido, días de mora y excedente.
+
+    `alloc` es la salida de allocate_fifo (cuotas contiguas por clave): las sumas van con reduceat.
+    """
+    key = key or KEY
+    starts = _group_starts(alloc, key)
+    saldo = alloc["saldo_cuota"].to_numpy(dtype=np.int64)
+    dias = alloc["dias_vencido"].to_numpy(dtype=np.int64)
+    vencida = dias > 0
+    tramo = alloc["tramo"].to_numpy()
+    cols = {
+        "total_programado": alloc["monto_programado"].to_numpy(dtype=np.int64),
+        "total_asignado": alloc["pagado_cuota"].to_numpy(dtype=np.int64),
+        "saldo_cuotas": saldo,
+        "saldo_vencido": np.where(vencida, saldo, 0),
+        "cuotas_vencidas": vencida.astype(np.int64),
+        **{col: np.where(tramo == t, saldo, 0) for t, col in TRAMO_COLUMNS.items()},
+    }
+    out = alloc.iloc[starts][key].reset_index(drop=True)
+    for c, v in cols.items():
+        out[c] = np.add.reduceat(v, starts) if len(starts) else v[:0]
+    out["dias_mora"] = np.maximum.reduceat(dias, starts) if len(starts) else dias[:0]
+    if pagos is not None:
+        # pagado por encima del cronograma (adelantos sin cuota, saldo a favor)
+        pag = (pagos[key].assign(_pagado=as_cents(pagos[monto_col]).fillna(0))
+               .groupby(key, dropna=False, observed=True, as_index=False)["_pagado"].sum())
+        pagado = out[key].merge(pag, on=key, how="left")["_pagado"].to_numpy(dtype="float64", na_value=0)
+        out["excedente"] = np.clip(pagado - out["total_asignado"].to_numpy(dtype="float64"), 0, None).round()
+    for c in ["total_programado", "total_asignado", "saldo_cuotas", "saldo_vencido", *TRAMO_COLUMNS.values(),
+              *(["excedente"] if pagos is not None else [])]:
+        out[c] = out[c].astype("Int64")
+    return out
@@ -0,0 +1,115 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+SHEET = "pagos"
+EXCEL_SUFFIXES = (".xlsx", ".xlsm", ".xls")
+# subir si cambia la normalización de read_pagos_excel (invalida el cache)
+CACHE_VERSION = 1
+
+def read_pagos_excel(path: Path, sheet: str = SHEET) -> pd.DataFrame:
+    pagos = pd.read_excel(path, sheet_name=sheet)
+    pagos.columns = [str(c).strip().lower() for c in pagos.columns]
+    # columnas object con tipos mezclados (ej. códigos numéricos y texto) no son serializables a parquet
+    for c in pagos.columns:
+        s = pagos[c]
+        if s.dtype == object and pd.api.types.infer_dtype(s, skipna=True) in ("mixed", "mixed-integer"):
+            pagos[c] = s.where(s.isna(), s.astype(str))
+    return pagos
+
+def list_payment_files(path: Path) -> list[Path]:
+    if path.is_dir():
+        # ~$*.xlsx = archivos de bloqueo de Excel abiertos
+        return sorted(p for p in path.iterdir()
+                      if p.suffix.lower() in EXCEL_SUFFIXES and not p.name.startswith("~$"))
+    return [path]
+
+def _sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def _parse_to_cache(path: str, cache_path: str) -> int:
+    # corre en el pool de procesos: parsea con openpyxl una vez y deja el parquet tipado
+    df = read_pagos_excel(Path(path))
+    # .tmp en la misma carpeta + os.replace: un parseo cortado no deja un parquet a medias con nombre de cache válido
+    dst = Path(cache_path)
+    tmp = dst.with_name(f".{dst.name}.{os.getpid()}.tmp")
+    try:
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, dst)
+    finally:
+        tmp.unlink(missing_ok=True)
+    return int(len(df))
+
+def _load_manifest(cache_dir: Path) -> dict:
+    p = cache_dir / "manifest.json"
+    if not p.exists():
+        return {}
+    return json.loads(p.read_text(encoding="utf-8"))
+
+def file_digests(files: list[Path], cache_dir: Path) -> list[list[str]]:
+    """[[nombre, sha256], ...] de los excels; usa el hash del manifest si size/mtime no cambiaron (no relee el archivo)."""
+    manifest = _load_manifest(cache_dir)
+    out = []
+    for f in files:
+        st = f.stat()
+        entry = manifest.get(str(f.resolve())) or {}
+        same = entry.get("mtime_ns") == st.st_mtime_ns and entry.get("size") == st.st_size
+        out.append([f.name, entry["sha256"] if same and entry.get("sha256") else _sha256(f)])
+    return out
+
+def load_pagos(path: Path, cache_dir: Path, workers: int | None = None) -> tuple[pd.DataFrame, list[dict]]:
+    """Lee pagos desde un Excel o una carpeta de Excels, re-parseando solo los archivos nuevos o modificados."""
+    files = list_payment_files(path)
+    if not files or not files[0].exists():
+        raise FileNotFoundError(f"No se encontró Excel de pagos en: {path}")
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    manifest = _load_manifest(cache_dir)
+    report: list[dict] = []
+    todo: list[tuple[str, str]] = []
+
+    for f in files:
+        st = f.stat()
+        key = str(f.resolve())
+        entry = manifest.get(key)
+        if (entry and entry["mtime_ns"] == st.st_mtime_ns and entry["size"] == st.st_size
+                and entry.get("version") == CACHE_VERSION and Path(entry["cache"]).exists()):
+            report.append({"file": f.name, "cache": "hit", "key": "mtime", "parquet": entry["cache"]})
+            continue
+        # mtime distinto: el hash del contenido decide (un "guardar" sin cambios no re-parsea)
+        digest = _sha256(f)
+        cache_path = cache_dir / f"{digest}.v{CACHE_VERSION}.parquet"
+        manifest[key] = {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "sha256": digest,
+                         "version": CACHE_VERSION, "cache": str(cache_path)}
+        if cache_path.exists():
+            report.append({"file": f.name, "cache": "hit", "key": "sha256", "parquet": str(cache_path)})
+        else:
+            report.append({"file": f.name, "cache": "miss", "key": "sha256", "parquet": str(cache_path)})
+            todo.append((str(f), str(cache_path)))
+
+    if len(todo) > 1 and workers != 1:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            list(ex.map(_parse_to_cache, *zip(*todo)))
+    else:
+        for src, dst in todo:
+            _parse_to_cache(src, dst)
+
+    tmp = cache_dir / f".manifest.json.{os.getpid()}.tmp"
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp, cache_dir / "manifest.json")
+
+    frames = [pd.read_parquet(r["parquet"]) for r in report]
+    for r, fr in zip(report, frames):
+        r["rows"] = int(len(fr))
+        del r["parquet"]
+    pagos = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+    return pagos, report
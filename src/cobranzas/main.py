@@ -0,0 +1,113 @@
+from __future__ import annotations
+import argparse
+import json
+import sys
+from pathlib import Path
+
+# solo stdlib a nivel módulo: pandas / psycopg2 / dotenv / duckdb se importan dentro del subcomando que
+# los usa, así `--help` y `status` arrancan en lo que tarda python (ver bench: check_cli_startup)
+
+# subcomandos que corren etapas del DAG del pipeline (resto de argumentos = los de src.pipeline)
+DAG_COMMANDS = {
+    "run": ("todo el pipeline (extract -> transform -> rollup/diff -> summary/render/risk/cashflow [-> snapshot])", None),
+    "extract": ("solo la extracción (Redshift + excels de pagos)", ["extract_ventas", "extract_pagos"]),
+    "validate": ("solo las reglas de calidad de ventas / pagos (stage_validate.json)", ["validate"]),
+    "transform": ("solo el transform (las extracciones se reusan del último run)", ["transform"]),
+    "summary": ("solo cobranzas_summary.md (el resto se reusa del último run)", ["summary"]),
+    "diff": ("solo el diff contra el último snapshot", ["diff"]),
+    "risk": ("solo el score de riesgo por proforma (artifacts/risk_scores/)", ["risk"]),
+    "cashflow": ("solo la proyección de cobros semanales por proyecto (P10/P50/P90)", ["cashflow"]),
+}
+# subcomandos que delegan en el main de otro módulo: (descripción, módulo)
+DELEGATED = {
+    "bench": ("benchmark por etapa sobre datos sintéticos (= python -m src.bench)", "..bench"),
+    "cuentas": ("cuentas por cobrar anonimizadas desde un csv (ANON_SALT)", "..pipeline:cuentas_main"),
+}
+
+def _dag_argv(command: str, rest: list[str]) -> list[str]:
+    only = DAG_COMMANDS[command][1]
+    if only is None or "--only" in rest or "--from-stage" in rest:
+        return rest
+    if command == "extract" and "--by-project" in rest:
+        # por proyecto la extracción de ventas va dentro de "projects"
+        only = ["projects", "extract_pagos"]
+    return [*rest, "--only", *only]
+
+def _delegate(target: str, argv: list[str], prog: str) -> int:
+    # prog: `python -m src.cobranzas <comando>` en el usage / --help del módulo destino
+    import importlib
+
+    module, _, func = target.partition(":")
+    rc = getattr(importlib.import_module(module, __package__), func or "main")(argv, prog=prog)
+    return int(rc or 0)
+
+def _read_json(path: Path) -> dict | None:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+def status(out_dir: Path) -> dict:
+    """Estado del último run desde los json de `out_dir` (sin pandas ni conexión a Redshift)."""
+    profile = _read_json(out_dir / "run_profile.json") or {}
+    state = _read_json(out_dir / "cache" / "dag_state.json") or {}
+    transform = _read_json(out_dir / "stage_transform_cobranzas.json") or {}
+    diff = _read_json(out_dir / "stage_diff_cobranzas.json") or {}
+    stages = {}
+    for name in dict.fromkeys([*profile.get("stages", {}), *state]):
+        run = profile.get("stages", {}).get(name, {})
+        stages[name] = {"status": run.get("status"), "wall_s": run.get("wall_s"),
+                        "finished_at": (state.get(name) or {}).get("finished_at")}
+    return {
+        "out": str(out_dir),
+        "last_run": {k: profile.get(k) for k in ("started_at", "finished_at", "wall_seconds", "error")},
+        "stages": stages,
+        "deuda_total": transform.get("deuda_total"),
+        "ventas": transform.get("rows_out"),
+        "ventas_con_deuda": transform.get("ventas_con_deuda"),
+        "previous_snapshot": diff.get("previous_snapshot"),
+    }
+
+def _print_status(s: dict) -> None:
+    run = s["last_run"]
+    if not run.get("started_at") and not s["stages"] and s["deuda_total"] is None:
+        print(f"Sin runs en {s['out']}")
+        return
+    if run.get("started_at"):
+        print(f"Último run: {run['started_at']} -> {run.get('finished_at')} ({run.get('wall_seconds')} s)"
+              + (f"  ERROR: {run['error']}" if run.get("error") else ""))
+    for name, st in s["stages"].items():
+        wall = f"{st['wall_s']:.2f}s" if st["wall_s"] is not None else "-"
+        print(f"  {name:<16} {st['status'] or '-':<10} {wall:>9}  {st['finished_at'] or ''}")
+    if s["deuda_total"] is not None:
+        print(f"Deuda pendiente: {s['deuda_total']:,.2f} en {s['ventas_con_deuda']:,} de {s['ventas']:,} ventas")
+    if s["previous_snapshot"]:
+        print(f"Cambios vs snapshot {s['previous_snapshot']}")
+
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(prog="python -m src.cobranzas", description="Cobranzas: pipeline diario y utilidades")
+    sub = ap.add_subparsers(dest="command", metavar="<comando>", required=True)
+    # los subcomandos que delegan no parsean nada: `<comando> --help` muestra las opciones del módulo destino
+    for name, (desc, _) in {**DAG_COMMANDS, **DELEGATED}.items():
+        sub.add_parser(name, help=desc, add_help=False)
+    st = sub.add_parser("status", help="estado del último run (etapas, deuda total) sin cargar datos")
+    st.add_argument("--out", default="artifacts")
+    st.add_argument("--json", action="store_true", help="imprime el estado como json")
+    return ap
+
+def main(argv: list[str] | None = None) -> int:
+    argv = sys.argv[1:] if argv is None else list(argv)
+    args, rest = build_parser().parse_known_args(argv)
+    if args.command == "status":
+        if rest:
+            build_parser().error(f"argumentos no reconocidos: {' '.join(rest)}")
+        s = status(Path(args.out))
+        if args.json:
+            print(json.dumps(s, ensure_ascii=False, indent=2))
+        else:
+            _print_status(s)
+        return 0
+    prog = f"python -m src.cobranzas {args.command}"
+    if args.command in DELEGATED:
+        return _delegate(DELEGATED[args.command][1], rest, prog)
+    return _delegate("..pipeline", _dag_argv(args.command, rest), prog)
@@ -0,0 +1,261 @@
+from __future__ import annotations
+import hashlib
+import html
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from ..partitions import project_slug
+from .schema import CENTS, as_cents, to_display
+
+FORMATS = ("md", "html")
+DIMS = ("asesor", "proyecto")
+# filas por bloque al escribir/hashear un reporte (las tablas grandes no se arman enteras en memoria)
+CHUNK_ROWS = 20_000
+MANIFEST = "_manifest.json"
+
+@dataclass(frozen=True)
+class Column:
+    name: str
+    header: str
+    kind: str = "text"  # text | money | pct | int | date
+
+# formateadores por tipo; mismos formatos que el resumen (montos 1,234.56 / avance 12.3%)
+_FORMATTERS = {
+    "text": str,
+    "money": "{:,.2f}".format,
+    "pct": lambda v: f"{v * 100:,.1f}%",
+    "int": lambda v: f"{int(v)}",
+}
+
+def _md_escape(s: str) -> str:
+    return s.replace("|", "\\|").replace("\n", " ")
+
+def format_column(s: pd.Series, kind: str, fmt: str = "md") -> np.ndarray:
+    """Celdas ya formateadas (y escapadas para `fmt`) de una columna, como array de str."""
+    if kind == "date":
+        d = pd.to_datetime(s, errors="coerce").to_numpy(dtype="datetime64[D]")
+        out = np.datetime_as_string(d).astype(object)
+        out[np.isnat(d)] = ""
+        return out
+    if kind == "text":
+        # dimensiones de pocos valores: se formatea y escapa cada valor distinto una vez
+        codes, uniques = pd.factorize(s.to_numpy(dtype=object, na_value=np.nan), use_na_sentinel=False)
+        escape = _md_escape if fmt == "md" else html.escape
+        return np.array([escape(str(v)) for v in uniques], dtype=object)[codes]
+    values = s.to_numpy(dtype="float64", na_value=np.nan)
+    return np.array(list(map(_FORMATTERS[kind], values)), dtype=object)
+
+class Table:
+    """Tabla compilada una vez (encabezado + separadores de celda por formato).
+
+    La fila queda compilada como un format string ("| {} | {} |" / "<tr><td>{}</td>..."): renderizar =
+    formatear cada columna completa (format_column) y un `map(row.format, *columnas)`, sin iterrows.
+    """
+
+    def __init__(self, columns: list[Column], fmt: str = "md"):
+        if fmt not in FORMATS:
+            raise ValueError(f"Formato no soportado: {fmt!r} (usa {', '.join(FORMATS)})")
+        self.columns = columns
+        self.fmt = fmt
+        if fmt == "md":
+            self.head = ["| " + " | ".join(c.header for c in columns) + " |",
+                         "|" + "|".join("---" if c.kind in ("text", "date") else "---:" for c in columns) + "|"]
+            seps = ["| ", *[" | "] * (len(columns) - 1), " |"]
+            self.foot: list[str] = []
+        else:
+            num = [c.kind not in ("text", "date") for c in columns]
+            td = ['<td class="num">' if n else "<td>" for n in num]
+            th = "".join(('<th class="num">' if n else "<th>") + f"{html.escape(c.header)}</th>"
+                         for c, n in zip(columns, num))
+            self.head = ["<table>", f"<thead><tr>{th}</tr></thead>", "<tbody>"]
+            seps = ["<tr>" + td[0], *[f"</td>{t}" for t in td[1:]], "</td></tr>"]
+            self.foot = ["</tbody>", "</table>"]
+        self.row = "{}".join(p.replace("{", "{{").replace("}", "}}") for p in seps)
+
+    def cells(self, df: pd.DataFrame, cache: dict | None = None) -> dict[str, np.ndarray]:
+        """Celdas por columna; `cache` las comparte entre tablas (los números no dependen del formato)."""
+        cache = {} if cache is None else cache
+        out = {}
+        for c in self.columns:
+            key = (c.name, c.kind, self.fmt if c.kind == "text" else None)
+            if key not in cache:
+                s = df[c.name] if c.name in df.columns else pd.Series("", index=df.index)
+                cache[key] = format_column(s, c.kind, self.fmt)
+            out[c.name] = cache[key]
+        return out
+
+    def rows(self, cells: dict[str, np.ndarray]) -> np.ndarray:
+        """Una línea por fila a partir de celdas ya formateadas (reusables entre tablas)."""
+        return np.array(list(map(self.row.format, *(cells[c.name] for c in self.columns))), dtype=object)
+
+    def lines(self, df: pd.DataFrame) -> list[str]:
+        return [*self.head, *(self.rows(self.cells(df)) if len(df) else []), *self.foot]
+
+# tablas de cobranzas_summary.md
+SUMMARY_TOP = Table([
+    Column("codigo_proforma", "Proforma"), Column("proyecto", "Proyecto"), Column("cliente", "Cliente"),
+    Column("asesor", "Asesor"), Column("deuda_pendiente", "Deuda", "money"), Column("total_pagado", "Pagado", "money"),
+    Column("precio_total_venta", "Total Venta", "money"), Column("avance_pct", "Avance", "pct"),
+    Column("tipo_compra", "Tipo compra"),
+])
+SUMMARY_PROJECTS = Table([
+    Column("proyecto", "Proyecto"), Column("deuda_pendiente", "Deuda", "money"), Column("ventas", "Ventas", "int"),
+    Column("con_deuda", "Con deuda", "int"),
+])
+
+# --- reportes por asesor / proyecto ---
+
+REPORT_COLUMNS = [
+    Column("codigo_proforma", "Proforma"),
+    Column("proyecto", "Proyecto"),
+    Column("asesor", "Asesor"),
+    Column("cliente", "Cliente"),
+    Column("documento_cliente", "Documento"),
+    Column("prioridad", "Prioridad"),
+    Column("deuda_pendiente", "Deuda", "money"),
+    Column("total_pagado", "Pagado", "money"),
+    Column("precio_total_venta", "Total Venta", "money"),
+    Column("avance_pct", "Avance", "pct"),
+    Column("fecha_ultimo_pago", "Último pago", "date"),
+    Column("tipo_compra", "Tipo compra"),
+]
+_SUMS = ["deuda_pendiente", "total_pagado", "precio_total_venta"]
+
+_HTML_HEAD = """<!doctype html>
+<html lang="es"><head><meta charset="utf-8"><title>{title}</title>
+<style>body{{font-family:sans-serif}}table{{border-collapse:collapse}}td,th{{border:1px solid #ccc;padding:2px 6px}}.num{{text-align:right}}</style>
+</head><body>"""
+
+def _header(dim: str, value: str, tot: dict, fmt: str) -> list[str]:
+    avance = tot["total_pagado"] / tot["precio_total_venta"] if tot["precio_total_venta"] else 0.0
+    facts = [("Deuda pendiente", f"{tot['deuda_pendiente'] / CENTS:,.2f}"),
+             ("Ventas", f"{tot['ventas']}"), ("Ventas con deuda", f"{tot['con_deuda']}"),
+             ("Pagado", f"{tot['total_pagado'] / CENTS:,.2f}"),
+             ("Total venta", f"{tot['precio_total_venta'] / CENTS:,.2f}"), ("Avance", f"{avance * 100:,.1f}%")]
+    title = f"Cobranzas — {dim}: {value}"
+    if fmt == "md":
+        return [f"# {_md_escape(title)}", "", *[f"- **{k}:** {v}" for k, v in facts], ""]
+    return [_HTML_HEAD.format(title=html.escape(title)), f"<h1>{html.escape(title)}</h1>",
+            "<ul>", *[f"<li><b>{k}:</b> {v}</li>" for k, v in facts], "</ul>"]
+
+@dataclass
+class _Part:
+    path: Path
+    head: list[str]
+    rows: np.ndarray
+    pos: np.ndarray
+    foot: list[str]
+
+def _chunks(part: _Part, chunk_rows: int):
+    # el reporte en bloques de bytes: encabezado, filas de a chunk_rows, pie
+    yield ("\n".join(part.head) + "\n").encode("utf-8")
+    for i in range(0, len(part.pos), chunk_rows):
+        yield ("\n".join(part.rows[part.pos[i:i + chunk_rows]]) + "\n").encode("utf-8")
+    if part.foot:
+        yield ("\n".join(part.foot) + "\n").encode("utf-8")
+
+def _digest(part: _Part, chunk_rows: int) -> str:
+    h = hashlib.sha256()
+    for b in _chunks(part, chunk_rows):
+        h.update(b)
+    return h.hexdigest()
+
+def _write_atomic(part: _Part, chunk_rows: int) -> None:
+    # .tmp + os.replace: quien lea el reporte nunca ve un archivo a medias
+    part.path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = part.path.with_name(f".{part.path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp, "wb") as f:
+            for b in _chunks(part, chunk_rows):
+                f.write(b)
+        os.replace(tmp, part.path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+def _render_one(part: _Part, known: str | None, chunk_rows: int) -> tuple[str, bool]:
+    # primero el hash (barato, sin tocar disco); se escribe solo si cambió o falta el archivo
+    digest = _digest(part, chunk_rows)
+    if digest == known and part.path.exists():
+        return digest, False
+    _write_atomic(part, chunk_rows)
+    return digest, True
+
+def _slugs(values: list[str]) -> dict[str, str]:
+    out, seen = {}, {}
+    for v in values:
+        s = project_slug(v)
+        seen[s] = seen.get(s, 0) + 1
+        out[v] = s if seen[s] == 1 else f"{s}_{seen[s]}"
+    return out
+
+def _partitions(df: pd.DataFrame, out_dir: Path, dims, formats) -> list[_Part]:
+    # el frame se ordena y formatea una sola vez; cada partición es un rango de posiciones sobre él
+    df = df.sort_values("deuda_pendiente", ascending=False, kind="stable", na_position="last").reset_index(drop=True)
+    display = to_display(df[[c.name for c in REPORT_COLUMNS if c.name in df.columns]])
+    for c in REPORT_COLUMNS:
+        if c.kind == "text" and c.name in display.columns:
+            display[c.name] = display[c.name].astype(object).fillna("")
+    cents = {c: as_cents(df[c]).fillna(0).to_numpy(dtype=np.int64) if c in df.columns
+             else np.zeros(len(df), dtype=np.int64) for c in _SUMS}
+    con_deuda = (cents["deuda_pendiente"] > 0).astype(np.int64)
+    parts, cache = [], {}
+    for fmt in formats:
+        cells = Table(REPORT_COLUMNS, fmt).cells(display, cache)
+        for dim in dims:
+            table = Table([c for c in REPORT_COLUMNS if c.name != dim], fmt)
+            rows = table.rows(cells)
+            keys = (df[dim].astype(object).where(df[dim].notna(), f"(sin {dim})") if dim in df.columns
+                    else pd.Series(f"(sin {dim})", index=df.index)).astype(str)
+            codes, uniques = pd.factorize(keys, sort=True)
+            order = np.argsort(codes, kind="stable")  # estable: dentro del grupo sigue el orden por deuda
+            starts = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+            sums = {c: np.add.reduceat(cents[c][order], starts[:-1]) if len(order) else cents[c][:0]
+                    for c in _SUMS}
+            deudores = np.add.reduceat(con_deuda[order], starts[:-1]) if len(order) else con_deuda[:0]
+            slugs = _slugs(list(uniques))
+            for i, value in enumerate(uniques):
+                tot = {c: int(sums[c][i]) for c in _SUMS}
+                tot.update(ventas=int(starts[i + 1] - starts[i]), con_deuda=int(deudores[i]))
+                foot = table.foot + (["</body></html>"] if fmt == "html" else [])
+                parts.append(_Part(out_dir / dim / f"{slugs[value]}.{fmt}", _header(dim, value, tot, fmt) + table.head,
+                                   rows, order[starts[i]:starts[i + 1]], foot))
+    return parts
+
+def render_reports(df: pd.DataFrame, out_dir: Path, dims=DIMS, formats=FORMATS, workers: int | None = None,
+                   chunk_rows: int = CHUNK_ROWS) -> dict:
+    """Un reporte por asesor y por proyecto (`<out_dir>/<dim>/<slug>.<fmt>`), renderizados en paralelo.
+
+    Los reportes sin cambios (mismo sha256 de contenido que en `_manifest.json`) no se reescriben;
+    los de particiones que ya no existen se borran. Devuelve métricas de la corrida.
+    """
+    bad = [f for f in formats if f not in FORMATS]
+    if bad:
+        raise ValueError(f"Formatos no soportados: {bad} (usa {', '.join(FORMATS)})")
+    out_dir = Path(out_dir)
+    manifest_path = out_dir / MANIFEST
+    manifest = json.loads(manifest_path.read_text(encoding="utf-8")) if manifest_path.exists() else {}
+    parts = _partitions(df, out_dir, list(dims), list(formats))
+    rel = [p.path.relative_to(out_dir).as_posix() for p in parts]
+
+    # hilos: todos comparten las filas ya formateadas; hashlib y la escritura sueltan el GIL
+    with ThreadPoolExecutor(max_workers=workers or min(8, os.cpu_count() or 1)) as pool:
+        results = list(pool.map(lambda a: _render_one(a[0], manifest.get(a[1]), chunk_rows), zip(parts, rel)))
+
+    new_manifest = {r: digest for r, (digest, _) in zip(rel, results)}
+    removed = sorted(set(manifest) - set(new_manifest))
+    for r in removed:
+        (out_dir / r).unlink(missing_ok=True)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    tmp = manifest_path.with_name(f".{MANIFEST}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(dict(sorted(new_manifest.items())), ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp, manifest_path)
+    written = sum(w for _, w in results)
+    return {"dims": list(dims), "formats": list(formats), "reports": len(parts), "written": written,
+            "skipped": len(parts) - written, "removed": len(removed), "rows": int(len(df))}
@@ -0,0 +1,123 @@
+from __future__ import annotations
+import numpy as np
+import pandas as pd
+
+# montos en céntimos (Int64 nullable): sumas exactas. Regla única para todo el pipeline:
+# columna de monto Int64 = céntimos; cualquier otro tipo (float, int numpy de excel/redshift, texto,
+# Decimal) = soles (datos crudos, csv, snapshots anteriores a este esquema)
+CENTS = 100
+MONEY_COLUMNS = {
+    # ventas (sql_minutas_base.sql)
+    "precio_venta_depa_soles", "precio_estacionamiento_proforma", "precio_deposito_proforma", "precio_total_venta",
+    # pagos (excel)
+    "monto_pagado",
+    # derivadas: reporte, items y cambios
+    "total_pagado", "deuda_pendiente", "precio_item", "deuda_item", "pagado_directo", "pagado_asignado",
+    "deuda_prev", "deuda_hoy", "delta_deuda", "pagado_prev", "pagado_hoy", "delta_pagado",
+    # aging por cuota (aging.py)
+    "monto_programado", "pagado_cuota", "saldo_cuota", "total_programado", "total_asignado", "saldo_cuotas",
+    "saldo_vencido", "por_vencer", "vencido_0_30", "vencido_31_60", "vencido_61_90", "vencido_90_mas", "excedente",
+    # proyección de cobros (cashflow.py)
+    "cobro_esperado", "cobro_p10", "cobro_p50", "cobro_p90",
+}
+
+# dimensiones de baja cardinalidad -> categorical; vocabulario base + lo que aparezca en los datos
+DIMENSIONS = {
+    "proyecto": (),
+    "asesor": (),
+    "medio_captacion": (),
+    "estado_minuta": (),
+    "tipo_compra": ("departamento solo", "depa + estacionamiento", "depa + estacionamiento + deposito"),
+    "tipo_item": ("departamento", "estacionamiento", "deposito"),
+    "moneda": ("PEN", "USD"),
+    "metodo_pago": (),
+}
+
+# prioridad de cobranza por deuda pendiente: cortes en soles, intervalos cerrados a la derecha (pd.cut)
+PRIORIDAD_BINS = (-0.1, 0, 5000, 20000, 1e18)
+PRIORIDAD_LABELS = ("sin_deuda", "baja", "media", "alta")
+
+def _is_cents(s: pd.Series) -> bool:
+    return isinstance(s.dtype, pd.Int64Dtype)
+
+def as_cents(s: pd.Series) -> pd.Series:
+    if _is_cents(s):
+        return s
+    soles = pd.to_numeric(s, errors="coerce").astype(float)
+    return pd.Series(np.round(soles.to_numpy() * CENTS), index=s.index).astype("Int64")
+
+def to_soles(s: pd.Series) -> pd.Series:
+    if _is_cents(s):
+        return s.astype("float64") / CENTS
+    return pd.to_numeric(s, errors="coerce").astype(float)
+
+def parse_dates(s: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+    """Fechas -> (datetime64[D], inválida); inválida = valor no vacío que no se puede leer como fecha.
+
+    Texto: se parsea cada valor distinto una vez (las fechas se repiten mucho).
+    """
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return s.to_numpy(dtype="datetime64[D]"), np.zeros(len(s), dtype=bool)
+    codes, uniques = pd.factorize(s)
+    u = pd.Series(uniques, dtype=object)
+    parsed = pd.to_datetime(u, errors="coerce", format="mixed").to_numpy(dtype="datetime64[D]")
+    bad = u.astype(str).str.strip().ne("").to_numpy() & np.isnat(parsed)
+    # código -1 (nulo) -> último elemento: NaT y no inválida
+    return np.append(parsed, np.datetime64("NaT", "D"))[codes], np.append(bad, False)[codes]
+
+def epoch_days(s: pd.Series) -> np.ndarray:
+    """Fechas -> días desde epoch (float, NaN si falta o no se puede leer)."""
+    d, _ = parse_dates(s)
+    return np.where(np.isnat(d), np.nan, d.astype("int64").astype(float))
+
+def dimension_dtype(col: str, *series: pd.Series) -> pd.CategoricalDtype:
+    """Diccionario compartido de `col`: vocabulario base + valores vistos en todas las series."""
+    base = list(DIMENSIONS.get(col, ()))
+    seen = set()
+    for s in series:
+        vals = s.cat.categories if isinstance(s.dtype, pd.CategoricalDtype) else s.dropna().unique()
+        seen.update(str(v) for v in vals)
+    return pd.CategoricalDtype(base + sorted(seen - set(base)))
+
+def _as_category(s: pd.Series, dtype: pd.CategoricalDtype) -> pd.Series:
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        return s.cat.set_categories(dtype.categories)
+    return s.where(s.isna(), s.astype(str)).astype(dtype)
+
+def apply_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """Montos -> céntimos Int64, dimensiones -> categorical. Idempotente."""
+    out = df.copy()
+    for c in out.columns:
+        if c in MONEY_COLUMNS:
+            out[c] = as_cents(out[c])
+        elif c in DIMENSIONS:
+            out[c] = _as_category(out[c], dimension_dtype(c, out[c]))
+    return out
+
+def unify_dimension(col: str, *frames: pd.DataFrame) -> None:
+    """Misma CategoricalDtype de `col` en todos los frames (in place), p.ej. tipo_item en items y pagos."""
+    present = [f for f in frames if col in f.columns]
+    dtype = dimension_dtype(col, *(f[col] for f in present))
+    for f in present:
+        f[col] = _as_category(f[col], dtype)
+
+def to_display(df: pd.DataFrame) -> pd.DataFrame:
+    """Céntimos -> soles y categorical -> texto; solo para csv / reportes."""
+    out = df.copy()
+    for c in out.columns:
+        if c in MONEY_COLUMNS:
+            out[c] = to_soles(out[c])
+        elif isinstance(out[c].dtype, pd.CategoricalDtype):
+            out[c] = out[c].astype(object)
+    return out
+
+def memory_mb(df: pd.DataFrame) -> float:
+    return round(df.memory_usage(deep=True).sum() / 2**20, 3)
+
+def memory_report(raw: pd.DataFrame, typed: pd.DataFrame) -> dict:
+    before, after = memory_mb(raw), memory_mb(typed)
+    return {
+        "memory_mb_raw": before,
+        "memory_mb_typed": after,
+        "memory_reduction_pct": round(100 * (1 - after / before), 1) if before else 0.0,
+    }
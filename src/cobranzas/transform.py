@@ -1,21 +1,35 @@
 import pandas as pd
 
-def compute_cobranzas(df_xcobrar: pd.DataFrame, df_pagos: pd.DataFrame) -> pd.DataFrame:
+from .aging import aging_summary, allocate_fifo
+from .schema import to_display
+
+def compute_cobranzas(df_xcobrar: pd.DataFrame, df_pagos: pd.DataFrame, engine: str = "pandas",
+                      df_cuotas: pd.DataFrame | None = None, hoy=None) -> pd.DataFrame:
     # Esperado en df_xcobrar: cliente, unidad, tipo_item (DEP/EST), total_por_cobrar, fecha_vencimiento (opcional)
     # Pagos: cliente, unidad, monto, fecha_pago
+    # Cuotas (opcional, sql/cuotas_programadas.sql): cliente, unidad, monto_programado, fecha_vcto -> aging FIFO
 
-    pagos_agg = (df_pagos
-        .groupby(["cliente", "unidad"], as_index=False)
-        .agg(total_pagado=("monto", "sum"),
-             ultima_fecha_pago=("fecha_pago", "max"))
-    )
+    if engine == "duckdb":
+        from ..engine_duckdb import compute_cobranzas_aggs
+        pagos_agg = compute_cobranzas_aggs(df_xcobrar, df_pagos)
+    else:
+        pagos_agg = (df_pagos
+            .groupby(["cliente", "unidad"], as_index=False)
+            .agg(total_pagado=("monto", "sum"),
+                 ultima_fecha_pago=("fecha_pago", "max"))
+        )
 
     out = df_xcobrar.merge(pagos_agg, on=["cliente", "unidad"], how="left")
     out["total_pagado"] = out["total_pagado"].fillna(0.0)
     out["saldo_pendiente"] = out["total_por_cobrar"] - out["total_pagado"]
 
+    if df_cuotas is not None:
+        # pagos asignados a cuotas por vencimiento: mora = atraso de la cuota impaga más antigua + saldo por tramo
+        aging = to_display(aging_summary(allocate_fifo(df_cuotas, df_pagos, hoy), df_pagos))
+        out = out.merge(aging, on=["cliente", "unidad"], how="left")
+        out["dias_mora"] = out["dias_mora"].fillna(0).astype(int)
     # Mora si hay vencimiento
-    if "fecha_vencimiento" in out.columns:
+    elif "fecha_vencimiento" in out.columns:
         out["fecha_vencimiento"] = pd.to_datetime(out["fecha_vencimiento"], errors="coerce")
         hoy = pd.Timestamp.utcnow().normalize()
         out["dias_mora"] = (hoy - out["fecha_vencimiento"]).dt.days
@@ -0,0 +1,237 @@
+from __future__ import annotations
+import hashlib
+import inspect
+import json
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable
+
+from .cobranzas.io_payments import _sha256
+from .perf import run_profile, write_run_profile
+from .stages import StageResult, write_stage_artifact, ts
+
+@dataclass
+class Stage:
+    name: str
+    # recibe {dep: resultado} y devuelve el resultado de la etapa (df, dict, None)
+    run: Callable[[dict], Any]
+    deps: list[str] = field(default_factory=list)
+    # descriptores de entrada que no son etapas: hash de la SQL, de los excels, fecha, flags
+    inputs: Callable[[], dict] | None = None
+    # funciones/módulos cuyo código entra al fingerprint (editar otra cosa no invalida la etapa)
+    code: list = field(default_factory=list)
+    # nombre del stage_<x>.json que escribe la función de la etapa
+    stage_json: str = ""
+    # reconstruye el resultado desde el stage json del último run exitoso (sin recalcular)
+    load: Callable[[dict], Any] | None = None
+    # archivos extra (relativos a out_dir) que deben existir para poder saltar la etapa
+    outputs: list[str] = field(default_factory=list)
+
+def _digest(obj) -> str:
+    return hashlib.sha256(json.dumps(obj, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+
+def code_version(objs) -> str:
+    h = hashlib.sha256()
+    for o in objs:
+        h.update(inspect.getsource(o).encode("utf-8"))
+    return h.hexdigest()
+
+class DagRunner:
+    """Corre etapas en orden y salta las que tienen el mismo fingerprint que el último run exitoso.
+
+    fingerprint = hash(código de la etapa, inputs declarados, contenido de los artefactos de sus deps).
+    Estado en `<out>/cache/dag_state.json`.
+    """
+
+    def __init__(self, stages: list[Stage], out_dir: Path, params: dict | None = None,
+                 common_code: list | None = None, max_workers: int = 2, cancel=None):
+        seen = set()
+        for s in stages:
+            missing = [d for d in s.deps if d not in seen]
+            if missing:
+                raise ValueError(f"Etapa {s.name!r} depende de {missing}, que no están antes en el DAG.")
+            seen.add(s.name)
+        self.stages = {s.name: s for s in stages}
+        self.order = [s.name for s in stages]
+        self.out_dir = out_dir
+        self.params = params or {}
+        self.common_code = common_code or []
+        self.state_path = out_dir / "cache" / "dag_state.json"
+        self.max_workers = max_workers
+        # objeto con .cancel() / .cancelled (io_redshift.CancelToken) para abortar etapas en curso
+        self.cancel = cancel
+
+    # --- estado ---
+    def _load_state(self) -> dict:
+        if not self.state_path.exists():
+            return {}
+        return json.loads(self.state_path.read_text(encoding="utf-8"))
+
+    def _save_state(self, state: dict) -> None:
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        self.state_path.write_text(json.dumps(state, ensure_ascii=False, indent=2, default=str), encoding="utf-8")
+
+    def _artifact_files(self, stage: Stage, payload: dict) -> list[Path]:
+        files = []
+        for a in (payload.get("artifacts") or {}).values():
+            files.append(Path(a["path"]))
+            if a.get("csv_path"):
+                files.append(Path(a["csv_path"]))
+        return files + [self.out_dir / o for o in stage.outputs]
+
+    def _output_digest(self, stage: Stage, payload: dict) -> str:
+        # content-addressed: lo que ven las etapas siguientes es el contenido, no el fingerprint
+        files = self._artifact_files(stage, payload)
+        if files:
+            return _digest([[p.name, _sha256(p)] for p in files if p.exists()])
+        return _digest(payload)
+
+    def fingerprint(self, stage: Stage, upstream: dict[str, str]) -> str:
+        return _digest({
+            "stage": stage.name,
+            "code": code_version([*self.common_code, *stage.code]),
+            "inputs": stage.inputs() if stage.inputs else {},
+            "params": self.params,
+            "deps": {d: upstream[d] for d in stage.deps},
+        })
+
+    # --- plan ---
+    def _ancestors(self, names: set[str]) -> set[str]:
+        out: set[str] = set()
+        todo = list(names)
+        while todo:
+            for d in self.stages[todo.pop()].deps:
+                if d not in out:
+                    out.add(d)
+                    todo.append(d)
+        return out
+
+    def _descendants(self, name: str) -> set[str]:
+        out = {name}
+        for n in self.order:
+            if any(d in out for d in self.stages[n].deps):
+                out.add(n)
+        return out
+
+    def plan(self, from_stage: str | None = None, only: list[str] | None = None,
+             force: set[str] | None = None) -> dict[str, str]:
+        """Acción por etapa: "auto" (fingerprint decide), "run" (forzada) o "load" (reusa el último run)."""
+        for n in [from_stage, *(only or [])]:
+            if n is not None and n not in self.stages:
+                raise ValueError(f"Etapa desconocida: {n!r} (etapas: {', '.join(self.order)})")
+        force = force or set()
+        if only:
+            sel = set(only)
+            return {n: ("run" if n in sel else "load") for n in self.order if n in sel | self._ancestors(sel)}
+        if from_stage:
+            rerun = self._descendants(from_stage)
+            return {n: ("run" if n in rerun else "load") for n in self.order}
+        return {n: ("run" if n in force else "auto") for n in self.order}
+
+    # --- ejecución ---
+    def _decide(self, stage: Stage, action: str, state: dict, outputs: dict) -> tuple[str, bool]:
+        prev = state.get(stage.name)
+        if action == "load":
+            if prev is None:
+                raise RuntimeError(f"No hay un run previo de {stage.name!r} para reusar; córrelo primero (sin --from-stage/--only).")
+            fp = prev["fingerprint"]
+        else:
+            fp = self.fingerprint(stage, outputs)
+        # partial: la etapa terminó con fallas parciales (ej. un proyecto); se re-corre aunque no cambie nada
+        reusable = (prev is not None and prev["fingerprint"] == fp
+                    and not (action == "auto" and prev["payload"].get("partial"))
+                    and all(p.exists() for p in self._artifact_files(stage, prev["payload"])))
+        if action == "load" and not reusable:
+            raise RuntimeError(f"Faltan artefactos del último run de {stage.name!r}; córrelo de nuevo.")
+        return fp, action == "load" or (action == "auto" and reusable)
+
+    def run(self, from_stage: str | None = None, only: list[str] | None = None,
+            force: set[str] | None = None) -> dict[str, Any]:
+        """Corre el plan; etapas independientes (ej. los dos extracts) corren en paralelo en hilos.
+
+        Si una etapa falla se cancelan las que siguen corriendo (`cancel.cancel()`, ej. la query a
+        Redshift) y se re-lanza el primer error.
+        """
+        started = ts()
+        t_run = time.perf_counter()
+        plan = self.plan(from_stage, only, force)
+        state = self._load_state()
+        results: dict[str, Any] = {}
+        outputs: dict[str, str] = {}
+        report: dict[str, dict] = {}
+        pending = list(plan)
+        running: dict[Future, tuple[str, str, float]] = {}
+        errors: list[tuple[str, BaseException]] = []
+        payloads: dict[str, dict] = {}
+        # [inicio, fin] medidos en el hilo de la etapa: una etapa encolada sin worker libre no cuenta como corriendo
+        spans: dict[str, list[float]] = {}
+
+        def call(name: str, stage: Stage, deps: dict) -> Any:
+            spans[name] = [time.perf_counter()]
+            try:
+                return stage.run(deps)
+            finally:
+                spans[name].append(time.perf_counter())
+
+        def record(name: str, status: str, fp: str, t0: float) -> None:
+            t0, t1 = spans.get(name, [t0, time.perf_counter()])
+            report[name] = {"status": status, "start_s": round(t0 - t_run, 3),
+                            "seconds": round(t1 - t0, 3), "fingerprint": fp[:12]}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as ex:
+            while (pending and not errors) or running:
+                for name in [n for n in pending if all(d in outputs for d in self.stages[n].deps)]:
+                    if errors:
+                        break
+                    pending.remove(name)
+                    stage = self.stages[name]
+                    t0 = time.perf_counter()
+                    fp, reuse = self._decide(stage, plan[name], state, outputs)
+                    if reuse:
+                        prev = state[name]
+                        results[name] = stage.load(prev["payload"]) if stage.load else None
+                        outputs[name] = prev["output"]
+                        record(name, "skipped" if plan[name] == "auto" else "reused", fp, t0)
+                    else:
+                        fut = ex.submit(call, name, stage, {d: results[d] for d in stage.deps})
+                        running[fut] = (name, fp, t0)
+                if not running:
+                    if pending and not errors and not any(all(d in outputs for d in self.stages[n].deps) for n in pending):
+                        raise RuntimeError(f"Etapas sin dependencias resueltas: {pending}")
+                    continue
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    name, fp, t0 = running.pop(fut)
+                    stage = self.stages[name]
+                    try:
+                        results[name] = fut.result()
+                    except BaseException as e:
+                        cancelled = bool(errors) and self.cancel is not None and self.cancel.cancelled
+                        record(name, "cancelled" if cancelled else "failed", fp, t0)
+                        errors.append((name, e))
+                        if self.cancel is not None and not cancelled:
+                            self.cancel.cancel()
+                        continue
+                    payload_path = self.out_dir / f"stage_{stage.stage_json}.json"
+                    payload = json.loads(payload_path.read_text(encoding="utf-8")) if payload_path.exists() else {}
+                    payloads[name] = payload
+                    outputs[name] = self._output_digest(stage, payload)
+                    state[name] = {"fingerprint": fp, "output": outputs[name], "finished_at": ts(), "payload": payload}
+                    self._save_state(state)
+                    record(name, "ran", fp, t0)
+
+        # ahorro del paralelismo: suma de las etapas corridas vs el tiempo total
+        wall = time.perf_counter() - t_run
+        serial = sum(r["seconds"] for r in report.values())
+        metrics = {"stages": report, "wall_seconds": round(wall, 3), "serial_seconds": round(serial, 3),
+                   "saved_seconds": round(serial - wall, 3)}
+        if errors:
+            metrics["error"] = f"{errors[0][0]}: {errors[0][1]!r}"
+        write_stage_artifact(self.out_dir, StageResult("dag", started, ts(), metrics))
+        write_run_profile(self.out_dir, run_profile(report, payloads, started, wall, metrics.get("error")))
+        if errors:
+            raise errors[0][1]
+        return results
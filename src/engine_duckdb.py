@@ -0,0 +1,245 @@
+from __future__ import annotations
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .cobranzas.schema import CENTS, PRIORIDAD_BINS, PRIORIDAD_LABELS, as_cents, dimension_dtype, _as_category
+
+# misma lógica que pipeline._transform_pandas expresada en SQL sobre DuckDB embebido (multi-hilo,
+# agregaciones/joins con spill a disco). La preparación de columnas y el armado final de dtypes
+# quedan en pandas para que ambos engines devuelvan frames idénticos.
+
+# str.strip() de python: espacios unicode además de los ascii
+_WS = r"[\s\p{Z}\x{85}\x{0b}\x{1c}-\x{1f}]"
+
+def _strip(expr: str) -> str:
+    return f"regexp_replace(CAST({expr} AS VARCHAR), '^{_WS}+|{_WS}+$', '', 'g')"
+
+def _text(expr: str) -> str:
+    # equivalente a pipeline._text: "" para nulos, sin espacios alrededor
+    return f"coalesce({_strip(expr)}, '')"
+
+def connect(threads: int | None = None, memory_limit: str | None = None, temp_dir: Path | None = None):
+    """Conexión en memoria; `memory_limit` (ej. "4GB") + `temp_dir` habilitan el spill de joins/agregaciones a disco."""
+    import duckdb
+
+    con = duckdb.connect(":memory:")
+    if threads:
+        con.execute(f"SET threads = {int(threads)}")
+    if memory_limit:
+        con.execute(f"SET memory_limit = '{memory_limit}'")
+    if temp_dir is not None:
+        Path(temp_dir).mkdir(parents=True, exist_ok=True)
+        con.execute(f"SET temp_directory = '{Path(temp_dir).as_posix()}'")
+    # el orden lo fija ORDER BY _pos; sin esto DuckDB no puede paralelizar/spillear igual de bien
+    con.execute("SET preserve_insertion_order = false")
+    return con
+
+def _register(con, name: str, df: pd.DataFrame) -> None:
+    import pyarrow as pa
+    con.register(name, pa.Table.from_pandas(df, preserve_index=False))
+
+def _fetch(con, query: str) -> pd.DataFrame:
+    import pyarrow as pa
+    tbl = con.execute(query).fetch_arrow_table()
+    return tbl.to_pandas(types_mapper={pa.int64(): pd.Int64Dtype()}.get)
+
+def _as_text_input(s: pd.Series) -> pd.Series:
+    # categorical -> object: DuckDB ve VARCHAR y no un ENUM por frame
+    return s.astype(object) if isinstance(s.dtype, pd.CategoricalDtype) else s
+
+def _money_input(v: pd.DataFrame, col: str) -> pd.Series:
+    # céntimos Int64 (as_cents: sin copia si ya viene de apply_schema); columna ausente = 0 como pipeline._num_col
+    if col not in v.columns:
+        return pd.Series(0, index=v.index, dtype="Int64")
+    return as_cents(v[col])
+
+_ITEM_PARTS = (
+    ("estacionamiento", "codigo_estacionamiento_proforma", "precio_estacionamiento_proforma"),
+    ("deposito", "codigo_deposito_proforma", "precio_deposito_proforma"),
+)
+
+def _prioridad_sql(col: str) -> str:
+    # pd.cut: intervalos (b_i, b_i+1]; fuera de rango -> NULL
+    cuts = [b * CENTS for b in PRIORIDAD_BINS]
+    whens = " ".join(f"WHEN {col} > {lo!r} AND {col} <= {hi!r} THEN '{label}'"
+                     for lo, hi, label in zip(cuts, cuts[1:], PRIORIDAD_LABELS))
+    return f"CASE {whens} END"
+
+def _ventas_input(ventas: pd.DataFrame) -> pd.DataFrame:
+    v = ventas.reset_index(drop=True)
+
+    def text(col: str, default) -> pd.Series:
+        if col in v.columns:
+            return _as_text_input(v[col])
+        return pd.Series([default] * len(v), dtype=object)
+
+    cols = {
+        "_pos": pd.Series(np.arange(len(v), dtype=np.int64)),
+        "codigo_proforma": text("codigo_proforma", None),
+        "precio_total_venta": _money_input(v, "precio_total_venta"),
+        "codigo_unidad": text("codigo_unidad", ""),
+        "precio_venta_depa_soles": _money_input(v, "precio_venta_depa_soles"),
+    }
+    for _, cod_col, precio_col in _ITEM_PARTS:
+        if cod_col in v.columns:
+            cols[cod_col] = _as_text_input(v[cod_col])
+            cols[precio_col] = _money_input(v, precio_col)
+    return pd.DataFrame(cols)
+
+def _pagos_input(pagos: pd.DataFrame, has_items: bool) -> pd.DataFrame:
+    p = pagos.reset_index(drop=True)
+    out = pd.DataFrame({
+        "codigo_proforma": _as_text_input(p["codigo_proforma"]),
+        "monto_pagado": _money_input(p, "monto_pagado"),
+        "fecha_pago": pd.to_datetime(p["fecha_pago"], errors="coerce"),
+    })
+    if has_items:
+        out["tipo_item"] = _as_text_input(p["tipo_item"])
+        out["codigo_item"] = _as_text_input(p["codigo_item"])
+    return out
+
+def transform_frames(ventas: pd.DataFrame, pagos: pd.DataFrame, threads: int | None = None,
+                     memory_limit: str | None = None, temp_dir: Path | None = None,
+                     ) -> tuple[pd.DataFrame, pd.DataFrame | None]:
+    """(cobranzas_report, cobranzas_items_report | None) con DuckDB; entradas ya con apply_schema."""
+    has_items = {"tipo_item", "codigo_item"}.issubset(pagos.columns)
+    con = connect(threads, memory_limit, temp_dir)
+    try:
+        _register(con, "ventas", _ventas_input(ventas))
+        _register(con, "pagos", _pagos_input(pagos, has_items))
+
+        # 1-4) pagos por proforma, deuda, avance y prioridad
+        pf_filter = (f"{_text('tipo_item')} = '' AND {_text('codigo_item')} = ''" if has_items else "TRUE")
+        report = _fetch(con, f"""
+            WITH pf AS (
+                SELECT codigo_proforma,
+                       CAST(coalesce(sum(monto_pagado), 0) AS BIGINT) AS total_pagado,
+                       count(monto_pagado) AS n_pagos,
+                       max(fecha_pago) AS fecha_ultimo_pago
+                FROM pagos
+                WHERE {pf_filter} AND codigo_proforma IS NOT NULL
+                GROUP BY codigo_proforma
+            ), r AS (
+                SELECT v._pos,
+                       coalesce(pf.total_pagado, 0) AS total_pagado,
+                       coalesce(pf.n_pagos, 0) AS n_pagos,
+                       pf.fecha_ultimo_pago,
+                       coalesce(v.precio_total_venta, 0) AS precio_total_venta
+                FROM ventas v LEFT JOIN pf ON pf.codigo_proforma = v.codigo_proforma
+            ), d AS (
+                SELECT *, CASE WHEN precio_total_venta - total_pagado < 0 THEN 0
+                               ELSE precio_total_venta - total_pagado END AS deuda_pendiente
+                FROM r
+            )
+            SELECT *,
+                   CASE WHEN precio_total_venta = 0 THEN 0.0
+                        ELSE CAST(total_pagado AS DOUBLE) / CAST(precio_total_venta AS DOUBLE) END AS avance_pct,
+                   {_prioridad_sql('CAST(deuda_pendiente AS DOUBLE)')} AS prioridad
+            FROM d
+            ORDER BY _pos
+        """)
+
+        # mismo orden de filas que ventas (ORDER BY _pos): se asigna por índice
+        df = ventas.reset_index(drop=True).copy()
+        df["total_pagado"] = report["total_pagado"].astype("Int64")
+        df["n_pagos"] = report["n_pagos"].astype("int64")
+        df["fecha_ultimo_pago"] = pd.to_datetime(report["fecha_ultimo_pago"]).astype("datetime64[ns]")
+        df["precio_total_venta"] = report["precio_total_venta"].astype("Int64")
+        df["deuda_pendiente"] = report["deuda_pendiente"].astype("Int64")
+        df["avance_pct"] = report["avance_pct"].astype("float64")
+        df["prioridad"] = pd.Categorical(report["prioridad"].to_numpy(), categories=list(PRIORIDAD_LABELS),
+                                         ordered=True)
+
+        return df, (_items(con, ventas, df) if has_items else None)
+    finally:
+        con.close()
+
+def _items(con, ventas: pd.DataFrame, df: pd.DataFrame) -> pd.DataFrame | None:
+    # 5) explosión a items + pagos por item (pipeline._build_items / _agg_pagos_item)
+    con.execute(f"""
+        CREATE TEMP TABLE pi AS
+        SELECT codigo_proforma, tipo_item, codigo_item,
+               CAST(coalesce(sum(monto_pagado), 0) AS BIGINT) AS total_pagado,
+               count(monto_pagado) AS n_pagos,
+               max(fecha_pago) AS fecha_ultimo_pago
+        FROM (SELECT codigo_proforma, lower({_text('tipo_item')}) AS tipo_item, {_text('codigo_item')} AS codigo_item,
+                     monto_pagado, fecha_pago
+              FROM pagos)
+        WHERE tipo_item <> '' AND codigo_item <> '' AND codigo_proforma IS NOT NULL
+        GROUP BY codigo_proforma, tipo_item, codigo_item
+    """)
+    tipos_pagos = [r[0] for r in con.execute("SELECT DISTINCT tipo_item FROM pi").fetchall()]
+    if not tipos_pagos:
+        return None
+
+    parts = ["SELECT _pos, 0 AS _k, 'departamento' AS tipo_item, codigo_proforma, "
+             "CAST(codigo_unidad AS VARCHAR) AS codigo_item, precio_venta_depa_soles AS precio_item FROM ventas"]
+    for k, (tipo, cod_col, precio_col) in enumerate(_ITEM_PARTS, start=1):
+        if cod_col in ventas.columns:
+            parts.append(f"SELECT _pos, {k}, '{tipo}', codigo_proforma, CAST({cod_col} AS VARCHAR), {precio_col} "
+                         f"FROM ventas WHERE {cod_col} IS NOT NULL AND {_strip(cod_col)} <> ''")
+    union = "\nUNION ALL\n".join(parts)
+    it = _fetch(con, f"""
+        WITH it AS ({union})
+        SELECT it._pos, it.tipo_item, it.codigo_item, it.precio_item,
+               coalesce(pi.total_pagado, 0) AS total_pagado,
+               coalesce(pi.n_pagos, 0) AS n_pagos,
+               pi.fecha_ultimo_pago,
+               CASE WHEN it.precio_item - coalesce(pi.total_pagado, 0) < 0 THEN 0
+                    ELSE it.precio_item - coalesce(pi.total_pagado, 0) END AS deuda_item,
+               CASE WHEN it.precio_item = 0 THEN 0.0
+                    ELSE CAST(coalesce(pi.total_pagado, 0) AS DOUBLE) / CAST(it.precio_item AS DOUBLE)
+               END AS avance_item_pct
+        FROM it LEFT JOIN pi
+          ON pi.codigo_proforma = it.codigo_proforma AND pi.tipo_item = it.tipo_item
+         AND pi.codigo_item = it.codigo_item
+        ORDER BY it._pos, it._k
+    """)
+
+    pos = it["_pos"].to_numpy(dtype=np.int64)
+    n = len(it)
+
+    def pick(col: str, default) -> pd.Series:
+        # columnas de la venta por posición, con el dtype de df (categoricals incluidos)
+        if col in df.columns:
+            return df[col].iloc[pos].reset_index(drop=True)
+        return pd.Series([default] * n, dtype=object)
+
+    items = pd.DataFrame({
+        "codigo_proforma": pick("codigo_proforma", None),
+        "tipo_item": it["tipo_item"].to_numpy(dtype=object),
+        "codigo_item": it["codigo_item"].to_numpy(dtype=object),
+        "precio_item": it["precio_item"].astype("Int64"),
+        "cliente": pick("cliente", ""),
+        "proyecto": pick("proyecto", ""),
+        "asesor": pick("asesor", ""),
+    })
+    items["tipo_item"] = _as_category(items["tipo_item"],
+                                      dimension_dtype("tipo_item", items["tipo_item"], pd.Series(tipos_pagos)))
+    items["total_pagado"] = it["total_pagado"].astype("Int64")
+    items["n_pagos"] = it["n_pagos"].astype("int64")
+    items["fecha_ultimo_pago"] = pd.to_datetime(it["fecha_ultimo_pago"]).astype("datetime64[ns]")
+    items["deuda_item"] = it["deuda_item"].astype("Int64")
+    items["avance_item_pct"] = it["avance_item_pct"].astype("float64")
+    return items
+
+def compute_cobranzas_aggs(df_xcobrar: pd.DataFrame, df_pagos: pd.DataFrame, threads: int | None = None,
+                           memory_limit: str | None = None, temp_dir: Path | None = None) -> pd.DataFrame:
+    """Agregación de pagos por (cliente, unidad) de cobranzas.transform.compute_cobranzas en DuckDB."""
+    con = connect(threads, memory_limit, temp_dir)
+    try:
+        _register(con, "pagos", df_pagos[["cliente", "unidad", "monto", "fecha_pago"]])
+        # fsum = suma compensada (Kahan), como el groupby sum de pandas
+        agg = con.execute("""
+            SELECT cliente, unidad, fsum(monto) AS total_pagado, max(fecha_pago) AS ultima_fecha_pago
+            FROM pagos
+            WHERE cliente IS NOT NULL AND unidad IS NOT NULL
+            GROUP BY cliente, unidad
+        """).fetch_arrow_table().to_pandas()
+    finally:
+        con.close()
+    if pd.api.types.is_integer_dtype(df_pagos["monto"]):
+        agg["total_pagado"] = agg["total_pagado"].astype(df_pagos["monto"].dtype)
+    return agg
@@ -0,0 +1,142 @@
+from __future__ import annotations
+import json
+import os
+import re
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+from .stages import row_hash, ts
+
+KEY = "codigo_proforma"
+WATERMARK_COL = "fecha_minuta"
+
+# cota inferior embebida en sql_minutas_base.sql: WHERE fb.fecha_minuta >= DATE '2022-01-01'
+_LOWER_BOUND_RE = re.compile(r"(fb\.fecha_minuta\s*>=\s*DATE\s*)'(\d{4}-\d{2}-\d{2})'", re.IGNORECASE)
+
+def with_lower_bound(query: str, since: date) -> str:
+    if not _LOWER_BOUND_RE.search(query):
+        raise ValueError("La SQL no tiene el filtro `fb.fecha_minuta >= DATE '...'` para extracción incremental.")
+    return _LOWER_BOUND_RE.sub(lambda m: f"{m.group(1)}'{since.isoformat()}'", query, count=1)
+
+def _paths(cache_dir: Path) -> dict[str, Path]:
+    return {
+        "base": cache_dir / "ventas_base.parquet",
+        "hashes": cache_dir / "ventas_watermark_hashes.parquet",
+        "watermark": cache_dir / "ventas_watermark.json",
+    }
+
+def load_watermark(cache_dir: Path) -> dict | None:
+    import pyarrow.parquet as pq
+
+    p = _paths(cache_dir)
+    if not (p["watermark"].exists() and p["base"].exists() and p["hashes"].exists()):
+        return None
+    state = json.loads(p["watermark"].read_text(encoding="utf-8"))
+    # el watermark se escribe último: si la base no es la que describe (run cortado entre archivos) -> full refresh
+    if state.get("rows") is not None and pq.read_metadata(p["base"]).num_rows != state["rows"]:
+        return None
+    return state
+
+def _write_atomic(dst: Path, write: Callable[[Path], None]) -> None:
+    # .tmp en la misma carpeta + os.replace (como io_payments): nunca queda un archivo a medias con nombre válido
+    tmp = dst.with_name(f".{dst.name}.{os.getpid()}.tmp")
+    try:
+        write(tmp)
+        os.replace(tmp, dst)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+def _save(cache_dir: Path, base: pd.DataFrame, hashes: pd.DataFrame, state: dict) -> None:
+    p = _paths(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    _write_atomic(p["base"], lambda t: base.to_parquet(t, index=False))
+    _write_atomic(p["hashes"], lambda t: hashes.to_parquet(t, index=False))
+    _write_atomic(p["watermark"], lambda t: t.write_text(json.dumps(state, ensure_ascii=False, indent=2),
+                                                          encoding="utf-8"))
+
+def _max_fecha(df: pd.DataFrame) -> str | None:
+    if WATERMARK_COL not in df.columns or df.empty:
+        return None
+    m = pd.to_datetime(df[WATERMARK_COL], errors="coerce").max()
+    return None if pd.isna(m) else m.date().isoformat()
+
+def _hashes(df: pd.DataFrame) -> pd.DataFrame:
+    return pd.DataFrame({KEY: df[KEY].to_numpy(), "row_hash": row_hash(df).to_numpy()})
+
+def _diff_counts(new_h: pd.DataFrame, old_h: pd.DataFrame) -> tuple[int, int]:
+    # (filas nuevas, filas cambiadas) por hash join sobre (codigo_proforma, row_hash)
+    known = new_h[KEY].isin(old_h[KEY])
+    pair = new_h.merge(old_h.drop_duplicates(), on=[KEY, "row_hash"], how="left", indicator=True)
+    unmatched = (pair["_merge"] == "left_only").to_numpy()
+    return int((~known).sum()), int((unmatched & known.to_numpy()).sum())
+
+def sync_base(query: str, cache_dir: Path, read: Callable[[str], pd.DataFrame],
+              lookback_days: int = 3, full_refresh_days: int = 7,
+              force_full: bool = False, today: date | None = None) -> tuple[pd.DataFrame, dict]:
+    """Actualiza la tabla base cacheada con el delta desde el watermark; devuelve (base, métricas)."""
+    today = today or date.today()
+    state = load_watermark(cache_dir)
+
+    full = force_full or state is None or state.get("fecha_minuta_max") is None
+    if not full and full_refresh_days > 0:
+        last_full = date.fromisoformat(state["last_full_refresh"])
+        full = (today - last_full).days >= full_refresh_days
+
+    p = _paths(cache_dir)
+    if full:
+        fresh = read(query)
+        new_h = _hashes(fresh)
+        new, changed, deleted = int(len(fresh)), 0, 0
+        if state is not None:
+            old_h = pd.read_parquet(p["hashes"])
+            new, changed = _diff_counts(new_h, old_h)
+            deleted = int((~old_h[KEY].drop_duplicates().isin(new_h[KEY])).sum())
+        base = fresh
+        lower_bound = None
+        last_full_refresh = today.isoformat()
+        delta_rows = int(len(fresh))
+    else:
+        # ventana de seguridad: minutas con fecha cercana al watermark pueden llegar tarde
+        lower_bound = date.fromisoformat(state["fecha_minuta_max"]) - timedelta(days=lookback_days)
+        delta = read(with_lower_bound(query, lower_bound))
+        base = pd.read_parquet(p["base"])
+        old_h = pd.read_parquet(p["hashes"])
+        delta_h = _hashes(delta)
+
+        new, changed = _diff_counts(delta_h, old_h)
+        deleted = 0
+
+        # upsert por codigo_proforma: el delta reemplaza todas las filas previas de esa proforma
+        keep = ~base[KEY].isin(delta[KEY])
+        base = pd.concat([base.loc[keep], delta], ignore_index=True)
+        new_h = pd.concat([old_h.loc[~old_h[KEY].isin(delta[KEY])], delta_h], ignore_index=True)
+        if WATERMARK_COL in base.columns:
+            order = np.argsort(pd.to_datetime(base[WATERMARK_COL], errors="coerce").to_numpy(), kind="stable")
+            base = base.iloc[order].reset_index(drop=True)
+        last_full_refresh = state["last_full_refresh"]
+        delta_rows = int(len(delta))
+
+    new_state = {
+        "fecha_minuta_max": _max_fecha(base),
+        "last_full_refresh": last_full_refresh,
+        "rows": int(len(base)),
+        "updated_at": ts(),
+    }
+    _save(cache_dir, base, new_h, new_state)
+
+    metrics = {
+        "mode": "full_refresh" if full else "incremental",
+        "lower_bound": None if lower_bound is None else lower_bound.isoformat(),
+        "delta_rows": delta_rows,
+        "rows_new": new,
+        "rows_changed": changed,
+        "proformas_deleted": deleted,
+        "base_rows": int(len(base)),
+        "fecha_minuta_max": new_state["fecha_minuta_max"],
+        "last_full_refresh": last_full_refresh,
+    }
+    return base, metrics
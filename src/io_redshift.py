@@ -1,28 +1,20 @@
+from __future__ import annotations
+
+import hashlib
+import json
 import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterator
+
 import pandas as pd
-import redshift_connector
 from dotenv import load_dotenv
 load_dotenv()  # carga el archivo .env al entorno
 
-def read_redshift_query(sql: str) -> pd.DataFrame:
-    conn = redshift_connector.connect(
-        host=os.environ["REDSHIFT_HOST"],
-        port=int(os.environ.get("REDSHIFT_PORT", "5439")),
-        database=os.environ["REDSHIFT_DB"],
-        user=os.environ["REDSHIFT_USER"],
-        password=os.environ["REDSHIFT_PASSWORD"],
-    )
-    try:
-        with conn.cursor() as cur:
-            cur.execute(sql)
-            cols = [c[0] for c in cur.description]
-            rows = cur.fetchall()
-        return pd.DataFrame(rows, columns=cols)
-    finally:
-        conn.close()
-
-import os
-
 def _get_int_env(name: str, default: int) -> int:
     raw = os.environ.get(name, "")
     raw = str(raw).strip().strip('"').strip("'")
@@ -33,21 +25,496 @@ def _get_int_env(name: str, default: int) -> int:
     except ValueError as e:
         raise ValueError(f"{name} must be an integer. Got: {raw!r}") from e
 
-from __future__ import annotations
-
-import os
-import pandas as pd
-import psycopg2
+def _connect():
+    import psycopg2  # solo al abrir la conexión: importar el módulo no exige el driver
 
-def read_sql(query: str) -> pd.DataFrame:
-    conn = psycopg2.connect(
+    return psycopg2.connect(
         host=os.environ["REDSHIFT_HOST"],
         port=int(os.environ.get("REDSHIFT_PORT", "5439")),
         dbname=os.environ["REDSHIFT_DB"],
         user=os.environ["REDSHIFT_USER"],
         password=os.environ["REDSHIFT_PASSWORD"],
+        connect_timeout=_get_int_env("REDSHIFT_CONNECT_TIMEOUT", 10),
     )
+
+class QueryCancelled(RuntimeError):
+    pass
+
+class CancelToken:
+    """Aborta desde otro hilo las queries en curso: psycopg2 `conn.cancel()` (sqlite3: `interrupt()`)."""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._conns: list = []
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self) -> None:
+        with self._lock:
+            self._event.set()
+            conns = list(self._conns)
+        for conn in conns:
+            abort = getattr(conn, "cancel", None) or getattr(conn, "interrupt", None)
+            if abort is None:
+                continue
+            try:
+                abort()
+            except Exception:
+                pass  # la conexión pudo cerrarse entre medio
+
+    def wait(self, seconds: float) -> bool:
+        # espera interrumpible (backoff entre reintentos); True si se canceló entre medio
+        return self._event.wait(seconds)
+
+    def check(self) -> None:
+        if self.cancelled:
+            raise QueryCancelled("Extracción cancelada.")
+
+    @contextmanager
+    def bind(self, conn):
+        with self._lock:
+            self._conns.append(conn)
+        try:
+            self.check()
+            yield conn
+        except QueryCancelled:
+            raise
+        except Exception as e:
+            # el driver ve la cancelación como error de query ("canceling statement due to user request")
+            if self.cancelled:
+                raise QueryCancelled("Extracción cancelada.") from e
+            raise
+        finally:
+            with self._lock:
+                self._conns.remove(conn)
+
+@contextmanager
+def _maybe_bind(conn, cancel: CancelToken | None):
+    if cancel is None:
+        yield conn
+    else:
+        with cancel.bind(conn):
+            yield conn
+
+# OIDs de postgres/redshift (cursor.description[i][1]) -> tipo arrow
+_OID_TYPES = {
+    16: "bool",
+    20: "int64", 21: "int64", 23: "int64",
+    700: "float64", 701: "float64", 1700: "float64",
+    1082: "date32",
+    1114: "timestamp",
+    1184: "timestamptz",
+    25: "string", 1042: "string", 1043: "string",
+}
+
+def _arrow_type(name: str):
+    import pyarrow as pa
+    return {
+        "bool": pa.bool_(),
+        "int64": pa.int64(),
+        "float64": pa.float64(),
+        "date32": pa.date32(),
+        "timestamp": pa.timestamp("us"),
+        "timestamptz": pa.timestamp("us", tz="UTC"),
+        "string": pa.string(),
+    }[name]
+
+def _batch_schema(description, first: pd.DataFrame):
+    # tipos desde el catálogo cuando el driver los expone; si no (sqlite en pruebas locales),
+    # se infieren del primer batch y las columnas todo-null quedan como string
+    import pyarrow as pa
+    inferred = pa.Schema.from_pandas(first, preserve_index=False)
+    fields = []
+    for col, desc in zip(first.columns, description):
+        name = _OID_TYPES.get(desc[1]) if isinstance(desc[1], int) else None
+        if name is not None:
+            t = _arrow_type(name)
+        else:
+            t = inferred.field(col).type
+            if pa.types.is_null(t):
+                t = pa.string()
+        fields.append(pa.field(col, t))
+    return pa.schema(fields)
+
+def _stream_cursor(conn):
+    # psycopg2: cursor con nombre = server-side (DECLARE ... CURSOR), no baja todo el resultado.
+    # otros drivers DB-API (sqlite3) no aceptan name -> cursor normal + fetchmany
+    try:
+        return conn.cursor(name="extract_stream")
+    except TypeError:
+        return conn.cursor()
+
+
+# --- pool de conexiones ---
+
+class _Pool:
+    """Pool LIFO thread-safe de conexiones DB-API; a lo más `size` en uso a la vez (el resto espera).
+
+    Una conexión vuelve al pool con rollback (no quedan transacciones abiertas en el cluster); si el
+    rollback falla (conexión caída) se descarta. Tras un fork las conexiones del padre se olvidan.
+    """
+
+    def __init__(self, connect: Callable, size: int):
+        self._connect = connect
+        self.size = max(1, size)
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self._idle: list = []
+        self._pid = os.getpid()
+        self.created = self.reused = self.discarded = 0
+
+    def _checkout(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                # proceso hijo (pool de particiones): el socket es del padre, no se cierra desde acá
+                self._idle, self._pid = [], os.getpid()
+            while self._idle:
+                conn = self._idle.pop()
+                if not getattr(conn, "closed", 0):
+                    self.reused += 1
+                    return conn
+                self.discarded += 1
+            self.created += 1
+        return self._connect()
+
+    def _checkin(self, conn) -> None:
+        try:
+            conn.rollback()
+            keep = not getattr(conn, "closed", 0)
+        except Exception:
+            keep = False
+        with self._lock:
+            if keep and self._pid == os.getpid() and len(self._idle) < self.size:
+                self._idle.append(conn)
+                return
+            self.discarded += 1
+        _close(conn)
+
+    @contextmanager
+    def connection(self):
+        with self._slots:
+            conn = self._checkout()
+            try:
+                yield conn
+            finally:
+                self._checkin(conn)
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            _close(conn)
+
+def _close(conn) -> None:
     try:
-        return pd.read_sql_query(query, conn)
-    finally:
         conn.close()
+    except Exception:
+        pass
+
+# --- cache de resultados en disco ---
+
+_SQL_TOKENS = re.compile(r"('(?:[^']|'')*')|(--[^\n]*)|(/\*.*?\*/)|(\s+)", re.DOTALL)
+
+def normalize_sql(sql: str) -> str:
+    # sin comentarios ni espacios redundantes; los literales '...' quedan tal cual
+    out = _SQL_TOKENS.sub(lambda m: m.group(1) or " ", sql)
+    # segunda pasada: un comentario pegado a un salto de línea deja dos espacios
+    return _SQL_TOKENS.sub(lambda m: m.group(1) or " ", out).strip().rstrip(";").strip()
+
+class _QueryCache:
+    """Resultados en `<dir>/<sha256>.parquet` + `.json` (fecha, sql, filas); vencen a los `ttl` segundos."""
+
+    def __init__(self, path: Path, ttl: int):
+        self.path = Path(path)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.writes = self.expired = 0
+
+    def key(self, kind: str, sql: str, params) -> str:
+        raw = json.dumps({"kind": kind, "sql": normalize_sql(sql), "params": params},
+                         sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _files(self, key: str) -> tuple[Path, Path]:
+        return self.path / f"{key}.parquet", self.path / f"{key}.json"
+
+    def get(self, key: str) -> Path | None:
+        data, meta = self._files(key)
+        try:
+            created = json.loads(meta.read_text(encoding="utf-8"))["created"]
+        except (OSError, ValueError, KeyError):
+            created = None
+        with self._lock:
+            if created is None or not data.exists():
+                self.misses += 1
+                return None
+            if time.time() - created > self.ttl:
+                self.misses += 1
+                self.expired += 1
+                stale = True
+            else:
+                self.hits += 1
+                stale = False
+        if stale:
+            meta.unlink(missing_ok=True)
+            data.unlink(missing_ok=True)
+            return None
+        return data
+
+    @contextmanager
+    def writing(self, key: str, sql: str):
+        # escribe a un .tmp y publica con os.replace: un lector (otro proceso) no ve archivos a medias
+        self.path.mkdir(parents=True, exist_ok=True)
+        data, meta = self._files(key)
+        tmp = data.with_name(f"{data.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        info: dict = {}
+        try:
+            yield tmp, info
+            os.replace(tmp, data)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+        meta.write_text(json.dumps({"created": time.time(), "sql": normalize_sql(sql)[:500], **info},
+                                   ensure_ascii=False), encoding="utf-8")
+        with self._lock:
+            self.writes += 1
+
+# --- cliente ---
+
+# clases de error de conexión (psycopg2/redshift_connector/sqlite3): se reintentan con backoff
+_TRANSIENT = {"OperationalError", "InterfaceError"}
+
+def _is_transient(e: BaseException) -> bool:
+    if isinstance(e, QueryCancelled):
+        return False
+    if isinstance(e, (ConnectionError, TimeoutError)):
+        return True
+    return any(c.__name__ in _TRANSIENT for c in type(e).__mro__)
+
+def _execute(cur, sql: str, params) -> None:
+    # sin params no se pasa la tupla: psycopg2 interpretaría los % de la SQL
+    if params is None:
+        cur.execute(sql)
+    else:
+        cur.execute(sql, params)
+
+class RedshiftClient:
+    """Cliente único del warehouse: pool de conexiones, queries parametrizadas, reintentos y cache local.
+
+    - `connect`: callable sin argumentos que abre una conexión DB-API (default: Redshift vía psycopg2
+      con las variables `REDSHIFT_*`; para pruebas sirve un postgres local o sqlite3).
+    - reintenta errores transitorios (conexión caída, timeouts) con backoff exponencial + jitter.
+    - `cache_dir` + `cache_ttl` > 0: el resultado de cada query (SQL normalizada + params) se guarda
+      en parquet y se reusa hasta que vence; pensado para corridas repetidas en dev/CI.
+    """
+
+    def __init__(self, connect: Callable | None = None, pool_size: int | None = None,
+                 retries: int | None = None, backoff_ms: int | None = None,
+                 cache_dir: Path | str | None = None, cache_ttl: int | None = None):
+        self.connect = connect or _connect
+        self.pool = _Pool(self.connect, pool_size if pool_size is not None else _get_int_env("REDSHIFT_POOL_SIZE", 4))
+        self.retries = retries if retries is not None else _get_int_env("REDSHIFT_RETRIES", 3)
+        self.backoff = (backoff_ms if backoff_ms is not None else _get_int_env("REDSHIFT_RETRY_BACKOFF_MS", 500)) / 1000
+        cache_dir = cache_dir or os.environ.get("REDSHIFT_CACHE_DIR") or None
+        cache_ttl = cache_ttl if cache_ttl is not None else _get_int_env("REDSHIFT_CACHE_TTL", 0)
+        self.cache = _QueryCache(Path(cache_dir), cache_ttl) if cache_dir and cache_ttl > 0 else None
+        self._lock = threading.Lock()
+        self.queries = self.retried = 0
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _sleep(self, attempt: int, cancel: CancelToken | None) -> None:
+        delay = min(30.0, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+        if cancel is not None:
+            if cancel.wait(delay):
+                cancel.check()
+        else:
+            time.sleep(delay)
+
+    def _with_retries(self, fn: Callable, cancel: CancelToken | None):
+        attempt = 0
+        while True:
+            try:
+                return fn()
+            except Exception as e:
+                if attempt >= self.retries or not _is_transient(e) or (cancel is not None and cancel.cancelled):
+                    raise
+            self._sleep(attempt, cancel)
+            attempt += 1
+            self._count("retried")
+
+    def _fetch(self, sql: str, params, cancel: CancelToken | None) -> pd.DataFrame:
+        with self.pool.connection() as conn, _maybe_bind(conn, cancel):
+            cur = conn.cursor()
+            try:
+                _execute(cur, sql, params)
+                cols = [c[0] for c in cur.description]
+                rows = cur.fetchall()
+            finally:
+                cur.close()
+        return pd.DataFrame.from_records(rows, columns=cols, coerce_float=True)
+
+    def query(self, sql: str, params=None, cancel: CancelToken | None = None, cache: bool = True) -> pd.DataFrame:
+        """Resultado completo de `sql` (params con el paramstyle del driver: `%(x)s` en psycopg2)."""
+        key = self.cache.key("frame", sql, params) if cache and self.cache is not None else None
+        if key is not None:
+            hit = self.cache.get(key)
+            if hit is not None:
+                return pd.read_parquet(hit)
+        self._count("queries")
+        df = self._with_retries(lambda: self._fetch(sql, params, cancel), cancel)
+        if key is not None:
+            try:
+                with self.cache.writing(key, sql) as (tmp, info):
+                    df.to_parquet(tmp, index=False)
+                    info["rows"] = len(df)
+            except (ValueError, TypeError, ImportError):
+                pass  # columnas object con tipos mezclados no van a parquet: se devuelve sin cachear
+        return df
+
+    def _stream(self, sql: str, batch_size: int, params, cancel: CancelToken | None) -> Iterator:
+        import pyarrow as pa
+
+        with self.pool.connection() as conn, _maybe_bind(conn, cancel):
+            cur = _stream_cursor(conn)
+            try:
+                if hasattr(cur, "itersize"):
+                    cur.itersize = batch_size
+                _execute(cur, sql, params)
+                schema = None
+                while True:
+                    rows = cur.fetchmany(batch_size)
+                    if cancel is not None:
+                        cancel.check()
+                    # en psycopg2 la description del cursor con nombre existe recién tras el primer fetch
+                    cols = [c[0] for c in cur.description]
+                    if not rows and schema is not None:
+                        break
+                    chunk = pd.DataFrame.from_records(rows, columns=cols, coerce_float=True)
+                    if schema is None:
+                        schema = _batch_schema(cur.description, chunk)
+                    yield pa.Table.from_pandas(chunk, schema=schema, preserve_index=False, safe=False)
+                    if not rows:
+                        break
+            finally:
+                cur.close()
+
+    def _stream_retrying(self, sql: str, batch_size: int, params, cancel: CancelToken | None) -> Iterator:
+        # solo se reintenta si falla antes del primer batch: después el consumidor ya escribió filas
+        attempt = 0
+        while True:
+            started = False
+            try:
+                for table in self._stream(sql, batch_size, params, cancel):
+                    started = True
+                    yield table
+                return
+            except Exception as e:
+                if (started or attempt >= self.retries or not _is_transient(e)
+                        or (cancel is not None and cancel.cancelled)):
+                    raise
+            self._sleep(attempt, cancel)
+            attempt += 1
+            self._count("retried")
+
+    def iter_batches(self, sql: str, batch_size: int, params=None, cancel: CancelToken | None = None,
+                     cache: bool = True) -> Iterator:
+        """`sql` en tablas arrow tipadas de hasta `batch_size` filas (cursor server-side)."""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        key = self.cache.key("batches", sql, params) if cache and self.cache is not None else None
+        if key is not None:
+            hit = self.cache.get(key)
+            if hit is not None:
+                pf = pq.ParquetFile(hit)
+                if pf.metadata.num_rows == 0:
+                    yield pf.schema_arrow.empty_table()
+                for batch in pf.iter_batches(batch_size=batch_size):
+                    yield pa.Table.from_batches([batch])
+                return
+        self._count("queries")
+        tables = self._stream_retrying(sql, batch_size, params, cancel)
+        if key is None:
+            yield from tables
+            return
+        with self.cache.writing(key, sql) as (tmp, info):
+            writer = None
+            rows = 0
+            try:
+                for table in tables:
+                    if writer is None:
+                        writer = pq.ParquetWriter(tmp, table.schema)
+                    writer.write_table(table)
+                    rows += table.num_rows
+                    yield table
+            finally:
+                if writer is not None:
+                    writer.close()
+            info["rows"] = rows
+
+    def stats(self) -> dict:
+        """Contadores acumulados del proceso (van a las métricas de las etapas de extracción)."""
+        out = {"queries": self.queries, "retries": self.retried, "pool_size": self.pool.size,
+               "connections_created": self.pool.created, "connections_reused": self.pool.reused,
+               "connections_discarded": self.pool.discarded}
+        if self.cache is not None:
+            out.update({"cache_ttl": self.cache.ttl, "cache_hits": self.cache.hits,
+                        "cache_misses": self.cache.misses, "cache_writes": self.cache.writes,
+                        "cache_expired": self.cache.expired})
+        return out
+
+    def close(self) -> None:
+        self.pool.close()
+
+_COUNTERS = {"queries", "retries", "connections_created", "connections_reused", "connections_discarded",
+             "cache_hits", "cache_misses", "cache_writes", "cache_expired"}
+
+def stats_delta(before: dict, after: dict) -> dict:
+    # contadores de una etapa: diferencia entre dos `stats()` (el cliente es compartido por el proceso)
+    return {k: v - before.get(k, 0) if k in _COUNTERS else v for k, v in after.items()}
+
+_CLIENT: RedshiftClient | None = None
+_CLIENT_ARGS: dict = {}
+_CLIENT_LOCK = threading.Lock()
+
+def configure(**kwargs) -> RedshiftClient:
+    """Reconfigura el cliente por defecto del proceso (kwargs de `RedshiftClient`); mismo config = mismo cliente.
+
+    Las opciones se suman a las ya configuradas: `configure(cache_dir=...)` conserva un `connect` / `pool_size`
+    puesto antes (ej. una fábrica local). `reset=True` parte de los defaults.
+    """
+    global _CLIENT, _CLIENT_ARGS
+    reset = kwargs.pop("reset", False)
+    with _CLIENT_LOCK:
+        args = dict(kwargs) if reset else {**_CLIENT_ARGS, **kwargs}
+        if _CLIENT is not None and args == _CLIENT_ARGS:
+            return _CLIENT
+        if _CLIENT is not None:
+            _CLIENT.close()
+        _CLIENT, _CLIENT_ARGS = RedshiftClient(**args), args
+        return _CLIENT
+
+def get_client() -> RedshiftClient:
+    global _CLIENT
+    with _CLIENT_LOCK:
+        if _CLIENT is None:
+            _CLIENT = RedshiftClient()
+        return _CLIENT
+
+def read_sql(query: str, cancel: CancelToken | None = None, params=None) -> pd.DataFrame:
+    return get_client().query(query, params=params, cancel=cancel)
+
+# nombre del conector anterior (redshift_connector); ahora pasa por el mismo cliente
+read_redshift_query = read_sql
+
+def iter_sql_batches(query: str, batch_size: int, connect: Callable | None = None,
+                     cancel: CancelToken | None = None, params=None) -> Iterator:
+    """Ejecuta `query` y devuelve el resultado en tablas arrow tipadas de hasta `batch_size` filas."""
+    client = get_client() if connect is None else RedshiftClient(connect, pool_size=1)
+    return client.iter_batches(query, batch_size, params=params, cancel=cancel)
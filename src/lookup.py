@@ -0,0 +1,278 @@
+from __future__ import annotations
+import argparse
+import json
+import sys
+import threading
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from .cobranzas.schema import CENTS, as_cents, to_display
+from .stages import find_table, read_table, ts
+
+REPORT = "cobranzas_report"
+ITEMS = "cobranzas_items_report"
+# el transform escribe su stage json después de las tablas: es la marca de "snapshot completo"
+STAGE_JSON = "stage_transform_cobranzas.json"
+INDEXED = ("codigo_proforma", "documento_cliente", "asesor", "proyecto")
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 10_000
+
+def _key(v) -> str | None:
+    return None if v is None or v is pd.NA or (isinstance(v, float) and np.isnan(v)) else str(v).strip()
+
+def _json_rows(df: pd.DataFrame) -> list[bytes]:
+    # cada fila serializada una vez al cargar (montos en soles): responder = unir bytes
+    if df.empty:
+        return []
+    text = to_display(df).to_json(orient="records", lines=True, date_format="iso", force_ascii=False)
+    return [line.encode("utf-8") for line in text.splitlines()]
+
+def _artifact(out_dir: Path, name: str) -> Path | None:
+    # el archivo que escribió el último transform (tras cambiar --format queda el de otro formato, viejo)
+    stage = out_dir / STAGE_JSON
+    if not stage.exists():
+        return find_table(out_dir, name)
+    try:
+        art = (json.loads(stage.read_text(encoding="utf-8")).get("artifacts") or {}).get(name)
+    except ValueError:  # stage json a medio escribir: se reintenta en el próximo poll
+        return None
+    if art is None:
+        return None
+    # el artefacto vive en out_dir (la ruta del json puede ser relativa al cwd del pipeline)
+    p = out_dir / Path(art["path"]).name
+    return p if p.exists() else None
+
+def _read(path: Path) -> pd.DataFrame:
+    if path.suffix.lower() == ".csv":
+        # csv: claves como texto (documento_cliente con ceros a la izquierda)
+        return pd.read_csv(path, dtype={c: str for c in INDEXED})
+    return read_table(path, memory_map=False)
+
+def _hash_index(df: pd.DataFrame, col: str) -> dict[str, np.ndarray]:
+    # valor -> posiciones (ascendentes) de sus filas
+    if col not in df.columns:
+        return {}
+    codes, uniques = pd.factorize(df[col].astype(object).map(_key), use_na_sentinel=True)
+    order = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+    return {u: order[bounds[i]:bounds[i + 1]] for i, u in enumerate(uniques) if u is not None}
+
+class LookupIndex:
+    """Reporte de cobranzas en memoria con índices hash; inmutable (el reload arma uno nuevo).
+
+    Las filas quedan ordenadas por deuda desc: las posiciones de cada índice ya vienen en ese orden,
+    así que filtrar = intersectar arrays y el límite es un slice.
+    """
+
+    def __init__(self, report: pd.DataFrame, items: pd.DataFrame | None = None, source: str = "",
+                 version: int = 0):
+        # deuda en céntimos con la regla de schema (Int64 = céntimos; el csv trae soles)
+        deuda = as_cents(report["deuda_pendiente"].reset_index(drop=True))
+        deuda = deuda.sort_values(ascending=False, kind="stable", na_position="last")
+        report = report.iloc[deuda.index.to_numpy()].reset_index(drop=True)
+        self.rows = _json_rows(report)
+        self.deuda = deuda.fillna(0).to_numpy(dtype=np.int64)
+        self.indexes = {c: _hash_index(report, c) for c in INDEXED}
+        self.items = _json_rows(items) if items is not None else []
+        self.items_by_proforma = _hash_index(items, "codigo_proforma") if items is not None else {}
+        self.source = source
+        self.version = version
+        self.loaded_at = ts()
+
+    @classmethod
+    def load(cls, out_dir: Path, version: int = 0) -> "LookupIndex":
+        path = _artifact(out_dir, REPORT)
+        if path is None:
+            raise FileNotFoundError(f"No hay {REPORT} en {out_dir}")
+        items_path = _artifact(out_dir, ITEMS)
+        items = _read(items_path) if items_path is not None else None
+        return cls(_read(path), items, source=str(path), version=version)
+
+    def info(self) -> dict:
+        return {"rows": len(self.rows), "items": len(self.items), "source": self.source,
+                "version": self.version, "loaded_at": self.loaded_at,
+                "indexes": {c: len(ix) for c, ix in self.indexes.items()}}
+
+    def select(self, filters: dict[str, str], con_deuda: bool = False) -> np.ndarray:
+        """Posiciones que cumplen todos los filtros (igualdad sobre columnas indexadas)."""
+        unknown = set(filters) - set(INDEXED)
+        if unknown:
+            raise ValueError(f"Filtros no indexados: {sorted(unknown)} (usa {', '.join(INDEXED)})")
+        # primero el filtro más selectivo: la intersección nunca es más grande que él
+        hits = sorted((self.indexes[c].get(v.strip(), np.empty(0, dtype=np.int64)) for c, v in filters.items()),
+                      key=len)
+        pos = hits[0] if hits else np.arange(len(self.rows))
+        for other in hits[1:]:
+            if not len(pos):
+                break
+            pos = pos[np.isin(pos, other, assume_unique=True)]
+        if con_deuda:
+            pos = pos[self.deuda[pos] > 0]
+        return pos
+
+    def proforma(self, codigo: str) -> bytes | None:
+        pos = self.indexes["codigo_proforma"].get(codigo.strip())
+        if pos is None or not len(pos):
+            return None
+        items = self.items_by_proforma.get(codigo.strip(), ())
+        return (b'{"proforma":' + self.rows[pos[0]] + b',"items":['
+                + b",".join(self.items[i] for i in items) + b"]}")
+
+    def search(self, filters: dict[str, str], con_deuda: bool = False, limit: int = DEFAULT_LIMIT) -> bytes:
+        pos = self.select(filters, con_deuda)
+        head = json.dumps({"total": int(len(pos)), "deuda_pendiente": int(self.deuda[pos].sum()) / CENTS,
+                           "limit": limit}, ensure_ascii=False)
+        return (head[:-1].encode("utf-8") + b',"rows":['
+                + b",".join(self.rows[i] for i in pos[:limit]) + b"]}")
+
+class LookupService:
+    """Índice vigente + recarga en caliente cuando aparece un reporte nuevo en `out_dir`.
+
+    El reload arma el índice nuevo aparte y lo publica con una sola asignación; cada request toma
+    la referencia al empezar, así que los requests en curso terminan sobre el índice anterior.
+    """
+
+    def __init__(self, out_dir: Path, interval: float = 2.0):
+        self.out_dir = Path(out_dir)
+        self.interval = interval
+        self.index: LookupIndex | None = None
+        self.reloads = 0
+        self.last_error: str | None = None
+        self._signature = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def _current_signature(self):
+        paths = [self.out_dir / STAGE_JSON, _artifact(self.out_dir, REPORT), _artifact(self.out_dir, ITEMS)]
+        sig = []
+        for p in paths:
+            try:
+                st = p.stat() if p is not None else None
+            except FileNotFoundError:
+                st = None
+            sig.append((str(p), st.st_mtime_ns, st.st_size) if st else None)
+        return tuple(sig)
+
+    def reload(self, force: bool = False) -> bool:
+        """Carga el reporte si cambió; un archivo a medio escribir falla y se reintenta en el próximo poll."""
+        sig = self._current_signature()
+        if not force and sig == self._signature:
+            return False
+        try:
+            new = LookupIndex.load(self.out_dir, version=self.reloads + 1)
+        except Exception as e:  # noqa: BLE001 — se mantiene el índice anterior
+            self.last_error = f"{type(e).__name__}: {e}"
+            return False
+        # recién publicado si nada cambió mientras se cargaba (si no, el próximo poll lo vuelve a cargar)
+        if self._current_signature() != sig:
+            return False
+        self.index, self._signature = new, sig
+        self.reloads += 1
+        self.last_error = None
+        return True
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.interval):
+            if self.reload():
+                print(f"[lookup] recargado v{self.index.version}: {len(self.index.rows):,} filas")
+
+    def start(self) -> None:
+        self.reload(force=True)
+        self._thread = threading.Thread(target=self._watch, name="lookup-reload", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    # headers y body salen en writes separados: con Nagle + delayed ACK cada respuesta espera ~40 ms
+    disable_nagle_algorithm = True
+    service: LookupService
+
+    def log_message(self, format, *args):  # noqa: A002 — sin log por request (ruido y latencia)
+        pass
+
+    def _send(self, status: int, body: bytes) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status: int, msg: str) -> None:
+        self._send(status, json.dumps({"error": msg}, ensure_ascii=False).encode("utf-8"))
+
+    def do_GET(self):  # noqa: N802
+        url = urlsplit(self.path)
+        parts = [unquote(p) for p in url.path.strip("/").split("/") if p]
+        index = self.service.index  # una sola lectura: el reload no afecta a este request
+        if parts == ["health"]:
+            info = {"status": "ok" if index else "sin_datos", "reloads": self.service.reloads,
+                    "last_error": self.service.last_error, **(index.info() if index else {})}
+            return self._send(HTTPStatus.OK, json.dumps(info, ensure_ascii=False).encode("utf-8"))
+        if index is None:
+            return self._error(HTTPStatus.SERVICE_UNAVAILABLE, "reporte aún no cargado")
+        if len(parts) == 2 and parts[0] == "proforma":
+            body = index.proforma(parts[1])
+            if body is None:
+                return self._error(HTTPStatus.NOT_FOUND, f"proforma {parts[1]!r} no existe")
+            return self._send(HTTPStatus.OK, body)
+        if len(parts) == 2 and parts[0] == "cliente":
+            return self._send(HTTPStatus.OK, index.search({"documento_cliente": parts[1]}, limit=MAX_LIMIT))
+        if parts == ["buscar"]:
+            q = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            try:
+                limit = min(int(q.pop("limit", DEFAULT_LIMIT)), MAX_LIMIT)
+                con_deuda = q.pop("con_deuda", "0").lower() in ("1", "true", "si", "sí")
+                return self._send(HTTPStatus.OK, index.search(q, con_deuda, limit))
+            except ValueError as e:
+                return self._error(HTTPStatus.BAD_REQUEST, str(e))
+        return self._error(HTTPStatus.NOT_FOUND, "rutas: /health, /proforma/<codigo>, /cliente/<documento>, "
+                                                 "/buscar?asesor=&proyecto=&documento_cliente=&con_deuda=1&limit=")
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # backlog de listen (default 5): con más clientes que eso, los SYN de sobra se reintentan a 1 s
+    request_queue_size = 128
+
+def make_server(service: LookupService, host: str = "127.0.0.1", port: int = 8765) -> ThreadingHTTPServer:
+    handler = type("LookupHandler", (_Handler,), {"service": service})
+    return _Server((host, port), handler)
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description="Consulta local (HTTP/JSON) del último reporte de cobranzas")
+    ap.add_argument("--out", default="artifacts", help="carpeta con cobranzas_report.* (salida del pipeline)")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--reload-interval", type=float, default=2.0, help="segundos entre chequeos de reporte nuevo")
+    args = ap.parse_args(argv)
+
+    service = LookupService(Path(args.out), args.reload_interval)
+    t0 = time.perf_counter()
+    service.start()
+    if service.index is None:
+        print(f"ATENCIÓN: sin reporte en {args.out} ({service.last_error}); se carga cuando aparezca")
+    else:
+        print(f"[lookup] {len(service.index.rows):,} filas cargadas en {time.perf_counter() - t0:.2f}s")
+    server = make_server(service, args.host, args.port)
+    print(f"[lookup] escuchando en http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+from __future__ import annotations
+import argparse
+import http.client
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+from urllib.parse import quote, urlencode, urlsplit
+
+import numpy as np
+
+from .stages import find_table, read_table
+from .lookup import REPORT, LookupService, make_server
+
+# mezcla de consultas: (tipo, peso)
+MIX = (("proforma", 0.6), ("cliente", 0.25), ("buscar", 0.15))
+
+def _paths(out_dir: Path, n: int, seed: int) -> list[str]:
+    # rutas con claves reales del reporte (proformas, documentos, asesor × proyecto)
+    path = find_table(out_dir, REPORT)
+    if path is None:
+        raise FileNotFoundError(f"No hay {REPORT} en {out_dir}")
+    cols = ["codigo_proforma", "documento_cliente", "asesor", "proyecto"]
+    df = read_table(path, columns=cols).astype(object).dropna()
+    rng = np.random.default_rng(seed)
+    rows = df.iloc[rng.integers(0, len(df), n)].to_numpy()
+    kinds = rng.choice([k for k, _ in MIX], size=n, p=[w for _, w in MIX])
+    out = []
+    for kind, (proforma, documento, asesor, proyecto) in zip(kinds, rows):
+        if kind == "proforma":
+            out.append(f"/proforma/{quote(str(proforma))}")
+        elif kind == "cliente":
+            out.append(f"/cliente/{quote(str(documento))}")
+        else:
+            out.append("/buscar?" + urlencode({"asesor": asesor, "proyecto": proyecto, "con_deuda": 1, "limit": 20}))
+    return out
+
+def _worker(host: str, port: int, paths: list[str], latencies: list[float], errors: list[str],
+            deadline: float) -> None:
+    conn = http.client.HTTPConnection(host, port, timeout=10)  # keep-alive: una conexión por worker
+    for p in paths:
+        if time.perf_counter() > deadline:
+            break
+        t0 = time.perf_counter()
+        try:
+            conn.request("GET", p)
+            resp = conn.getresponse()
+            resp.read()
+            if resp.status >= 500:
+                errors.append(f"{resp.status} {p}")
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(f"{type(e).__name__} {p}")
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=10)
+            continue
+        latencies.append(time.perf_counter() - t0)
+    conn.close()
+
+def run_load(url: str, paths: list[str], concurrency: int, duration: float) -> dict:
+    u = urlsplit(url)
+    host, port = u.hostname or "127.0.0.1", u.port or 80
+    chunks = [paths[i::concurrency] for i in range(concurrency)]
+    lats: list[list[float]] = [[] for _ in chunks]
+    errors: list[str] = []
+    deadline = time.perf_counter() + duration
+    threads = [threading.Thread(target=_worker, args=(host, port, c, l, errors, deadline))
+               for c, l in zip(chunks, lats)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+    ms = np.array([x for l in lats for x in l]) * 1000
+    pct = {f"p{q}": round(float(np.percentile(ms, q)), 3) if len(ms) else None for q in (50, 90, 99, 99.9)}
+    return {"requests": int(len(ms)), "errors": len(errors), "error_samples": errors[:5],
+            "concurrency": concurrency, "wall_s": round(wall, 3), "rps": round(len(ms) / wall, 1) if wall else 0.0,
+            "latency_ms": {**pct, "max": round(float(ms.max()), 3) if len(ms) else None}}
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description="Prueba de carga del servicio de consulta (p50/p99 de latencia)")
+    ap.add_argument("--out", default="artifacts", help="carpeta del reporte (de ahí salen las claves a consultar)")
+    ap.add_argument("--url", default=None, help="servicio ya levantado (default: uno en proceso sobre --out)")
+    ap.add_argument("--requests", type=int, default=20_000)
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--duration", type=float, default=60.0, help="corta antes si pasa este tiempo (s)")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--json", default=None, help="guarda el resultado en este archivo")
+    args = ap.parse_args(argv)
+
+    out_dir = Path(args.out)
+    paths = _paths(out_dir, args.requests, args.seed)
+    server = service = None
+    url = args.url
+    if url is None:
+        # en proceso: cliente y servidor comparten el GIL, las latencias salen pesimistas
+        service = LookupService(out_dir)
+        service.start()
+        server = make_server(service, "127.0.0.1", 0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        result = {"url": url, **run_load(url, paths, args.concurrency, args.duration)}
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+            service.stop()
+
+    lat = result["latency_ms"]
+    print(f"{result['requests']:,} requests, {result['errors']} errores, {result['rps']:,} req/s "
+          f"(concurrencia {args.concurrency})")
+    print(f"latencia ms: p50 {lat['p50']}  p90 {lat['p90']}  p99 {lat['p99']}  p99.9 {lat['p99.9']}  max {lat['max']}")
+    if args.json:
+        Path(args.json).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.json).write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+    return 1 if result["errors"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+from __future__ import annotations
+import multiprocessing as mp
+import re
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from typing import Callable
+
+import pandas as pd
+
+# filtro de proyecto embebido en sql_minutas_base.sql: AND pr.nombre = 'Edificio Urbanzen'
+_PROYECTO_RE = re.compile(r"(pr\.nombre\s*=\s*)'((?:[^']|'')*)'", re.IGNORECASE)
+
+PROJECTS_QUERY = """
+SELECT codigo, nombre
+FROM grupocygnus.proyectos
+WHERE nombre IS NOT NULL
+ORDER BY nombre
+"""
+
+def with_proyecto(query: str, proyecto: str) -> str:
+    if not _PROYECTO_RE.search(query):
+        raise ValueError("La SQL no tiene el filtro `pr.nombre = '...'` para correr por proyecto.")
+    value = proyecto.replace("'", "''")
+    return _PROYECTO_RE.sub(lambda m: f"{m.group(1)}'{value}'", query, count=1)
+
+def discover_projects(read: Callable[[str], pd.DataFrame]) -> list[str]:
+    """Nombres de proyecto de grupocygnus.proyectos (una partición por proyecto)."""
+    df = read(PROJECTS_QUERY)
+    names = df["nombre"].dropna().astype(str).str.strip()
+    return sorted(set(names[names != ""]))
+
+def project_slug(proyecto: str) -> str:
+    # nombre de carpeta estable: sin tildes, minúsculas, [a-z0-9_]
+    ascii_ = unicodedata.normalize("NFKD", proyecto).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^a-z0-9]+", "_", ascii_.lower()).strip("_") or "proyecto"
+
+# semáforo entre procesos: cuántas particiones pueden tener una query abierta en Redshift a la vez
+_WAREHOUSE = None
+
+def _init_worker(sem) -> None:
+    global _WAREHOUSE
+    _WAREHOUSE = sem
+
+@contextmanager
+def warehouse_slot():
+    if _WAREHOUSE is None:
+        yield
+        return
+    with _WAREHOUSE:
+        yield
+
+def run_partitions(fn: Callable[[dict], dict], tasks: list[dict], workers: int | None = None,
+                   warehouse_slots: int = 2) -> list[dict]:
+    """Corre `fn(task)` por partición en un pool de procesos; una partición que falla no frena a las demás.
+
+    Devuelve un dict por task (en el orden de `tasks`) con `status` "ok"/"failed", `seconds` y el
+    resultado de `fn` o el `error`. `fn` debe ser una función de módulo (se serializa con pickle).
+    """
+    ctx = mp.get_context()
+    sem = ctx.BoundedSemaphore(max(1, warehouse_slots))
+    out: dict[int, dict] = {}
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                             initializer=_init_worker, initargs=(sem,)) as ex:
+        t0 = {}
+        futs = {}
+        for i, task in enumerate(tasks):
+            futs[ex.submit(fn, task)] = i
+            t0[i] = time.perf_counter()
+        for fut in as_completed(futs):
+            i = futs[fut]
+            # tiempo desde el submit (incluye la espera en cola del pool)
+            seconds = round(time.perf_counter() - t0[i], 3)
+            try:
+                out[i] = {"status": "ok", "seconds": seconds, **fut.result()}
+            except Exception as e:
+                out[i] = {"status": "failed", "seconds": seconds, "error": f"{type(e).__name__}: {e}"}
+    return [{**tasks[i], **out[i]} for i in range(len(tasks))]
@@ -0,0 +1,189 @@
+from __future__ import annotations
+import json
+import statistics
+import time
+from pathlib import Path
+
+from .stages import process_peak_rss_mb, ts
+
+# configuración global del run (main la setea desde --profile / --trace-memory)
+_CONFIG = {"profile_dir": None, "trace_memory": False}
+
+def configure(profile_dir: Path | None = None, trace_memory: bool = False) -> None:
+    _CONFIG["profile_dir"] = profile_dir
+    _CONFIG["trace_memory"] = trace_memory
+    if trace_memory:
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+class StagePerf:
+    """Mide una etapa: wall (monotónico), CPU del hilo, memoria pico, filas in/out y throughput.
+
+    Uso igual que `started = ts()` ... `finished = ts()`:
+
+        perf = StagePerf("transform_cobranzas", rows_in=len(ventas))
+        ...
+        StageResult(..., perf=perf.stop(rows_out=len(df)))
+
+    o como context manager (`with StagePerf(...) as perf:`; `perf.metrics` al salir).
+    CPU = `thread_time` (las etapas corren en hilos del DagRunner; no incluye procesos hijos).
+    RSS y tracemalloc son del proceso: `process_peak_rss_mb` es el high-water del proceso al terminar y
+    `rss_growth_mb` cuánto lo subió la etapa (0 si no superó el pico previo; con etapas en paralelo es compartido).
+    """
+
+    def __init__(self, name: str, rows_in: int | None = None):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out: int | None = None
+        self.metrics: dict = {}
+        self._profiler = None
+        self._t0 = time.perf_counter()
+        self._c0 = time.thread_time()
+        self._rss0 = process_peak_rss_mb()
+        if _CONFIG["trace_memory"]:
+            import tracemalloc
+            tracemalloc.reset_peak()
+        if _CONFIG["profile_dir"] is not None:
+            import cProfile
+            self._profiler = cProfile.Profile()
+            # un solo profiler activo a la vez (sys.monitoring en 3.12+): con --profile el DAG corre en serie
+            self._profiler.enable()
+
+    def __enter__(self) -> StagePerf:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if not self.metrics:
+            self.stop()
+
+    def stop(self, rows_out: int | None = None) -> dict:
+        wall = time.perf_counter() - self._t0
+        cpu = time.thread_time() - self._c0
+        if rows_out is not None:
+            self.rows_out = rows_out
+        rss = process_peak_rss_mb()
+        m = {
+            "wall_s": round(wall, 4),
+            "cpu_s": round(cpu, 4),
+            "process_peak_rss_mb": rss,
+            "rss_growth_mb": round(rss - self._rss0, 1) if rss is not None else None,
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+        }
+        rows = self.rows_out if self.rows_out is not None else self.rows_in
+        m["rows_per_sec"] = round(rows / wall, 1) if rows and wall > 0 else None
+        if _CONFIG["trace_memory"]:
+            import tracemalloc
+            m["py_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+        if self._profiler is not None:
+            self._profiler.disable()
+            m["profile"] = str(_dump_profile(self._profiler, self.name))
+        self.metrics = m
+        return m
+
+def _dump_profile(profiler, name: str) -> Path:
+    import io
+    import pstats
+    d = Path(_CONFIG["profile_dir"])
+    d.mkdir(parents=True, exist_ok=True)
+    path = d / f"{name}.prof"
+    profiler.dump_stats(path)
+    # resumen legible al lado del .prof (abrir el .prof con snakeviz / pstats para el detalle)
+    buf = io.StringIO()
+    pstats.Stats(profiler, stream=buf).sort_stats("cumulative").print_stats(25)
+    path.with_suffix(".txt").write_text(buf.getvalue(), encoding="utf-8")
+    return path
+
+# --- perfil consolidado del run + histórico ---
+
+HISTORY_FILE = "run_history.jsonl"
+_TREND_BEGIN = "<!-- perf-trend:begin -->"
+_TREND_END = "<!-- perf-trend:end -->"
+# regresión = más de 1.5x la mediana y al menos esta diferencia absoluta (evita ruido en etapas de ms)
+_REGRESSION_RATIO = 1.5
+_REGRESSION_MIN_S = 0.25
+
+def write_run_profile(out_dir: Path, profile: dict, trend_runs: int = 10) -> Path:
+    """Escribe run_profile.json, lo agrega a run_history.jsonl y refresca la tabla de tendencia en INDEX.md."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    path = out_dir / "run_profile.json"
+    path.write_text(json.dumps(profile, ensure_ascii=False, indent=2, default=str), encoding="utf-8")
+    with (out_dir / HISTORY_FILE).open("a", encoding="utf-8") as f:
+        f.write(json.dumps(profile, ensure_ascii=False, default=str) + "\n")
+    update_index_trend(out_dir, trend_runs)
+    return path
+
+def load_history(out_dir: Path) -> list[dict]:
+    p = out_dir / HISTORY_FILE
+    if not p.exists():
+        return []
+    return [json.loads(line) for line in p.read_text(encoding="utf-8").splitlines() if line.strip()]
+
+def _baseline(history: list[dict], i: int, stage: str) -> float | None:
+    # mediana de las corridas anteriores a `i` en que la etapa efectivamente corrió
+    prev = [r["stages"][stage]["wall_s"] for r in history[:i]
+            if r.get("stages", {}).get(stage, {}).get("status") == "ran"]
+    return statistics.median(prev) if prev else None
+
+def _trend_md(history: list[dict], n: int) -> list[str]:
+    first = max(0, len(history) - n)
+    recent = history[first:]
+    stages = list(dict.fromkeys(s for r in recent for s in r.get("stages", {})))
+
+    md = []
+    md.append("| Run | Total (s) | " + " | ".join(stages) + " | Peak RSS proceso (MB) |")
+    md.append("|---|---:|" + "---:|" * len(stages) + "---:|")
+    for i in range(len(history) - 1, first - 1, -1):
+        r = history[i]
+        cells = []
+        for s in stages:
+            st = r.get("stages", {}).get(s)
+            if st is None:
+                cells.append("")
+            elif st.get("status") != "ran":
+                cells.append(st.get("status", ""))
+            else:
+                base = _baseline(history, i, s)
+                slow = base is not None and st["wall_s"] > _REGRESSION_RATIO * base and st["wall_s"] - base >= _REGRESSION_MIN_S
+                flag = " ⚠️" if slow else ""
+                cells.append(f"{st['wall_s']:.2f}{flag}")
+        md.append(f"| {r.get('started_at', '')} | {r.get('wall_seconds', 0):.2f} | " + " | ".join(cells)
+                  + f" | {r.get('process_peak_rss_mb', r.get('peak_rss_mb')) or ''} |")
+    md.append("")
+    md.append(f"⚠️ = más de {_REGRESSION_RATIO}× (y +{_REGRESSION_MIN_S}s) la mediana de corridas anteriores; `skipped`/`reused` = etapa no recalculada.")
+    return md
+
+def update_index_trend(out_dir: Path, n: int = 10) -> None:
+    history = load_history(out_dir)
+    if not history:
+        return
+    block = "\n".join([_TREND_BEGIN, "## ⏱️ Tendencia de performance (últimas corridas)", "",
+                       *_trend_md(history, n), _TREND_END])
+    index = out_dir / "INDEX.md"
+    text = index.read_text(encoding="utf-8") if index.exists() else "# 📦 Cygnus – Artefactos de Cobranzas\n"
+    if _TREND_BEGIN in text and _TREND_END in text:
+        head, rest = text.split(_TREND_BEGIN, 1)
+        text = head + block + rest.split(_TREND_END, 1)[1]
+    else:
+        text = text.rstrip("\n") + "\n\n" + block + "\n"
+    index.write_text(text, encoding="utf-8")
+
+def run_profile(report: dict, payloads: dict, started_at: str, wall: float, error: str | None = None) -> dict:
+    """Junta el reporte del DagRunner con el `perf` que cada etapa dejó en su stage json."""
+    stages = {}
+    for name, r in report.items():
+        perf = (payloads.get(name) or {}).get("perf") or {}
+        entry = {"status": r["status"], "start_s": r["start_s"], "wall_s": r["seconds"]}
+        if r["status"] == "ran":
+            entry.update(perf)
+        stages[name] = entry
+    rss = [s["process_peak_rss_mb"] for s in stages.values() if s.get("process_peak_rss_mb") is not None]
+    return {
+        "started_at": started_at,
+        "finished_at": ts(),
+        "wall_seconds": round(wall, 3),
+        "process_peak_rss_mb": max(rss) if rss else process_peak_rss_mb(),
+        "error": error,
+        "stages": stages,
+    }
@@ -1,59 +1,210 @@
 from __future__ import annotations
 import argparse
+import json
+import os
 from pathlib import Path
-from datetime import datetime
+from datetime import date
+import numpy as np
 import pandas as pd
 
-from .anonymize import anon_client, anon_unit
-
-from .io_redshift import read_sql
-from .stages import StageResult, write_stage_artifact, save_snapshot
+from .io_redshift import RedshiftClient, get_client, read_sql, stats_delta, _get_int_env, CancelToken
+from . import (allocation, cashflow, changes as changes_mod, engine_duckdb, incremental, io_redshift, partitions, rollup,
+               snapshots, risk, stages as stages_mod, validate)
+from .cobranzas import io_payments, render
+from .cobranzas.io_payments import load_pagos, list_payment_files, file_digests, _sha256
+from .cobranzas.schema import (CENTS, MONEY_COLUMNS, PRIORIDAD_BINS, PRIORIDAD_LABELS, apply_schema, as_cents,
+                               to_display, unify_dimension, memory_mb, memory_report, parse_dates, epoch_days)
+from .dag import DagRunner, Stage
+from .incremental import sync_base
+from .partitions import discover_projects, project_slug, run_partitions, warehouse_slot, with_proyecto
+from .changes import detect_changes, summarize_changes, CHANGE_TYPES
+from .rollup import Cube, build_cube
+from .snapshots import SnapshotStore
+from .perf import StagePerf, configure as configure_perf
+from .stages import (StageResult, write_stage_artifact, write_batches, write_table,
+                     read_table, artifact_path, ts, ARTIFACT_FORMATS)
 
 DEFAULT_SQL_PATH = Path(__file__).resolve().parents[1] / "sql_minutas_base.sql"
 
-def ts():
-    return datetime.utcnow().isoformat(timespec="seconds") + "Z"
+def extract_minutas(sql_path: Path, out_dir: Path, batch_size: int = 0, connect=None,
+                    incremental: bool = False, full_refresh: bool = False,
+                    full_refresh_days: int = 7, fmt: str = "parquet", csv: bool = False,
+                    cancel: CancelToken | None = None, read=None, proyecto: str | None = None) -> pd.DataFrame:
+    # read: callable(query) -> DataFrame en lugar de read_sql (lectores falsos/lentos en pruebas locales)
+    # proyecto: reemplaza el filtro `pr.nombre = '...'` de la SQL (None = la SQL tal cual)
+    if incremental:
+        return _extract_minutas_incremental(sql_path, out_dir, batch_size, connect, full_refresh,
+                                            full_refresh_days, fmt, csv, cancel, read, proyecto)
+    if batch_size > 0 and read is None:
+        return _extract_minutas_stream(sql_path, out_dir, batch_size, connect, fmt, csv, cancel, proyecto)
+    started = ts()
+    perf = StagePerf("extract_redshift_ventas")
+    query = _load_query(sql_path, proyecto)
+    client = _client(connect)
+    before = client.stats()
+    raw = _read_query(query, 0, client, cancel, read)
+    df = _ventas_schema(raw)
+    art = write_table(df, out_dir, "extract_ventas", fmt, csv)
+    finished = ts()
 
-def extract_minutas(sql_path: Path, out_dir: Path) -> pd.DataFrame:
+    metrics = {
+        "rows": int(len(df)),
+        "columns": list(df.columns),
+        "sql_path": str(sql_path),
+        "proyecto": proyecto,
+        "redshift": stats_delta(before, client.stats()),
+        **memory_report(raw, df),
+    }
+    write_stage_artifact(out_dir, StageResult("extract_redshift_ventas", started, finished, metrics,
+                                              {"extract_ventas": art}, perf.stop(rows_out=len(df))))
+    return df
+
+def _extract_minutas_stream(sql_path: Path, out_dir: Path, batch_size: int, connect=None,
+                            fmt: str = "parquet", csv: bool = False,
+                            cancel: CancelToken | None = None, proyecto: str | None = None) -> pd.DataFrame:
+    # cursor server-side + batches tipados escritos incrementalmente (no pasa por fetchall)
     started = ts()
+    perf = StagePerf("extract_redshift_ventas")
+    query = _load_query(sql_path, proyecto)
+    client = _client(connect)
+    before = client.stats()
+    stats = write_batches(client.iter_batches(query, batch_size, cancel=cancel), out_dir, "extract_ventas", fmt, csv)
+    stage_perf = perf.stop(rows_out=stats["rows"])
+    elapsed = stage_perf["wall_s"]
+    finished = ts()
+
+    # el artefacto queda con los tipos de la SQL (se escribe batch a batch); el esquema se aplica en memoria
+    raw = read_table(Path(stats["artifact"]["path"]))
+    df = _ventas_schema(raw)
+    metrics = {
+        "rows": stats["rows"],
+        "columns": list(df.columns),
+        "sql_path": str(sql_path),
+        "proyecto": proyecto,
+        "mode": "stream",
+        "batch_size": batch_size,
+        "batches": stats["batches"],
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": stage_perf["rows_per_sec"],
+        "process_peak_rss_mb": stage_perf["process_peak_rss_mb"],
+        "rss_growth_mb": stage_perf["rss_growth_mb"],
+        "redshift": stats_delta(before, client.stats()),
+        **memory_report(raw, df),
+    }
+    write_stage_artifact(out_dir, StageResult("extract_redshift_ventas", started, finished, metrics,
+                                              {"extract_ventas": stats["artifact"]}, stage_perf))
+    return df
+
+def _load_query(sql_path: Path, proyecto: str | None) -> str:
     query = sql_path.read_text(encoding="utf-8")
-    df = read_sql(query)
+    return query if proyecto is None else with_proyecto(query, proyecto)
+
+def _client(connect=None) -> RedshiftClient:
+    # connect: fábrica de conexiones propia (postgres/sqlite locales); None = cliente compartido del proceso
+    return get_client() if connect is None else RedshiftClient(connect)
+
+def _read_query(query: str, batch_size: int, client: RedshiftClient,
+                cancel: CancelToken | None = None, read=None) -> pd.DataFrame:
+    if read is not None:
+        return read(query)
+    if batch_size > 0:
+        import pyarrow as pa
+        return pa.concat_tables(client.iter_batches(query, batch_size, cancel=cancel)).to_pandas()
+    return client.query(query, cancel=cancel)
+
+def _extract_minutas_incremental(sql_path: Path, out_dir: Path, batch_size: int, connect,
+                                 full_refresh: bool, full_refresh_days: int,
+                                 fmt: str = "parquet", csv: bool = False,
+                                 cancel: CancelToken | None = None, read=None,
+                                 proyecto: str | None = None) -> pd.DataFrame:
+    # solo baja el delta desde el watermark y lo upsertea en la base cacheada en artifacts/cache/
+    started = ts()
+    perf = StagePerf("extract_redshift_ventas")
+    query = _load_query(sql_path, proyecto)
+    client = _client(connect)
+    before = client.stats()
+    raw, sync = sync_base(query, out_dir / "cache", lambda q: _read_query(q, batch_size, client, cancel, read),
+                          full_refresh_days=full_refresh_days, force_full=full_refresh)
+    df = _ventas_schema(raw)
+    art = write_table(df, out_dir, "extract_ventas", fmt, csv)
     finished = ts()
 
     metrics = {
         "rows": int(len(df)),
         "columns": list(df.columns),
         "sql_path": str(sql_path),
+        "proyecto": proyecto,
+        **sync,
+        "redshift": stats_delta(before, client.stats()),
+        **memory_report(raw, df),
     }
-    write_stage_artifact(out_dir, StageResult("extract_redshift_ventas", started, finished, metrics))
-    df.to_csv(out_dir / "extract_ventas.csv", index=False)
+    write_stage_artifact(out_dir, StageResult("extract_redshift_ventas", started, finished, metrics,
+                                              {"extract_ventas": art}, perf.stop(rows_out=len(df))))
     return df
 
-def extract_pagos(excel_path: Path, out_dir: Path) -> pd.DataFrame:
+def extract_pagos(excel_path: Path, out_dir: Path, workers: int | None = None,
+                  fmt: str = "parquet", csv: bool = False) -> pd.DataFrame:
     started = ts()
-    pagos = pd.read_excel(excel_path, sheet_name="pagos")
-    pagos.columns = [c.strip().lower() for c in pagos.columns]
+    perf = StagePerf("extract_excel_pagos")
+    # excel_path puede ser un archivo o una carpeta de excels mensuales; cache parquet por archivo
+    raw, files = load_pagos(excel_path, out_dir / "cache" / "pagos", workers=workers)
+    pagos = apply_schema(raw)
 
     required = {"codigo_proforma", "monto_pagado"}
     missing = sorted(list(required - set(pagos.columns)))
 
+    art = write_table(pagos, out_dir, "extract_pagos", fmt, csv)
     finished = ts()
     metrics = {
         "rows": int(len(pagos)),
         "missing_required_columns": missing,
         "excel_path": str(excel_path),
+        "cache_hits": sum(f["cache"] == "hit" for f in files),
+        "cache_misses": sum(f["cache"] == "miss" for f in files),
+        "files": files,
+        # montos con texto que apply_schema dejó en nulo (los lee la etapa validate)
+        "coercion_failures": validate.coercion_failures(raw, pagos, sorted(MONEY_COLUMNS & set(raw.columns))),
+        **memory_report(raw, pagos),
     }
-    write_stage_artifact(out_dir, StageResult("extract_excel_pagos", started, finished, metrics))
-    pagos.to_csv(out_dir / "extract_pagos.csv", index=False)
+    write_stage_artifact(out_dir, StageResult("extract_excel_pagos", started, finished, metrics,
+                                              {"extract_pagos": art}, perf.stop(rows_out=len(pagos))))
 
     if missing:
         raise ValueError(f"Excel pagos.xlsx no tiene columnas requeridas: {missing}")
     return pagos
 
+def validate_inputs(ventas: pd.DataFrame, pagos: pd.DataFrame, out_dir: Path, rules: dict[str, str] | None = None,
+                    sample: int | None = None, hoy=None) -> dict:
+    # reglas de calidad sobre ventas/pagos antes del join (ver validate.RULES); falla si alguna regla "fail" salta
+    started = ts()
+    perf = StagePerf("validate", rows_in=len(ventas) + len(pagos))
+    extract = out_dir / "stage_extract_excel_pagos.json"
+    coerced = json.loads(extract.read_text(encoding="utf-8")).get("coercion_failures") if extract.exists() else None
+    results = validate.validate_frames(ventas, pagos, rules, sample=sample, hoy=hoy, coerced=coerced)
+    failed = validate.failures(results)
+    finished = ts()
+    metrics = {
+        "rows_ventas": int(len(ventas)),
+        "rows_pagos": int(len(pagos)),
+        "sample": sample,
+        "failed": failed,
+        "warned": [name for name, r in results.items() if r["status"] == "warn"],
+        "rules": results,
+    }
+    write_stage_artifact(out_dir, StageResult("validate", started, finished, metrics, perf=perf.stop()))
+    if failed:
+        detail = ", ".join(f"{name} ({results[name]['rows']:,} filas)" for name in failed)
+        raise ValueError(f"Validación de datos falló: {detail}. Detalle en stage_validate.json")
+    return metrics
+
+def _text(s: pd.Series) -> pd.Series:
+    # texto normalizado ("" para nulos); vía object para no tocar las categorías de un categorical
+    return s.astype(object).fillna("").astype(str).str.strip()
+
 def _agg_pagos_proforma(pagos: pd.DataFrame) -> pd.DataFrame:
     # pagos a nivel proforma = filas donde tipo_item/codigo_item están vacíos (o no existen)
     if "tipo_item" in pagos.columns and "codigo_item" in pagos.columns:
-        mask = (pagos["tipo_item"].fillna("").astype(str).str.strip() == "") & (pagos["codigo_item"].fillna("").astype(str).str.strip() == "")
+        mask = (_text(pagos["tipo_item"]) == "") & (_text(pagos["codigo_item"]) == "")
         p2 = pagos.loc[mask].copy()
     else:
         p2 = pagos.copy()
@@ -68,8 +219,8 @@ def _agg_pagos_item(pagos: pd.DataFrame) -> pd.DataFrame | None:
     if not {"tipo_item","codigo_item"}.issubset(pagos.columns):
         return None
     p2 = pagos.copy()
-    p2["tipo_item"] = p2["tipo_item"].fillna("").astype(str).str.strip().str.lower()
-    p2["codigo_item"] = p2["codigo_item"].fillna("").astype(str).str.strip()
+    p2["tipo_item"] = _text(p2["tipo_item"]).str.lower()
+    p2["codigo_item"] = _text(p2["codigo_item"])
     # solo filas con item
     p2 = p2[(p2["tipo_item"] != "") & (p2["codigo_item"] != "")]
     if p2.empty:
@@ -81,104 +232,252 @@ def _agg_pagos_item(pagos: pd.DataFrame) -> pd.DataFrame | None:
                    n_pagos=("monto_pagado","count"),
                    fecha_ultimo_pago=("fecha_pago","max")))
 
-def transform_cobranzas(ventas: pd.DataFrame, pagos: pd.DataFrame, out_dir: Path) -> pd.DataFrame:
-    started = ts()
+def _safe_div(num: pd.Series, den: pd.Series) -> pd.Series:
+    # num/den vectorizado; 0.0 cuando den == 0 (NaN en den se propaga, igual que el apply original)
+    return (num / den.where(den != 0)).mask(den == 0, 0.0)
+
+def _col_or(df: pd.DataFrame, col: str, default) -> pd.Series:
+    if col in df.columns:
+        return df[col]
+    return pd.Series([default] * len(df), index=df.index, dtype=object)
+
+def _num_col(df: pd.DataFrame, col: str) -> pd.Series:
+    # equivalente columnar de float(x): None / texto no numérico -> 0.0, NaN se mantiene
+    if col not in df.columns:
+        return pd.Series(0.0, index=df.index)
+    s = df[col]
+    if pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s):
+        return s.astype(float)
+    num = pd.to_numeric(s, errors="coerce").astype(float)
+    keep_nan = s.isna().to_numpy() & (s.to_numpy(dtype=object).astype(str) == "nan")
+    return num.mask(num.isna() & ~keep_nan, 0.0)
+
+# precios por item del SQL: None / texto -> 0.0 como el builder original (float(x)); NaN queda nulo
+_ITEM_PRICES = ("precio_venta_depa_soles", "precio_estacionamiento_proforma", "precio_deposito_proforma")
+
+def _ventas_schema(raw: pd.DataFrame) -> pd.DataFrame:
+    # apply_schema de ventas; los precios que ya están en céntimos no se tocan (idempotente)
+    prices = {c: _num_col(raw, c) for c in _ITEM_PRICES
+              if c in raw.columns and not isinstance(raw[c].dtype, pd.Int64Dtype)}
+    return apply_schema(raw.assign(**prices) if prices else raw)
+
+def _has_code(s: pd.Series) -> pd.Series:
+    return s.notna() & (s.astype(str).str.strip() != "")
 
+_ITEM_COLS = ["codigo_proforma", "tipo_item", "codigo_item", "precio_item", "cliente", "proyecto", "asesor"]
+
+def _build_items(df: pd.DataFrame) -> pd.DataFrame:
+    # una fila por item (departamento siempre; estacionamiento/deposito si tienen código),
+    # en el mismo orden que el loop por proforma: depa -> estac -> depósito
+    base = pd.DataFrame({
+        "codigo_proforma": _col_or(df, "codigo_proforma", None),
+        "cliente": _col_or(df, "cliente", ""),
+        "proyecto": _col_or(df, "proyecto", ""),
+        "asesor": _col_or(df, "asesor", ""),
+    })
+    base["_pos"] = np.arange(len(df))
+
+    depa = base.assign(tipo_item="departamento",
+                       codigo_item=_col_or(df, "codigo_unidad", ""),
+                       precio_item=_num_col(df, "precio_venta_depa_soles"))
+    parts = [depa]
+    for tipo, cod_col, precio_col in (
+        ("estacionamiento", "codigo_estacionamiento_proforma", "precio_estacionamiento_proforma"),
+        ("deposito", "codigo_deposito_proforma", "precio_deposito_proforma"),
+    ):
+        if cod_col not in df.columns:
+            continue
+        mask = _has_code(df[cod_col])
+        parts.append(base.loc[mask].assign(tipo_item=tipo,
+                                           codigo_item=df.loc[mask, cod_col].astype(str),
+                                           precio_item=_num_col(df, precio_col).loc[mask]))
+
+    items = pd.concat(parts, ignore_index=True)
+    items = items.sort_values("_pos", kind="stable", ignore_index=True)
+    # los precios llegan en céntimos (apply_schema); _num_col los deja en float
+    items["precio_item"] = items["precio_item"].round().astype("Int64")
+    return items[_ITEM_COLS]
+
+def _transform_pandas(ventas: pd.DataFrame, pagos: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame | None]:
     # 1) pagos por proforma
     pagos_pf = _agg_pagos_proforma(pagos)
 
     df = ventas.merge(pagos_pf, on="codigo_proforma", how="left")
-    df["total_pagado"] = df["total_pagado"].fillna(0.0)
+    df["total_pagado"] = as_cents(df["total_pagado"]).fillna(0)
     df["n_pagos"] = df["n_pagos"].fillna(0).astype(int)
 
     # 2) total pactado = precio_total_venta (columna exacta de tu SQL)
-    df["precio_total_venta"] = pd.to_numeric(df.get("precio_total_venta"), errors="coerce").fillna(0.0)
+    df["precio_total_venta"] = as_cents(df["precio_total_venta"]).fillna(0)
 
     # 3) deuda proxy
-    df["deuda_pendiente"] = (df["precio_total_venta"] - df["total_pagado"]).clip(lower=0.0)
-    df["avance_pct"] = df.apply(lambda r: (r["total_pagado"]/r["precio_total_venta"]) if r["precio_total_venta"] else 0.0, axis=1)
+    df["deuda_pendiente"] = (df["precio_total_venta"] - df["total_pagado"]).clip(lower=0)
+    df["avance_pct"] = _safe_div(df["total_pagado"].astype(float), df["precio_total_venta"].astype(float))
 
-    # 4) prioridad
+    # 4) prioridad (cortes en soles)
     df["prioridad"] = pd.cut(
-        df["deuda_pendiente"],
-        bins=[-0.1, 0, 5000, 20000, 1e18],
-        labels=["sin_deuda", "baja", "media", "alta"]
+        df["deuda_pendiente"].astype(float),
+        bins=[b * CENTS for b in PRIORIDAD_BINS],
+        labels=list(PRIORIDAD_LABELS)
     )
 
     # 5) item-level (si hay pagos por item): departamento/estacionamiento/deposito
     pagos_item = _agg_pagos_item(pagos)
+    items_df = None
     if pagos_item is not None:
-        items = []
-
-        def _safe_num(x):
-            try:
-                return float(x) if x is not None else 0.0
-            except Exception:
-                return 0.0
-
-        for _, r in df.iterrows():
-            pf = r.get("codigo_proforma")
-            cliente = r.get("cliente", "")
-            proyecto = r.get("proyecto", "")
-            asesor = r.get("asesor", "")
-
-            # Departamento
-            items.append({
-                "codigo_proforma": pf,
-                "tipo_item": "departamento",
-                "codigo_item": r.get("codigo_unidad", ""),
-                "precio_item": _safe_num(r.get("precio_venta_depa_soles", 0)),
-                "cliente": cliente, "proyecto": proyecto, "asesor": asesor
-            })
-
-            # Estacionamiento
-            if pd.notna(r.get("codigo_estacionamiento_proforma")) and str(r.get("codigo_estacionamiento_proforma")).strip() != "":
-                items.append({
-                    "codigo_proforma": pf,
-                    "tipo_item": "estacionamiento",
-                    "codigo_item": str(r.get("codigo_estacionamiento_proforma")),
-                    "precio_item": _safe_num(r.get("precio_estacionamiento_proforma", 0)),
-                    "cliente": cliente, "proyecto": proyecto, "asesor": asesor
-                })
-
-            # Depósito
-            if pd.notna(r.get("codigo_deposito_proforma")) and str(r.get("codigo_deposito_proforma")).strip() != "":
-                items.append({
-                    "codigo_proforma": pf,
-                    "tipo_item": "deposito",
-                    "codigo_item": str(r.get("codigo_deposito_proforma")),
-                    "precio_item": _safe_num(r.get("precio_deposito_proforma", 0)),
-                    "cliente": cliente, "proyecto": proyecto, "asesor": asesor
-                })
-
-        items_df = pd.DataFrame(items)
+        items_df = _build_items(df)
+        unify_dimension("tipo_item", items_df, pagos_item)
         items_df = items_df.merge(pagos_item, on=["codigo_proforma","tipo_item","codigo_item"], how="left")
-        items_df["total_pagado"] = items_df["total_pagado"].fillna(0.0)
+        items_df["total_pagado"] = as_cents(items_df["total_pagado"]).fillna(0)
         items_df["n_pagos"] = items_df["n_pagos"].fillna(0).astype(int)
-        items_df["deuda_item"] = (items_df["precio_item"] - items_df["total_pagado"]).clip(lower=0.0)
-        items_df["avance_item_pct"] = items_df.apply(lambda x: (x["total_pagado"]/x["precio_item"]) if x["precio_item"] else 0.0, axis=1)
+        items_df["deuda_item"] = (items_df["precio_item"] - items_df["total_pagado"]).clip(lower=0)
+        items_df["avance_item_pct"] = _safe_div(items_df["total_pagado"].astype(float),
+                                                items_df["precio_item"].astype(float))
+    return df, items_df
+
+ENGINES = ("pandas", "duckdb")
+# "ninguna" = items solo con sus pagos propios (y sin reporte de items si no hay pagos por item)
+ALLOCATIONS = (*allocation.POLICIES, "ninguna")
+
+def _allocate_items(df: pd.DataFrame, items_df: pd.DataFrame | None, policy: str,
+                    priority: list[str] | None = None) -> pd.DataFrame | None:
+    # pagos a nivel proforma repartidos entre sus items (allocation.py) + los pagos propios de cada item
+    if policy == "ninguna":
+        return items_df
+    if items_df is None:
+        items_df = _build_items(df)
+        unify_dimension("tipo_item", items_df)
+        items_df["total_pagado"] = pd.array(np.zeros(len(items_df), dtype=np.int64), dtype="Int64")
+        items_df["n_pagos"] = 0
+        items_df["fecha_ultimo_pago"] = pd.Series(pd.NaT, index=items_df.index, dtype="datetime64[ns]")
+    directo = items_df["total_pagado"]
+    pagado_pf = df.set_index("codigo_proforma")["total_pagado"]
+    asignado = allocation.allocate_proforma_payments(items_df.assign(pagado_directo=directo), pagado_pf,
+                                                     policy, priority)
+    items_df["pagado_directo"] = directo
+    items_df["pagado_asignado"] = pd.array(asignado, dtype="Int64")
+    items_df["total_pagado"] = directo + items_df["pagado_asignado"]
+    items_df["deuda_item"] = (items_df["precio_item"] - items_df["total_pagado"]).clip(lower=0)
+    items_df["avance_item_pct"] = _safe_div(items_df["total_pagado"].astype(float),
+                                            items_df["precio_item"].astype(float))
+    return items_df
+
+def transform_cobranzas(ventas: pd.DataFrame, pagos: pd.DataFrame, out_dir: Path,
+                        fmt: str = "parquet", csv: bool = False, engine: str = "pandas",
+                        duckdb_options: dict | None = None, allocation_policy: str = "ninguna",
+                        allocation_priority: list[str] | None = None) -> pd.DataFrame:
+    # engine="duckdb": misma lógica en SQL (multi-hilo, con spill a disco); ver engine_duckdb
+    # allocation_policy: cómo se reparten los pagos a nivel proforma entre los items (ALLOCATIONS)
+    if engine not in ENGINES:
+        raise ValueError(f"Engine no soportado: {engine!r} (usa {', '.join(ENGINES)})")
+    if allocation_policy not in ALLOCATIONS:
+        raise ValueError(f"Asignación no soportada: {allocation_policy!r} (usa {', '.join(ALLOCATIONS)})")
+    started = ts()
+    perf = StagePerf("transform_cobranzas", rows_in=len(ventas) + len(pagos))
+    artifacts = {}
+    # montos en céntimos + dimensiones categorical (ya viene así del extract; idempotente si se
+    # recargan artefactos csv o de runs anteriores)
+    ventas = _ventas_schema(ventas)
+    pagos = apply_schema(pagos)
 
-        items_df.to_csv(out_dir / "cobranzas_items_report.csv", index=False)
+    if engine == "duckdb":
+        df, items_df = engine_duckdb.transform_frames(ventas, pagos, **(duckdb_options or {}))
+    else:
+        df, items_df = _transform_pandas(ventas, pagos)
+    items_df = _allocate_items(df, items_df, allocation_policy, allocation_priority)
+    if items_df is not None:
+        artifacts["cobranzas_items_report"] = write_table(items_df, out_dir, "cobranzas_items_report", fmt, csv)
 
+    artifacts["cobranzas_report"] = write_table(df, out_dir, "cobranzas_report", fmt, csv)
     finished = ts()
+    deuda_cents = int(df["deuda_pendiente"].sum())
     metrics = {
         "rows_out": int(len(df)),
-        "deuda_total": float(df["deuda_pendiente"].sum()),
+        "deuda_total": deuda_cents / CENTS,
+        "deuda_total_cents": deuda_cents,
         "ventas_con_deuda": int((df["deuda_pendiente"] > 0).sum()),
-        "top_deuda_max": float(df["deuda_pendiente"].max()) if len(df) else 0.0,
-        "item_report_generated": bool((out_dir / "cobranzas_items_report.csv").exists()),
+        "top_deuda_max": int(df["deuda_pendiente"].max()) / CENTS if len(df) else 0.0,
+        "item_report_generated": items_df is not None,
+        "allocation_policy": allocation_policy,
+        "engine": engine,
+        "memory_mb": memory_mb(df),
+        "memory_mb_display": memory_mb(to_display(df)),
     }
-    write_stage_artifact(out_dir, StageResult("transform_cobranzas", started, finished, metrics))
-
-    df.to_csv(out_dir / "cobranzas_report.csv", index=False)
+    if items_df is not None and "pagado_asignado" in items_df.columns:
+        asignado = int(items_df["pagado_asignado"].sum())
+        # lo pagado a nivel proforma que no entra en ningún item (pagos por encima del precio)
+        sin_asignar = int(df.drop_duplicates("codigo_proforma")["total_pagado"].clip(lower=0).sum()) - asignado
+        metrics.update({"pagado_asignado_items": asignado / CENTS, "pagado_proforma_sin_asignar": sin_asignar / CENTS})
+    write_stage_artifact(out_dir, StageResult("transform_cobranzas", started, finished, metrics, artifacts,
+                                              perf.stop(rows_out=len(df))))
     return df
 
-def build_summary(df: pd.DataFrame, out_dir: Path) -> None:
+def diff_cobranzas(df: pd.DataFrame, out_dir: Path, fecha=None,
+                   fmt: str = "parquet", csv: bool = False) -> pd.DataFrame | None:
+    # compara contra el último snapshot anterior a hoy (re-correr el mismo día compara contra ayer)
     started = ts()
-    total = float(df["deuda_pendiente"].sum())
-    n = int((df["deuda_pendiente"] > 0).sum())
+    perf = StagePerf("diff_cobranzas", rows_in=len(df))
+    store = SnapshotStore(out_dir / "snapshots", "cobranzas")
+    prev_date = store.latest_before(fecha or date.today().isoformat())
+    if prev_date is None:
+        finished = ts()
+        write_stage_artifact(out_dir, StageResult("diff_cobranzas", started, finished,
+                                                  {"previous_snapshot": None, "proformas_con_cambios": 0},
+                                                  perf=perf.stop(rows_out=0)))
+        return None
 
-    top = df.sort_values("deuda_pendiente", ascending=False).head(10)
+    changes = detect_changes(df, store.as_of(prev_date))
+    changes.attrs["previous_snapshot"] = prev_date
+    art = write_table(changes, out_dir, "cobranzas_changes", fmt, csv)
+    finished = ts()
+    metrics = {"previous_snapshot": prev_date, **summarize_changes(changes)}
+    write_stage_artifact(out_dir, StageResult("diff_cobranzas", started, finished, metrics,
+                                              {"cobranzas_changes": art}, perf.stop(rows_out=len(changes))))
+    return changes
+
+def _changes_md(changes: pd.DataFrame) -> list[str]:
+    md = []
+    md.append("")
+    md.append(f"**Cambios vs snapshot {changes.attrs.get('previous_snapshot', 'anterior')}:**")
+    md.append("")
+    for t in CHANGE_TYPES:
+        md.append(f"- {t}: {int(changes[t].sum())}")
+    if len(changes):
+        md.append("")
+        md.append("| Proforma | Proyecto | Cliente | Cambio | Deuda ayer | Deuda hoy | Δ Deuda | Prioridad |")
+        md.append("|---|---|---|---|---:|---:|---:|---|")
+        for r in changes.head(10).itertuples(index=False):
+            pri = r.prioridad if r.prioridad_prev == r.prioridad else f"{r.prioridad_prev} → {r.prioridad}"
+            md.append(
+                f"| {r.codigo_proforma} | {getattr(r, 'proyecto', '')} | {getattr(r, 'cliente', '')} | {r.tipo_cambio} | {r.deuda_prev:,.2f} | {r.deuda_hoy:,.2f} | {r.delta_deuda:,.2f} | {pri} |"
+            )
+    return md
+
+def _projects_md(g: pd.DataFrame) -> list[str]:
+    # g: cube.slice("proyecto") en soles (to_display)
+    md = []
+    md.append("")
+    md.append("**Deuda por proyecto:**")
+    md.append("")
+    md.extend(render.SUMMARY_PROJECTS.lines(g))
+    return md
+
+def build_summary(df: pd.DataFrame, out_dir: Path, changes: pd.DataFrame | None = None,
+                  cube: Cube | None = None) -> None:
+    started = ts()
+    perf = StagePerf("report_summary", rows_in=len(df))
+    # totales, top y cortes salen del cubo (etapa rollup); sin cubo se arma en memoria
+    if cube is None:
+        cube = build_cube(df)
+    if changes is not None:
+        attrs = changes.attrs
+        changes = to_display(changes)
+        changes.attrs = attrs
+    tot = cube.total()
+    total = int(tot["deuda_pendiente"]) / CENTS
+    n = int(tot["con_deuda"])
+
+    # céntimos -> soles solo para el markdown
+    top = to_display(cube.top(10))
 
     md = []
     md.append(f"- **Deuda pendiente total (proxy):** {total:,.2f}")
@@ -186,55 +485,513 @@ def build_summary(df: pd.DataFrame, out_dir: Path) -> None:
     md.append("")
     md.append("**Top 10 deudas (proxy):**")
     md.append("")
-    md.append("| Proforma | Proyecto | Cliente | Asesor | Deuda | Pagado | Total Venta | Avance | Tipo compra |")
-    md.append("|---|---|---|---|---:|---:|---:|---:|---|")
-    for _, r in top.iterrows():
-        md.append(
-            f"| {r.get('codigo_proforma','')} | {r.get('proyecto','')} | {r.get('cliente','')} | {r.get('asesor','')} | {r.get('deuda_pendiente',0):,.2f} | {r.get('total_pagado',0):,.2f} | {r.get('precio_total_venta',0):,.2f} | {r.get('avance_pct',0)*100:,.1f}% | {r.get('tipo_compra','')} |"
-        )
+    md.extend(render.SUMMARY_TOP.lines(top))
+    por_proyecto = cube.slice("proyecto")
+    por_proyecto = por_proyecto[por_proyecto["proyecto"].notna()]
+    if len(por_proyecto) > 1:
+        md.extend(_projects_md(to_display(por_proyecto)))
+    if changes is not None:
+        md.extend(_changes_md(changes))
 
     out_dir.mkdir(parents=True, exist_ok=True)
     (out_dir / "cobranzas_summary.md").write_text("\n".join(md), encoding="utf-8")
 
     finished = ts()
     metrics = {"summary_path": str(out_dir / "cobranzas_summary.md")}
-    write_stage_artifact(out_dir, StageResult("report_summary", started, finished, metrics))
+    write_stage_artifact(out_dir, StageResult("report_summary", started, finished, metrics,
+                                              perf=perf.stop()))
+
+def render_cobranzas(df: pd.DataFrame, out_dir: Path, workers: int | None = None) -> dict:
+    # un reporte md + html por asesor y por proyecto en <out>/reports/; los que no cambiaron no se reescriben
+    started = ts()
+    perf = StagePerf("render_reports", rows_in=len(df))
+    reports_dir = out_dir / "reports"
+    metrics = {"reports_dir": str(reports_dir), **render.render_reports(df, reports_dir, workers=workers)}
+    finished = ts()
+    write_stage_artifact(out_dir, StageResult("render_reports", started, finished, metrics,
+                                              perf=perf.stop(rows_out=metrics["written"])))
+    return metrics
+
+def score_risk(df: pd.DataFrame, out_dir: Path, fecha=None, model_path: str | None = None,
+               fmt: str = "parquet") -> dict:
+    # riesgo de no pago por proforma (src/risk.py) en <out>/risk_scores/risk_scores_<fecha>.<fmt> + .csv
+    started = ts()
+    perf = StagePerf("risk_scores", rows_in=len(df))
+    fecha = pd.Timestamp(fecha or date.today()).date().isoformat()
+    model = risk.load_model(model_path)
+    scores = risk.score(df, model, hoy=fecha)
+    art = write_table(scores, out_dir / "risk_scores", f"risk_scores_{fecha}", fmt, csv=True)
+    finished = ts()
+    deuda = as_cents(scores["deuda_pendiente"]).fillna(0) if "deuda_pendiente" in scores.columns else None
+    metrics = {
+        "fecha": fecha,
+        "rows": int(len(scores)),
+        "model_version": model.version,
+        "model_path": model_path,
+        "bands": {str(k): int(v) for k, v in scores["risk_band"].value_counts(sort=False).items()},
+        "deuda_por_banda": ({str(k): int(v) / CENTS
+                             for k, v in deuda.groupby(scores["risk_band"], observed=False).sum().items()}
+                            if deuda is not None else None),
+        "risk_score_medio": round(float(scores["risk_score"].mean()), 4) if len(scores) else 0.0,
+    }
+    write_stage_artifact(out_dir, StageResult("risk_scores", started, finished, metrics, {"risk_scores": art},
+                                              perf.stop(rows_out=len(scores))))
+    return metrics
+
+def forecast_cashflow(df: pd.DataFrame, pagos: pd.DataFrame, out_dir: Path, fecha=None, scenarios: int = 1000,
+                      weeks: int = 26, memory_mb: float = 512, seed: int = 0, fmt: str = "parquet",
+                      csv: bool = False) -> dict:
+    # cobros semanales esperados por proyecto (Monte Carlo, src/cashflow.py) con bandas P10/P50/P90
+    started = ts()
+    perf = StagePerf("cashflow_forecast", rows_in=len(df) + len(pagos))
+    fecha = pd.Timestamp(fecha or date.today()).date().isoformat()
+    timing = cashflow.estimate_timing(df, pagos, hoy=fecha)
+    proyectos, acc, info = cashflow.simulate(timing, scenarios, weeks, memory_mb=memory_mb, seed=seed)
+    forecast = cashflow.summarize(proyectos, acc, hoy=fecha)
+    art = write_table(forecast, out_dir, "cashflow_forecast", fmt, csv)
+    finished = ts()
+    metrics = {
+        "fecha": fecha,
+        "scenarios": scenarios,
+        "weeks": weeks,
+        "seed": seed,
+        "memory_mb": memory_mb,
+        **info,
+        "deuda_simulada": round(float(timing["deuda"].sum()), 2),
+        "q_semanal_media": round(float(timing["q_semanal"].mean()), 4) if len(timing) else 0.0,
+        "horizonte": cashflow.horizon_totals(proyectos, acc),
+    }
+    write_stage_artifact(out_dir, StageResult("cashflow_forecast", started, finished, metrics,
+                                              {"cashflow_forecast": art}, perf.stop(rows_out=len(forecast))))
+    return metrics
+
+def rollup_cobranzas(df: pd.DataFrame, out_dir: Path, fmt: str = "parquet", csv: bool = False,
+                     k: int = 10) -> Cube:
+    # todos los grouping sets de proyecto × asesor × prioridad × tipo_compra × mes + top-k por grupo
+    started = ts()
+    perf = StagePerf("rollup_cobranzas", rows_in=len(df))
+    cube = build_cube(df, k)
+    artifacts = {"cobranzas_cube": write_table(cube.aggs, out_dir, "cobranzas_cube", fmt, csv),
+                 "cobranzas_cube_top": write_table(cube.top_rows, out_dir, "cobranzas_cube_top", fmt, csv)}
+    finished = ts()
+    metrics = {
+        "dims": rollup.CUBE_DIMS,
+        "grouping_sets": len(rollup.grouping_sets()),
+        "groups": int(len(cube.aggs)),
+        "top_k": k,
+        "top_rows": int(len(cube.top_rows)),
+        "memory_mb": memory_mb(cube.aggs) + memory_mb(cube.top_rows),
+    }
+    write_stage_artifact(out_dir, StageResult("rollup_cobranzas", started, finished, metrics, artifacts,
+                                              perf.stop(rows_out=len(cube.aggs))))
+    return cube
+
+def _load_cube(payload: dict) -> Cube:
+    return Cube(_load_artifact(payload, "cobranzas_cube"), _load_artifact(payload, "cobranzas_cube_top"),
+                payload.get("top_k"))
+
+def snapshot_cobranzas(df: pd.DataFrame, out_dir: Path, fecha=None) -> dict:
+    started = ts()
+    perf = StagePerf("snapshot", rows_in=len(df))
+    store = SnapshotStore(out_dir / "snapshots", "cobranzas")
+    info = store.write(df, fecha)
+    finished = ts()
+    write_stage_artifact(out_dir, StageResult("snapshot", started, finished, info,
+                                              perf=perf.stop(rows_out=info["rows"])))
+    return info
+
+def _run_project(task: dict) -> dict:
+    # corre en un proceso del pool: extract del proyecto (con cupo de warehouse) -> transform -> summary
+    out_dir = Path(task["out_dir"])
+    if task.get("redshift_options"):
+        io_redshift.configure(**task["redshift_options"])
+    with warehouse_slot():
+        ventas = extract_minutas(Path(task["sql"]), out_dir, batch_size=task["batch_size"],
+                                 incremental=task["incremental"], full_refresh=task["full_refresh"],
+                                 full_refresh_days=task["full_refresh_days"], fmt=task["format"],
+                                 csv=task["csv"], read=task.get("read"), proyecto=task["proyecto"])
+    pagos = read_table(Path(task["pagos"]))
+    pagos = pagos.loc[pagos["codigo_proforma"].isin(ventas["codigo_proforma"])]
+    # como en el run de un solo proyecto: una regla "fail" corta antes del join (la partición queda failed)
+    validate_inputs(ventas, pagos, out_dir, rules=task["validate_rules"], sample=task["validate_sample"],
+                    hoy=task["hoy"])
+    df = transform_cobranzas(ventas, pagos, out_dir, fmt=task["format"], csv=task["csv"],
+                             engine=task["engine"], duckdb_options=task["duckdb_options"],
+                             allocation_policy=task["allocation_policy"],
+                             allocation_priority=task["allocation_priority"])
+    cube = rollup_cobranzas(df, out_dir, fmt=task["format"], csv=task["csv"])
+    build_summary(df, out_dir, cube=cube)
+    return {"rows": int(len(df)), "deuda_total": int(df["deuda_pendiente"].sum()) / CENTS}
+
+def project_extracts(results: list[dict], out_dir: Path) -> pd.DataFrame:
+    # ventas extraídas por todos los proyectos (también los que no pasaron su validate), para validar el consolidado
+    frames = []
+    for r in results:
+        stage = out_dir / "projects" / r["slug"] / "stage_extract_redshift_ventas.json"
+        if stage.exists():
+            frames.append(_load_artifact(json.loads(stage.read_text(encoding="utf-8")), "extract_ventas"))
+    return apply_schema(pd.concat(frames, ignore_index=True)) if frames else pd.DataFrame({"codigo_proforma": []})
+
+def _project_artifacts(out_dir: Path, slug: str) -> dict:
+    payload = json.loads((out_dir / "projects" / slug / "stage_transform_cobranzas.json").read_text(encoding="utf-8"))
+    return payload["artifacts"]
+
+def run_projects(sql_path: Path, pagos_path: Path, out_dir: Path, projects: list[str] | None = None,
+                 workers: int | None = None, warehouse_slots: int = 2, batch_size: int = 0,
+                 incremental: bool = False, full_refresh: bool = False, full_refresh_days: int = 7,
+                 fmt: str = "parquet", csv: bool = False, engine: str = "pandas",
+                 duckdb_options: dict | None = None, redshift_options: dict | None = None,
+                 allocation_policy: str = "ninguna", allocation_priority: list[str] | None = None,
+                 validate_rules: dict[str, str] | None = None, validate_sample: int | None = None, hoy=None,
+                 read=None) -> list[dict]:
+    # una partición por proyecto en <out>/projects/<slug>/ (artefactos, stage json, cache incremental propios)
+    started = ts()
+    perf = StagePerf("projects")
+    if projects is None:
+        with warehouse_slot():
+            projects = discover_projects(read or read_sql)
+    if not projects:
+        raise ValueError("No hay proyectos para correr (grupocygnus.proyectos vacío o --projects sin valores).")
+    tasks = []
+    for p in projects:
+        part_dir = out_dir / "projects" / project_slug(p)
+        tasks.append({"proyecto": p, "slug": project_slug(p), "out_dir": str(part_dir),
+                      "sql": str(sql_path), "pagos": str(pagos_path), "batch_size": batch_size,
+                      "incremental": incremental, "full_refresh": full_refresh, "full_refresh_days": full_refresh_days,
+                      "format": fmt, "csv": csv, "engine": engine, "read": read,
+                      "redshift_options": redshift_options, "allocation_policy": allocation_policy,
+                      "allocation_priority": allocation_priority, "validate_rules": validate_rules,
+                      "validate_sample": validate_sample, "hoy": hoy,
+                      # spill de duckdb por partición (varios procesos en paralelo)
+                      "duckdb_options": {**(duckdb_options or {}), "temp_dir": part_dir / "cache" / "duckdb"}})
+    results = run_partitions(_run_project, tasks, workers=workers, warehouse_slots=warehouse_slots)
+    for r in results:
+        r.pop("read", None)
+    ok = [r for r in results if r["status"] == "ok"]
+    failed = [r for r in results if r["status"] == "failed"]
+    finished = ts()
+
+    artifacts = {f"{name}__{r['slug']}": a for r in ok for name, a in _project_artifacts(out_dir, r["slug"]).items()}
+    metrics = {
+        "projects": len(results),
+        "projects_ok": len(ok),
+        "projects_failed": [r["proyecto"] for r in failed],
+        # una partición fallida no frena a las demás, pero el resultado no se reusa en el próximo run
+        "partial": bool(failed),
+        "warehouse_slots": warehouse_slots,
+        "partitions": [{k: r.get(k) for k in ("proyecto", "slug", "status", "seconds", "rows", "deuda_total", "error")}
+                       for r in results],
+    }
+    write_stage_artifact(out_dir, StageResult("projects", started, finished, metrics, artifacts,
+                                              perf.stop(rows_out=sum(r["rows"] for r in ok))))
+    if not ok:
+        raise RuntimeError(f"Fallaron todos los proyectos: {failed[0]['proyecto']}: {failed[0]['error']}")
+    return results
+
+def merge_projects(results: list[dict], out_dir: Path, fmt: str = "parquet", csv: bool = False) -> pd.DataFrame:
+    # consolida los reportes por proyecto en el cobranzas_report / items de <out> (mismo contrato que transform)
+    started = ts()
+    ok = [r for r in results if r["status"] == "ok"]
+    perf = StagePerf("transform_cobranzas", rows_in=sum(r["rows"] for r in ok))
+    artifacts = {}
+    arts = [_project_artifacts(out_dir, r["slug"]) for r in ok]
+    frames = [read_table(Path(a["cobranzas_report"]["path"])) for a in arts]
+    df = apply_schema(pd.concat(frames, ignore_index=True)) if frames else pd.DataFrame()
+    items = [read_table(Path(a["cobranzas_items_report"]["path"])) for a in arts if "cobranzas_items_report" in a]
+    if items:
+        artifacts["cobranzas_items_report"] = write_table(apply_schema(pd.concat(items, ignore_index=True)),
+                                                          out_dir, "cobranzas_items_report", fmt, csv)
+    artifacts["cobranzas_report"] = write_table(df, out_dir, "cobranzas_report", fmt, csv)
+    finished = ts()
+    deuda_cents = int(df["deuda_pendiente"].sum()) if len(df) else 0
+    metrics = {
+        "rows_out": int(len(df)),
+        "deuda_total": deuda_cents / CENTS,
+        "deuda_total_cents": deuda_cents,
+        "ventas_con_deuda": int((df["deuda_pendiente"] > 0).sum()) if len(df) else 0,
+        "top_deuda_max": int(df["deuda_pendiente"].max()) / CENTS if len(df) else 0.0,
+        "item_report_generated": bool(items),
+        "projects_merged": [r["proyecto"] for r in ok],
+        "projects_failed": [r["proyecto"] for r in results if r["status"] != "ok"],
+        "memory_mb": memory_mb(df),
+    }
+    write_stage_artifact(out_dir, StageResult("transform_cobranzas", started, finished, metrics, artifacts,
+                                              perf.stop(rows_out=len(df))))
+    return df
+
+STAGES = ["extract_ventas", "extract_pagos", "projects", "validate", "transform", "rollup", "diff", "summary",
+          "render", "risk", "cashflow", "snapshot"]
+
+def _load_artifact(payload: dict, name: str) -> pd.DataFrame:
+    # mismo contrato que el resultado en memoria: un artefacto csv trae montos en soles (apply_schema es idempotente)
+    return apply_schema(read_table(Path(payload["artifacts"][name]["path"])))
 
-def main():
-    ap = argparse.ArgumentParser()
-    ap.add_argument("--excel", required=True)
+def _load_changes(payload: dict) -> pd.DataFrame | None:
+    if "cobranzas_changes" not in (payload.get("artifacts") or {}):
+        return None
+    changes = _load_artifact(payload, "cobranzas_changes")
+    changes.attrs["previous_snapshot"] = payload.get("previous_snapshot")
+    return changes
+
+def build_dag(args, out_dir: Path) -> DagRunner:
+    sql_path = Path(args.sql)
+    excel_path = Path(args.excel)
+    hoy = date.today().isoformat()
+    fmt, csv = args.format, args.csv
+    store = SnapshotStore(out_dir / "snapshots", "cobranzas")
+    engine = args.engine
+    duckdb_options = {"threads": args.duckdb_threads, "memory_limit": args.duckdb_memory_limit,
+                      "temp_dir": out_dir / "cache" / "duckdb"}
+    # cache de queries del proceso (se suma al connect / pool ya configurados); los procesos por proyecto lo
+    # reconfiguran igual (_run_project)
+    redshift_options = {"cache_dir": os.environ.get("REDSHIFT_CACHE_DIR") or str(out_dir / "cache" / "queries"),
+                        "cache_ttl": args.query_cache_ttl}
+    io_redshift.configure(**redshift_options)
+    # si extract_pagos falla (ej. faltan columnas) se aborta la query a Redshift en curso
+    cancel = CancelToken()
+
+    extract_code = [extract_minutas, _extract_minutas_stream, _extract_minutas_incremental, _load_query,
+                    _client, _read_query, _ventas_schema, _num_col, io_redshift, incremental]
+    transform_code = [transform_cobranzas, _transform_pandas, _agg_pagos_proforma, _agg_pagos_item, _safe_div,
+                      _col_or, _num_col, _ventas_schema, _has_code, _build_items, _allocate_items, allocation,
+                      engine_duckdb]
+    rollup_code = [rollup_cobranzas, rollup]
+    summary_code = [build_summary, _changes_md, _projects_md, render]
+    rules = validate.parse_rules(args.validate_rule)
+    validate_params = {"rules": rules, "sample": args.validate_sample, "fecha": hoy}
+
+    pagos_stage = Stage("extract_pagos",
+                        lambda d: extract_pagos(excel_path, out_dir, workers=args.excel_workers, fmt=fmt, csv=csv),
+                        # hashes del manifest de io_payments: solo se relee un excel si cambió su size/mtime
+                        inputs=lambda: {"files": file_digests(list_payment_files(excel_path),
+                                                              out_dir / "cache" / "pagos")},
+                        code=[extract_pagos, io_payments],
+                        stage_json="extract_excel_pagos",
+                        load=lambda p: _load_artifact(p, "extract_pagos"))
+    if args.by_project:
+        stages = [
+            pagos_stage,
+            # cada proyecto corre extract -> transform -> summary en su propio proceso (<out>/projects/<slug>/)
+            Stage("projects",
+                  lambda d: run_projects(sql_path, artifact_path(out_dir, "extract_pagos", fmt), out_dir,
+                                         projects=args.projects, workers=args.project_workers,
+                                         warehouse_slots=args.warehouse_slots, batch_size=args.batch_size,
+                                         incremental=args.incremental, full_refresh=args.full_refresh,
+                                         full_refresh_days=args.full_refresh_days, fmt=fmt, csv=csv,
+                                         engine=engine, duckdb_options=duckdb_options,
+                                         redshift_options=redshift_options, allocation_policy=args.allocation,
+                                         allocation_priority=args.allocation_priority, validate_rules=rules,
+                                         validate_sample=args.validate_sample, hoy=hoy),
+                  deps=["extract_pagos"],
+                  inputs=lambda: {"sql": _sha256(sql_path), "fecha": hoy, "incremental": args.incremental,
+                                  "projects": args.projects, "engine": engine, "allocation": args.allocation,
+                                  "allocation_priority": args.allocation_priority, **validate_params},
+                  code=[run_projects, _run_project, partitions, *extract_code, validate_inputs, validate,
+                        parse_dates, *transform_code, *rollup_code, *summary_code],
+                  stage_json="projects",
+                  load=lambda p: p["partitions"]),
+            # cada proyecto ya validó sus extracts antes de su transform; acá las ventas de todos los proyectos
+            # contra todos los pagos (huérfanos, proformas repetidas entre proyectos) antes de consolidar
+            Stage("validate",
+                  lambda d: validate_inputs(project_extracts(d["projects"], out_dir), d["extract_pagos"], out_dir,
+                                            rules=rules, sample=args.validate_sample, hoy=hoy),
+                  deps=["projects", "extract_pagos"],
+                  inputs=lambda: validate_params,
+                  code=[validate_inputs, validate, parse_dates, project_extracts],
+                  stage_json="validate",
+                  load=lambda p: p),
+            Stage("transform",
+                  lambda d: merge_projects(d["projects"], out_dir, fmt=fmt, csv=csv),
+                  deps=["projects", "validate"],
+                  code=[merge_projects, _project_artifacts],
+                  stage_json="transform_cobranzas",
+                  load=lambda p: _load_artifact(p, "cobranzas_report")),
+        ]
+    else:
+        stages = [
+            # la fecha entra al fingerprint: el warehouse cambia día a día, dentro del día se reusa
+            Stage("extract_ventas",
+                  lambda d: extract_minutas(sql_path, out_dir, batch_size=args.batch_size,
+                                            incremental=args.incremental, full_refresh=args.full_refresh,
+                                            full_refresh_days=args.full_refresh_days, fmt=fmt, csv=csv,
+                                            cancel=cancel),
+                  inputs=lambda: {"sql": _sha256(sql_path), "fecha": hoy, "incremental": args.incremental},
+                  code=extract_code,
+                  stage_json="extract_redshift_ventas",
+                  load=lambda p: _load_artifact(p, "extract_ventas")),
+            pagos_stage,
+            # antes del join: una proforma duplicada en ventas multiplica sus pagos en el transform
+            Stage("validate",
+                  lambda d: validate_inputs(d["extract_ventas"], d["extract_pagos"], out_dir, rules=rules,
+                                            sample=args.validate_sample, hoy=hoy),
+                  deps=["extract_ventas", "extract_pagos"],
+                  inputs=lambda: validate_params,
+                  code=[validate_inputs, validate, parse_dates],
+                  stage_json="validate",
+                  load=lambda p: p),
+            Stage("transform",
+                  lambda d: transform_cobranzas(d["extract_ventas"], d["extract_pagos"], out_dir, fmt=fmt, csv=csv,
+                                                engine=engine, duckdb_options=duckdb_options,
+                                                allocation_policy=args.allocation,
+                                                allocation_priority=args.allocation_priority),
+                  deps=["extract_ventas", "extract_pagos", "validate"],
+                  inputs=lambda: {"engine": engine, "allocation": args.allocation,
+                                  "allocation_priority": args.allocation_priority},
+                  code=transform_code,
+                  stage_json="transform_cobranzas",
+                  load=lambda p: _load_artifact(p, "cobranzas_report")),
+        ]
+    stages += [
+        Stage("rollup",
+              lambda d: rollup_cobranzas(d["transform"], out_dir, fmt=fmt, csv=csv),
+              deps=["transform"],
+              code=rollup_code,
+              stage_json="rollup_cobranzas",
+              load=_load_cube),
+        Stage("diff",
+              lambda d: diff_cobranzas(d["transform"], out_dir, fecha=hoy, fmt=fmt, csv=csv),
+              deps=["transform"],
+              inputs=lambda: {"fecha": hoy, "previous_snapshot": store.latest_before(hoy)},
+              code=[diff_cobranzas, changes_mod, snapshots],
+              stage_json="diff_cobranzas",
+              load=_load_changes),
+        Stage("summary",
+              lambda d: build_summary(d["transform"], out_dir, d["diff"], d["rollup"]),
+              deps=["transform", "diff", "rollup"],
+              code=summary_code,
+              stage_json="report_summary",
+              outputs=["cobranzas_summary.md"]),
+        Stage("render",
+              lambda d: render_cobranzas(d["transform"], out_dir, workers=args.render_workers),
+              deps=["transform"],
+              code=[render_cobranzas, render],
+              stage_json="render_reports",
+              load=lambda p: p,
+              outputs=["reports/_manifest.json"]),
+        # el archivo del modelo entra al fingerprint: cambiar pesos re-puntúa aunque el reporte no cambie
+        Stage("risk",
+              lambda d: score_risk(d["transform"], out_dir, fecha=hoy, model_path=args.risk_model, fmt=fmt),
+              deps=["transform"],
+              inputs=lambda: {"fecha": hoy, "model": _sha256(Path(args.risk_model)) if args.risk_model else None},
+              code=[score_risk, risk, epoch_days, parse_dates],
+              stage_json="risk_scores",
+              load=lambda p: p),
+        Stage("cashflow",
+              lambda d: forecast_cashflow(d["transform"], d["extract_pagos"], out_dir, fecha=hoy,
+                                          scenarios=args.cashflow_scenarios, weeks=args.cashflow_weeks,
+                                          memory_mb=args.cashflow_memory_mb, seed=args.cashflow_seed,
+                                          fmt=fmt, csv=csv),
+              deps=["transform", "extract_pagos"],
+              # memory_mb no entra: el resultado no depende del tamaño de chunk
+              inputs=lambda: {"fecha": hoy, "scenarios": args.cashflow_scenarios, "weeks": args.cashflow_weeks,
+                              "seed": args.cashflow_seed},
+              code=[forecast_cashflow, cashflow, epoch_days, parse_dates],
+              stage_json="cashflow_forecast",
+              load=lambda p: p),
+    ]
+    if args.snapshot:
+        stages.append(Stage("snapshot",
+                            lambda d: snapshot_cobranzas(d["transform"], out_dir, fecha=hoy),
+                            # después del diff: ambos leen/escriben el manifest del store
+                            deps=["transform", "diff"],
+                            inputs=lambda: {"fecha": hoy},
+                            code=[snapshot_cobranzas, snapshots],
+                            stage_json="snapshot",
+                            load=lambda p: p))
+    return DagRunner(stages, out_dir, params={"format": fmt, "csv": csv}, common_code=[stages_mod],
+                     cancel=cancel)
+
+def main(argv: list[str] | None = None, prog: str = "python -m src.cobranzas run") -> int:
+    ap = argparse.ArgumentParser(prog=prog)
+    ap.add_argument("--excel", required=True, help="pagos.xlsx o carpeta con excels de pagos (hoja 'pagos')")
     ap.add_argument("--out", required=True)
     ap.add_argument("--sql", default=str(DEFAULT_SQL_PATH))
     ap.add_argument("--snapshot", action="store_true")
-    args = ap.parse_args()
+    ap.add_argument("--format", choices=ARTIFACT_FORMATS, default="parquet",
+                    help="formato de los artefactos por etapa (arrow = IPC sin comprimir, memory-mappable)")
+    ap.add_argument("--csv", action="store_true", help="exporta además cada artefacto como .csv")
+    ap.add_argument("--batch-size", type=int, default=_get_int_env("REDSHIFT_FETCH_SIZE", 0),
+                    help="filas por batch del cursor server-side (0 = extracción completa en memoria)")
+    ap.add_argument("--query-cache-ttl", type=int, default=_get_int_env("REDSHIFT_CACHE_TTL", 0),
+                    help="segundos que se reusa el resultado de una query (cache en <out>/cache/queries; 0 = sin cache)")
+    ap.add_argument("--incremental", action="store_true",
+                    help="baja solo el delta desde el watermark de fecha_minuta (cache en <out>/cache)")
+    ap.add_argument("--full-refresh", action="store_true", help="fuerza re-extracción completa (reconcilia bajas)")
+    ap.add_argument("--full-refresh-days", type=int, default=7,
+                    help="días entre full refresh automáticos en modo incremental (0 = nunca)")
+    ap.add_argument("--excel-workers", type=int, default=None,
+                    help="procesos para parsear excels nuevos/modificados (default: cpu_count)")
+    ap.add_argument("--engine", choices=ENGINES, default="pandas",
+                    help="motor del transform: pandas o duckdb (SQL embebido, multi-hilo, spill a disco)")
+    ap.add_argument("--allocation", choices=ALLOCATIONS, default="ninguna",
+                    help="reparto de los pagos a nivel proforma entre sus items: a prorrata del precio_item, "
+                         "departamento primero, por --allocation-priority o ninguna (default: el items report "
+                         "sin columnas de asignación)")
+    ap.add_argument("--allocation-priority", nargs="+", default=None,
+                    help="con --allocation prioridad: orden de tipo_item (ej. deposito estacionamiento departamento)")
+    ap.add_argument("--duckdb-threads", type=int, default=None, help="hilos de duckdb (default: todos los cores)")
+    ap.add_argument("--duckdb-memory-limit", default=None,
+                    help="tope de memoria de duckdb (ej. 4GB); lo que no entra va a <out>/cache/duckdb")
+    ap.add_argument("--by-project", action="store_true",
+                    help="una partición por proyecto (grupocygnus.proyectos) en un pool de procesos + merge final")
+    ap.add_argument("--projects", nargs="+", default=None,
+                    help="con --by-project: corre solo estos proyectos (default: todos los de grupocygnus.proyectos)")
+    ap.add_argument("--project-workers", type=int, default=None,
+                    help="procesos para las particiones por proyecto (default: cpu_count)")
+    ap.add_argument("--render-workers", type=int, default=None,
+                    help="hilos para los reportes por asesor / proyecto (default: min(8, cpu_count))")
+    ap.add_argument("--risk-model", default=None,
+                    help="json con los pesos del modelo de riesgo (formato de risk.DEFAULT_MODEL; default: modelo base)")
+    ap.add_argument("--cashflow-scenarios", type=int, default=1000, help="escenarios Monte Carlo de la proyección de cobros")
+    ap.add_argument("--cashflow-weeks", type=int, default=26, help="semanas del horizonte de la proyección de cobros")
+    ap.add_argument("--cashflow-memory-mb", type=float, default=512,
+                    help="memoria por chunk de la simulación (proformas × escenarios × semanas); no cambia el resultado")
+    ap.add_argument("--cashflow-seed", type=int, default=0)
+    ap.add_argument("--validate-rule", action="append", default=None, metavar="REGLA=fail|warn|off",
+                    help="severidad de una regla de validación (repetible; reglas: " + ", ".join(validate.RULES) + ")")
+    ap.add_argument("--validate-sample", type=int, default=None,
+                    help="evalúa las reglas fila a fila de pagos sobre una muestra de N filas (conteos estimados)")
+    ap.add_argument("--warehouse-slots", type=int, default=_get_int_env("REDSHIFT_MAX_CONCURRENCY", 2),
+                    help="queries simultáneas a Redshift entre particiones")
+    ap.add_argument("--from-stage", choices=STAGES, default=None,
+                    help="re-corre desde esta etapa; las anteriores se reusan del último run")
+    ap.add_argument("--only", nargs="+", choices=STAGES, default=None,
+                    help="corre solo estas etapas; sus dependencias se reusan del último run")
+    ap.add_argument("--force", action="store_true", help="ignora los fingerprints y corre todas las etapas")
+    ap.add_argument("--profile", action="store_true",
+                    help="cProfile por etapa en <out>/profiles/<etapa>.prof/.txt (corre las etapas en serie)")
+    ap.add_argument("--trace-memory", action="store_true", help="pico de memoria python por etapa (tracemalloc, más lento)")
+    args = ap.parse_args(argv)
 
     out_dir = Path(args.out)
     out_dir.mkdir(parents=True, exist_ok=True)
+    configure_perf(out_dir / "profiles" if args.profile else None, args.trace_memory)
 
-    ventas = extract_minutas(Path(args.sql), out_dir)
-    pagos = extract_pagos(Path(args.excel), out_dir)
+    dag = build_dag(args, out_dir)
+    if args.profile:
+        dag.max_workers = 1
+    extract_stage = "projects" if args.by_project else "extract_ventas"
+    force = set(dag.order) if args.force else ({extract_stage} if args.full_refresh else set())
+    results = dag.run(from_stage=args.from_stage, only=args.only, force=force)
 
-    cobr = transform_cobranzas(ventas, pagos, out_dir)
-    build_summary(cobr, out_dir)
-
-    if args.snapshot:
-        snap = save_snapshot(cobr, out_dir / "snapshots", "cobranzas")
-        print(f"Snapshot saved: {snap}")
+    snap = results.get("snapshot")
+    if snap:
+        print(f"Snapshot saved: {snap['path']} ({snap['changed']} proformas cambiadas, {snap['deleted']} bajas)")
+    for r in results.get("projects") or []:
+        if r["status"] != "ok":
+            print(f"ATENCIÓN: proyecto {r['proyecto']!r} falló y no entra al consolidado: {r['error']}")
 
     print("OK: pipeline completo. Revisa artifacts/")
+    return 0
 
 """ - """
 
 import os
 from pathlib import Path
-from datetime import datetime
 import json
 import pandas as pd
 
-from .anonymize import anon_client, anon_unit
-
-def ts() -> str:
-    return datetime.utcnow().isoformat(timespec="seconds") + "Z"
+from .anonymize import HashCache, anon_clients_batch, anon_units_batch
 
 def ensure_dir(p: Path) -> None:
     p.mkdir(parents=True, exist_ok=True)
@@ -247,7 +1004,7 @@ def map_tipo_item(tipo: str) -> str:
         return "DEP"
     return "DEPTO"
 
-def run(csv_path: Path, out_dir: Path) -> None:
+def run(csv_path: Path, out_dir: Path, anon_cache: Path | None = None, workers: int | None = None) -> None:
     started = ts()
     ensure_dir(out_dir)
 
@@ -260,17 +1017,18 @@ def run(csv_path: Path, out_dir: Path) -> None:
     # 1) filtro estados por cobrar
     df = df[df["estado"].isin(["pendiente", "por_cobrar"])].copy()
 
-    # 2) columnas anonimizadas
-    df["cliente_anon"] = df.apply(
-        lambda r: anon_client(
-            str(r.get("nombres_cliente", "")),
-            str(r.get("apellidos_cliente", "")),
-            None if pd.isna(r.get("documento_cliente")) else str(r.get("documento_cliente")),
-            salt,
-        ),
-        axis=1,
+    # 2) columnas anonimizadas (un hash por clave distinta, no por fila)
+    cache = HashCache(anon_cache, salt) if anon_cache else None
+    vacio = pd.Series("", index=df.index)
+    df["cliente_anon"] = anon_clients_batch(
+        df.get("nombres_cliente", vacio),
+        df.get("apellidos_cliente", vacio),
+        df.get("documento_cliente", pd.Series(None, index=df.index, dtype=object)),
+        salt, cache=cache, workers=workers,
     )
-    df["unidad_anon"] = df["codigo_proforma"].astype(str).apply(lambda x: anon_unit(x, salt))
+    df["unidad_anon"] = anon_units_batch(df["codigo_proforma"], salt, cache=cache, workers=workers)
+    if cache is not None:
+        cache.save()
     df["tipo_item"] = df["tipo"].astype(str).apply(map_tipo_item)
 
     # 3) agregación de gestión
@@ -283,15 +1041,7 @@ def run(csv_path: Path, out_dir: Path) -> None:
     )
 
     # 4) artefactos
-    out_csv = out_dir / "cuentas_por_cobrar_anon.csv"
-    out.to_csv(out_csv, index=False)
-
-    try:
-        out_parquet = out_dir / "cuentas_por_cobrar_anon.parquet"
-        out.to_parquet(out_parquet, index=False)
-    except Exception:
-        # parquet es opcional si falta pyarrow
-        pass
+    art = write_table(out, out_dir, "cuentas_por_cobrar_anon", fmt="parquet", csv=True)
 
     kpis = {
         "rows": int(len(out)),
@@ -306,13 +1056,22 @@ def run(csv_path: Path, out_dir: Path) -> None:
         "finished": ts(),
         "input_csv": str(csv_path),
         "artifacts_dir": str(out_dir),
+        "artifacts": {"cuentas_por_cobrar_anon": art},
+        "anon_cache": None if cache is None else {"hits": cache.hits, "misses": cache.misses},
     }
     (out_dir / "run_meta.json").write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
 
-if __name__ == "__main__":
-    import argparse
-    ap = argparse.ArgumentParser()
+def cuentas_main(argv: list[str] | None = None, prog: str = "python -m src.cobranzas cuentas") -> int:
+    ap = argparse.ArgumentParser(prog=prog)
     ap.add_argument("--csv", required=True)
     ap.add_argument("--out", default="artifacts/latest")
-    args = ap.parse_args()
-    run(Path(args.csv), Path(args.out))
+    ap.add_argument("--anon-cache", default=None,
+                    help="carpeta para cache persistente clave->hash por salt (contiene claves en claro; fuera de artifacts/)")
+    ap.add_argument("--workers", type=int, default=None, help="procesos para hashear volúmenes grandes de claves")
+    args = ap.parse_args(argv)
+    run(Path(args.csv), Path(args.out), Path(args.anon_cache) if args.anon_cache else None, args.workers)
+    return 0
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(main())
@@ -0,0 +1,134 @@
+from __future__ import annotations
+import json
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .cobranzas.schema import as_cents, epoch_days
+
+# modelo base (logístico, pesos fijados a mano): más avance y más pagos bajan el riesgo, más días sin pagar lo suben.
+# asesor / medio_captacion quedan neutros hasta que un modelo calibrado (--risk-model <json>) traiga sus pesos.
+DEFAULT_MODEL = {
+    "version": "base-1",
+    "intercept": -0.5,
+    # feature -> coef sobre (transform(x) - center) / scale; clip antes de transformar
+    "numeric": {
+        "avance_pct": {"coef": -2.0, "center": 0.3, "scale": 0.25, "clip": [0.0, 1.0]},
+        "n_pagos": {"coef": -0.5, "center": 1.4, "scale": 1.0, "transform": "log1p"},
+        "dias_sin_pago": {"coef": 1.2, "center": 60.0, "scale": 60.0, "clip": [0.0, 720.0]},
+    },
+    # columna -> {valor: coef}; valores que no están (o nulos) suman 0
+    "categorical": {
+        "tipo_compra": {"departamento solo": 0.0, "depa + estacionamiento": -0.1,
+                        "depa + estacionamiento + deposito": -0.2},
+        "asesor": {},
+        "medio_captacion": {},
+    },
+    # cortes de risk_score para bajo / medio / alto
+    "bands": [0.3, 0.6],
+}
+BANDS = ("bajo", "medio", "alto")
+OUTPUT_COLUMNS = ["codigo_proforma", "documento_cliente", "proyecto", "asesor", "deuda_pendiente", "avance_pct",
+                  "n_pagos", "dias_sin_pago"]
+
+@dataclass(frozen=True)
+class RiskModel:
+    version: str
+    intercept: float
+    numeric: dict = field(default_factory=dict)
+    categorical: dict = field(default_factory=dict)
+    bands: tuple[float, float] = (0.3, 0.6)
+
+    @classmethod
+    def from_dict(cls, d: dict) -> RiskModel:
+        unknown = set(d.get("numeric", {})) - {"avance_pct", "n_pagos", "dias_sin_pago"}
+        if unknown:
+            raise ValueError(f"Features numéricas no soportadas en el modelo: {sorted(unknown)}")
+        return cls(str(d.get("version", "sin_version")), float(d.get("intercept", 0.0)), d.get("numeric", {}),
+                   d.get("categorical", {}), tuple(d.get("bands", (0.3, 0.6))))
+
+    def to_dict(self) -> dict:
+        return {"version": self.version, "intercept": self.intercept, "numeric": self.numeric,
+                "categorical": self.categorical, "bands": list(self.bands)}
+
+@lru_cache(maxsize=8)
+def _load(path: str | None, mtime_ns: int) -> RiskModel:
+    if path is None:
+        return RiskModel.from_dict(DEFAULT_MODEL)
+    return RiskModel.from_dict(json.loads(Path(path).read_text(encoding="utf-8")))
+
+def load_model(path: str | Path | None = None) -> RiskModel:
+    """Modelo de `path` (json con el formato de DEFAULT_MODEL) o el base; se parsea una vez por versión del archivo."""
+    if path is None:
+        return _load(None, 0)
+    p = Path(path).resolve()
+    return _load(str(p), p.stat().st_mtime_ns)
+
+def build_features(df: pd.DataFrame, hoy=None) -> pd.DataFrame:
+    """avance_pct, n_pagos y dias_sin_pago (desde el último pago; sin pagos, desde la minuta / separación)."""
+    hoy = np.datetime64(pd.Timestamp(hoy if hoy is not None else pd.Timestamp.today()).date(), "D").astype("int64")
+    n = len(df)
+    desde = np.full(n, np.nan)
+    for col in ("fecha_ultimo_pago", "fecha_minuta", "fecha_separacion"):
+        if col in df.columns:
+            falta = np.isnan(desde)
+            if not falta.any():
+                break
+            desde[falta] = epoch_days(df[col])[falta]
+    avance = pd.to_numeric(df["avance_pct"], errors="coerce") if "avance_pct" in df.columns else pd.Series(0.0, index=df.index)
+    n_pagos = pd.to_numeric(df["n_pagos"], errors="coerce") if "n_pagos" in df.columns else pd.Series(0, index=df.index)
+    return pd.DataFrame({
+        "avance_pct": avance.fillna(0).to_numpy(dtype=float),
+        "n_pagos": n_pagos.fillna(0).to_numpy(dtype=float),
+        "dias_sin_pago": np.nan_to_num(np.clip(hoy - desde, 0, None), nan=0.0),
+    }, index=df.index)
+
+def _lookup(s: pd.Series, weights: dict) -> np.ndarray:
+    # coef por fila: tabla por categoría indexada con los códigos (un valor distinto = una búsqueda)
+    if not weights:
+        return np.zeros(len(s))
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        codes, cats = s.cat.codes.to_numpy(), s.cat.categories
+    else:
+        codes, cats = pd.factorize(s)
+    lut = np.append(pd.Series(cats, dtype=object).map(weights).fillna(0.0).to_numpy(dtype=float), 0.0)
+    return lut[codes]  # código -1 (nulo) -> último elemento = 0
+
+def score(df: pd.DataFrame, model: RiskModel | None = None, hoy=None) -> pd.DataFrame:
+    """Probabilidad de no pago por proforma: todas las filas en una pasada (matriz de features @ coeficientes)."""
+    model = model or load_model()
+    feats = build_features(df, hoy)
+    names = list(model.numeric)
+    X = np.empty((len(df), len(names)))
+    coef = np.empty(len(names))
+    for j, name in enumerate(names):
+        spec = model.numeric[name]
+        x = feats[name].to_numpy()
+        if "clip" in spec:
+            x = np.clip(x, *spec["clip"])
+        if spec.get("transform") == "log1p":
+            x = np.log1p(np.maximum(x, 0))
+        X[:, j] = (x - spec.get("center", 0.0)) / (spec.get("scale") or 1.0)
+        coef[j] = spec["coef"]
+    z = X @ coef + model.intercept
+    for col, weights in model.categorical.items():
+        if col in df.columns:
+            z += _lookup(df[col], weights)
+    p = 1.0 / (1.0 + np.exp(-np.clip(z, -30, 30)))
+
+    out = df[[c for c in OUTPUT_COLUMNS if c in df.columns and c not in feats.columns]].copy()
+    out[list(feats.columns)] = feats
+    sin_deuda = (as_cents(df["deuda_pendiente"]).fillna(0) <= 0).to_numpy() if "deuda_pendiente" in df.columns \
+        else np.zeros(len(df), dtype=bool)
+    # sin deuda no hay nada que cobrar: score 0 y banda aparte
+    p[sin_deuda] = 0.0
+    out["risk_score"] = np.round(p, 4)
+    band = np.asarray(BANDS, dtype=object)[np.searchsorted(np.asarray(model.bands), p, side="right")]
+    band[sin_deuda] = "sin_deuda"
+    out["risk_band"] = pd.Categorical(band, categories=["sin_deuda", *BANDS])
+    out["model_version"] = model.version
+    order = np.argsort(-out["risk_score"].to_numpy(), kind="stable")
+    return out.iloc[order].reset_index(drop=True)
@@ -0,0 +1,189 @@
+from __future__ import annotations
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+from .cobranzas.schema import as_cents
+
+# dimensiones del cubo; `mes` = mes de fecha_minuta (YYYY-MM)
+CUBE_DIMS = ["proyecto", "asesor", "prioridad", "tipo_compra", "mes"]
+MEASURES = ["ventas", "con_deuda", "deuda_pendiente", "total_pagado", "precio_total_venta"]
+# columnas del reporte que se guardan por fila en el top-k de cada grupo
+TOP_COLS = ["codigo_proforma", "proyecto", "cliente", "asesor", "prioridad", "tipo_compra", "mes",
+            "deuda_pendiente", "total_pagado", "precio_total_venta", "avance_pct"]
+TOTAL = "total"
+
+def grouping_sets() -> list[tuple[str, ...]]:
+    # todos los subconjuntos de CUBE_DIMS (CUBE): de () = total general a las 5 dimensiones
+    return [c for n in range(len(CUBE_DIMS) + 1) for c in combinations(CUBE_DIMS, n)]
+
+def grouping_name(dims) -> str:
+    dims = [d for d in CUBE_DIMS if d in dims]
+    return ",".join(dims) if dims else TOTAL
+
+def _mes(df: pd.DataFrame) -> pd.Series:
+    if "fecha_minuta" not in df.columns:
+        return pd.Series(pd.NA, index=df.index, dtype="string").astype("category")
+    # año*100+mes como categoría y se formatean solo las categorías (strftime por fila es lo caro)
+    fecha = pd.to_datetime(df["fecha_minuta"], errors="coerce")
+    ym = (fecha.dt.year * 100 + fecha.dt.month).astype("Int64").astype("category")
+    return ym.cat.rename_categories(lambda v: f"{v // 100:04d}-{v % 100:02d}")
+
+def _base(df: pd.DataFrame) -> pd.DataFrame:
+    # el reporte reducido a dimensiones + medidas (una fila por venta)
+    out = pd.DataFrame(index=df.index)
+    for d in CUBE_DIMS:
+        if d == "mes":
+            out[d] = _mes(df)
+        elif d in df.columns:
+            out[d] = df[d] if isinstance(df[d].dtype, pd.CategoricalDtype) else df[d].astype("category")
+        else:
+            out[d] = pd.Series(pd.NA, index=df.index, dtype="string").astype("category")
+    deuda = as_cents(df["deuda_pendiente"])
+    out["ventas"] = 1
+    out["con_deuda"] = (deuda > 0).fillna(False).astype("int64")
+    out["deuda_pendiente"] = deuda
+    for c in ("total_pagado", "precio_total_venta"):
+        out[c] = as_cents(df[c]) if c in df.columns else pd.array([0] * len(df), dtype="Int64")
+    return out
+
+def _top_k_per_group(codes: np.ndarray, values: np.ndarray, k: int) -> np.ndarray:
+    """Posiciones de los k mayores `values` por grupo, ordenadas por (grupo, valor desc, posición).
+
+    Selección parcial: los grupos con más de k filas usan argpartition (O(n)), no un sort completo.
+    """
+    if len(codes) == 0:
+        return np.array([], dtype=np.int64)
+    order = np.argsort(codes, kind="stable")
+    sorted_codes = codes[order]
+    starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+    sizes = np.diff(np.r_[starts, len(order)])
+    # grupos chicos: entran completos, sin loop
+    small = np.repeat(sizes <= k, sizes)
+    keep = [order[small]]
+    for s, n in zip(starts[sizes > k], sizes[sizes > k]):
+        idx = order[s:s + n]
+        keep.append(idx[np.argpartition(-values[idx], k - 1)[:k]])
+    sel = np.concatenate(keep)
+    return sel[np.lexsort((sel, -values[sel], codes[sel]))]
+
+def _codes(frame: pd.DataFrame, dims: tuple[str, ...]) -> np.ndarray:
+    if not dims:
+        return np.zeros(len(frame), dtype=np.int64)
+    return frame.groupby(list(dims), observed=True, dropna=False, sort=False).ngroup().to_numpy()
+
+def build_cube(df: pd.DataFrame, k: int = 10) -> "Cube":
+    """Agregados de todos los grouping sets de CUBE_DIMS + top-k de deuda por grupo, en una pasada.
+
+    Un solo groupby sobre el reporte (al nivel más fino); los niveles más gruesos se derivan de esa
+    tabla chica (las medidas son sumas). El top-k de un grupo sale de la unión de los top-k de sus
+    subgrupos del nivel fino, que lo contiene.
+    """
+    base = _base(df)
+    finest = base.groupby(CUBE_DIMS, observed=True, dropna=False)[MEASURES].sum().reset_index()
+
+    values = base["deuda_pendiente"].astype("float64").fillna(-np.inf).to_numpy()
+    cand = _top_k_per_group(_codes(base, tuple(CUBE_DIMS)), values, k)
+    # filas del top con los montos ya en céntimos (_base)
+    report = df.assign(mes=base["mes"], **{c: base[c] for c in MEASURES[2:] if c in df.columns})
+    cand_rows = report.iloc[cand][[c for c in TOP_COLS if c in report.columns]].reset_index(drop=True)
+    cand_values = values[cand]
+
+    aggs, tops = [], []
+    for dims in grouping_sets():
+        name = grouping_name(dims)
+        if dims:
+            g = finest.groupby(list(dims), observed=True, dropna=False)[MEASURES].sum().reset_index()
+        else:
+            g = finest[MEASURES].sum().to_frame().T.reset_index(drop=True)
+        aggs.append(g.assign(agrupacion=name))
+
+        codes = _codes(cand_rows, dims)
+        sel = _top_k_per_group(codes, cand_values, k)
+        top = cand_rows.iloc[sel].reset_index(drop=True)
+        rank = pd.Series(codes[sel]).groupby(codes[sel]).cumcount().to_numpy() + 1
+        tops.append(top.assign(agrupacion=name, rank=rank))
+
+    agg = pd.concat(aggs, ignore_index=True)
+    for c in ("ventas", "con_deuda"):
+        agg[c] = agg[c].astype("int64")
+    # avance del grupo = pagado / pactado del grupo (no el promedio de los avances por venta)
+    pactado = agg["precio_total_venta"].astype(float)
+    agg["avance_pct"] = (agg["total_pagado"].astype(float) / pactado.where(pactado != 0)).fillna(0.0)
+    agg = _finish(agg, ["agrupacion", *CUBE_DIMS, *MEASURES, "avance_pct"], df)
+    top = _finish(pd.concat(tops, ignore_index=True), ["agrupacion", "rank", *TOP_COLS], df)
+    return Cube(agg, top, k)
+
+def _finish(frame: pd.DataFrame, cols: list[str], df: pd.DataFrame) -> pd.DataFrame:
+    # mismas categorías que el reporte (concat de grouping sets las pierde) y orden de columnas fijo
+    frame = frame[[c for c in cols if c in frame.columns]].copy()
+    frame["agrupacion"] = frame["agrupacion"].astype(pd.CategoricalDtype([grouping_name(d) for d in grouping_sets()]))
+    for d in CUBE_DIMS:
+        if d in frame.columns:
+            src = df[d] if d in df.columns and isinstance(df[d].dtype, pd.CategoricalDtype) else None
+            frame[d] = frame[d].astype(src.dtype if src is not None else "category")
+    for c in ("deuda_pendiente", "total_pagado", "precio_total_venta"):
+        if c in frame.columns:
+            frame[c] = frame[c].astype("Int64")
+    return frame
+
+def _key(v):
+    return None if v is None or v is pd.NA or (isinstance(v, float) and np.isnan(v)) else str(v)
+
+class Cube:
+    """Lectura del cubo: `total(proyecto="X", mes="2025-01")`, `top(10, asesor="Y")`, `slice("proyecto")`.
+
+    Los filtros eligen el grouping set (las dimensiones filtradas) y la clave; el índice de cada
+    grouping set se arma una vez al primer uso y después cada consulta es un lookup.
+    """
+
+    def __init__(self, aggs: pd.DataFrame, top: pd.DataFrame, k: int | None = None):
+        self.aggs = aggs
+        self.top_rows = top
+        self.k = k if k is not None else int(top["rank"].max()) if len(top) else 0
+        self._agg_index: dict[str, dict] = {}
+        self._top_index: dict[str, dict] = {}
+
+    @staticmethod
+    def _filters(filters: dict) -> tuple[str, tuple]:
+        unknown = set(filters) - set(CUBE_DIMS)
+        if unknown:
+            raise ValueError(f"Dimensiones fuera del cubo: {sorted(unknown)} (cubo: {', '.join(CUBE_DIMS)})")
+        dims = [d for d in CUBE_DIMS if d in filters]
+        return grouping_name(dims), tuple(_key(filters[d]) for d in dims)
+
+    def _index(self, cache: dict, frame: pd.DataFrame, name: str) -> dict:
+        if name not in cache:
+            dims = [] if name == TOTAL else name.split(",")
+            pos = np.flatnonzero((frame["agrupacion"] == name).to_numpy())
+            keys = zip(*(frame[d].to_numpy(dtype=object)[pos] for d in dims)) if dims else (() for _ in pos)
+            idx: dict = {}
+            for p, key in zip(pos, keys):
+                idx.setdefault(tuple(_key(v) for v in key), []).append(p)
+            cache[name] = idx
+        return cache[name]
+
+    def total(self, **filters) -> pd.Series:
+        """Medidas del grupo (montos en céntimos); grupo inexistente = ceros."""
+        name, key = self._filters(filters)
+        pos = self._index(self._agg_index, self.aggs, name).get(key)
+        if not pos:
+            return pd.Series({**{m: 0 for m in MEASURES}, "avance_pct": 0.0})
+        return self.aggs.iloc[pos[0]][[*MEASURES, "avance_pct"]]
+
+    def top(self, k: int | None = None, **filters) -> pd.DataFrame:
+        """Top-k por deuda del grupo (k <= el k con que se construyó el cubo)."""
+        k = self.k if k is None else k
+        if k > self.k:
+            raise ValueError(f"El cubo guarda top {self.k}; pediste {k}.")
+        name, key = self._filters(filters)
+        pos = self._index(self._top_index, self.top_rows, name).get(key, [])
+        return self.top_rows.iloc[pos[:k]].drop(columns=["agrupacion", "rank"]).reset_index(drop=True)
+
+    def slice(self, *dims: str) -> pd.DataFrame:
+        """Todos los grupos de un grouping set, de mayor a menor deuda."""
+        name, _ = self._filters(dict.fromkeys(dims))
+        g = self.aggs[self.aggs["agrupacion"] == name]
+        keep = [c for c in self.aggs.columns if c != "agrupacion" and (c not in CUBE_DIMS or c in dims)]
+        return g[keep].sort_values("deuda_pendiente", ascending=False, kind="stable").reset_index(drop=True)
@@ -0,0 +1,226 @@
+from __future__ import annotations
+import argparse
+import json
+import re
+from datetime import date
+from pathlib import Path
+
+import pandas as pd
+
+from .cobranzas.schema import MONEY_COLUMNS, as_cents
+from .stages import row_hash
+
+KEY = "codigo_proforma"
+_HASH = "_row_hash"
+_DELETED = "_deleted"  # solo en la salida de history()
+_FECHA = "fecha_snapshot"
+_CSV_RE = re.compile(r"^(?P<prefix>.+)_(?P<fecha>\d{4}-\d{2}-\d{2})\.csv$")
+
+class SnapshotStore:
+    """Snapshots diarios particionados por fecha (`<root>/<prefix>/fecha=YYYY-MM-DD/part-0.parquet`).
+
+    Cada partición guarda solo las proformas nuevas o cambiadas respecto al estado anterior
+    (hash de filas por `codigo_proforma`); las que desaparecieron van a `deleted.parquet`. Cada
+    `checkpoint_every` particiones se escribe el estado completo para acotar las lecturas.
+    """
+
+    def __init__(self, root: Path, prefix: str = "cobranzas", key: str = KEY, checkpoint_every: int = 30):
+        self.dir = root / prefix
+        self.key = key
+        self.checkpoint_every = checkpoint_every
+        self._manifest_path = self.dir / "_manifest.json"
+
+    # --- manifest ---
+    def _manifest(self) -> dict:
+        if not self._manifest_path.exists():
+            return {"key": self.key, "partitions": {}}
+        return json.loads(self._manifest_path.read_text(encoding="utf-8"))
+
+    def _save_manifest(self, m: dict) -> None:
+        self.dir.mkdir(parents=True, exist_ok=True)
+        m["partitions"] = dict(sorted(m["partitions"].items()))
+        self._manifest_path.write_text(json.dumps(m, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    def _part_path(self, fecha: str) -> Path:
+        return self.dir / f"fecha={fecha}" / "part-0.parquet"
+
+    def _tomb_path(self, fecha: str) -> Path:
+        return self.dir / f"fecha={fecha}" / "deleted.parquet"
+
+    def dates(self) -> list[str]:
+        return sorted(self._manifest()["partitions"])
+
+    def latest_before(self, fecha: date | str) -> str | None:
+        prev = [d for d in self.dates() if d < str(fecha)]
+        return prev[-1] if prev else None
+
+    # --- lectura ---
+    def _chain(self, fecha: str) -> list[str]:
+        # particiones necesarias para reconstruir `fecha`: desde el último checkpoint <= fecha
+        parts = self._manifest()["partitions"]
+        ds = [d for d in sorted(parts) if d <= fecha]
+        start = 0
+        for i, d in enumerate(ds):
+            if parts[d].get("checkpoint"):
+                start = i
+        return ds[start:]
+
+    @staticmethod
+    def _money_as_cents(df: pd.DataFrame) -> pd.DataFrame:
+        # particiones anteriores al esquema en céntimos guardan montos float en soles: se normaliza cada
+        # partición antes del concat (float + Int64 -> Float64, que as_cents leería como soles)
+        for c in MONEY_COLUMNS.intersection(df.columns):
+            df[c] = as_cents(df[c])
+        return df
+
+    def _read_part(self, path: Path, columns: list[str] | None = None) -> pd.DataFrame:
+        return self._money_as_cents(pd.read_parquet(path, columns=columns))
+
+    def _read_raw(self, fecha: str, columns: list[str] | None = None) -> pd.DataFrame:
+        cols = None if columns is None else list(dict.fromkeys([self.key, *columns, _HASH]))
+        chain = self._chain(fecha)
+        frames = [self._read_part(self._part_path(d), cols).assign(**{_FECHA: d}) for d in chain]
+        if not frames:
+            return pd.DataFrame(columns=cols or [self.key, _HASH])
+        raw = pd.concat(frames, ignore_index=True)
+        marks = [raw[[self.key, _FECHA]]]
+        marks += [pd.read_parquet(self._tomb_path(d)).assign(**{_FECHA: d})
+                  for d in chain if self._tomb_path(d).exists()]
+        # por proforma vale la última partición donde aparece (datos o baja); puede tener varias filas
+        last = pd.concat(marks, ignore_index=True).groupby(self.key, sort=False)[_FECHA].max()
+        keep = raw[_FECHA].to_numpy() == raw[self.key].map(last).to_numpy()
+        return raw.loc[keep].drop(columns=[_FECHA]).reset_index(drop=True)
+
+    def as_of(self, fecha: date | str | None = None, columns: list[str] | None = None) -> pd.DataFrame:
+        """Estado completo del snapshot vigente a `fecha` (default: el último)."""
+        ds = self.dates()
+        if not ds:
+            raise FileNotFoundError(f"No hay snapshots en {self.dir}")
+        fecha = ds[-1] if fecha is None else str(fecha)
+        return self._read_raw(fecha, columns).drop(columns=[_HASH])
+
+    def history(self, keys, columns: list[str] | None = None) -> pd.DataFrame:
+        """Versiones de una o varias proformas a lo largo del tiempo, sin cargar particiones completas."""
+        import pyarrow.parquet as pq
+
+        keys = [keys] if isinstance(keys, str) else [str(k) for k in keys]
+        lo, hi = min(keys), max(keys)
+        cols = None if columns is None else list(dict.fromkeys([self.key, *columns]))
+        frames = []
+        for d, meta in self._manifest()["partitions"].items():
+            if meta.get("deleted") and self._tomb_path(d).exists():
+                t = pq.read_table(self._tomb_path(d), filters=[(self.key, "in", keys)])
+                if t.num_rows:
+                    frames.append(t.to_pandas().assign(**{_FECHA: d, _DELETED: True}))
+            # rango de claves por partición en el manifest + estadísticas de row group en parquet
+            if meta["rows"] == 0 or meta["key_max"] < lo or meta["key_min"] > hi:
+                continue
+            t = pq.read_table(self._part_path(d), columns=cols, filters=[(self.key, "in", keys)])
+            if t.num_rows:
+                frames.append(self._money_as_cents(t.to_pandas()).assign(**{_FECHA: d, _DELETED: False}))
+        if not frames:
+            return pd.DataFrame(columns=[_FECHA, *(cols or [self.key])])
+        out = pd.concat(frames, ignore_index=True).drop(columns=[_HASH], errors="ignore")
+        out = out[[_FECHA] + [c for c in out.columns if c != _FECHA]]
+        return out.sort_values([self.key, _FECHA], kind="stable").reset_index(drop=True)
+
+    # --- escritura ---
+    def _key_hashes(self, df: pd.DataFrame) -> pd.DataFrame:
+        # hash por proforma = suma (mod 2^64) de los hashes de sus filas; no depende del orden
+        return df.groupby(self.key, sort=False)[_HASH].sum().reset_index()
+
+    def write(self, df: pd.DataFrame, fecha: date | str | None = None) -> dict:
+        fecha = str(fecha or date.today().isoformat())
+        m = self._manifest()
+        ds = sorted(m["partitions"])
+        if ds and fecha < ds[-1]:
+            raise ValueError(f"Snapshot {fecha} es anterior al último guardado ({ds[-1]}); no se reescribe historia.")
+
+        # montos siempre en céntimos Int64 (los csv migrados llegan en soles)
+        cur = self._money_as_cents(df.reset_index(drop=True).copy())
+        cur[_HASH] = row_hash(cur).to_numpy()
+
+        prev_date = self.latest_before(fecha)
+        n_since_ckpt = 0
+        for d in reversed([d for d in ds if d < fecha]):
+            if m["partitions"][d].get("checkpoint"):
+                break
+            n_since_ckpt += 1
+        checkpoint = prev_date is None or n_since_ckpt + 1 >= self.checkpoint_every
+
+        cur_k = self._key_hashes(cur)
+        if prev_date is None:
+            changed = cur_k[self.key]
+            deleted = cur_k[self.key].iloc[:0]
+        else:
+            prev_k = self._key_hashes(self._read_raw(prev_date, columns=[]))
+            # hash join sobre (codigo_proforma, hash de la proforma)
+            pair = cur_k.merge(prev_k, on=[self.key, _HASH], how="left", indicator=True)
+            changed = pair.loc[pair["_merge"] == "left_only", self.key]
+            deleted = prev_k.loc[~prev_k[self.key].isin(cur_k[self.key]), self.key]
+
+        part = cur if checkpoint else cur.loc[cur[self.key].isin(changed)]
+        part = part.sort_values(self.key, kind="stable", key=lambda s: s.astype(str))
+
+        path = self._part_path(fecha)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        part.to_parquet(path, index=False, row_group_size=50_000)
+        tomb_path = self._tomb_path(fecha)
+        if len(deleted) and not checkpoint:
+            # un checkpoint es el estado completo: lo ausente ya está dado de baja
+            pd.DataFrame({self.key: deleted.to_numpy()}).to_parquet(tomb_path, index=False)
+        elif tomb_path.exists():
+            tomb_path.unlink()
+
+        keys_str = part[self.key].astype(str)
+        meta = {
+            "rows": int(len(part)),
+            "rows_total": int(len(cur)),
+            "changed": int(len(changed)),
+            "deleted": int(len(deleted)),
+            "checkpoint": bool(checkpoint),
+            "key_min": keys_str.min() if len(part) else "",
+            "key_max": keys_str.max() if len(part) else "",
+        }
+        m["partitions"][fecha] = meta
+        self._save_manifest(m)
+        return {"fecha": fecha, "path": str(path), **meta}
+
+def migrate_csv_snapshots(src_dir: Path, store: SnapshotStore, prefix: str = "cobranzas") -> list[dict]:
+    """Carga los `<prefix>_YYYY-MM-DD.csv` existentes al store, en orden de fecha."""
+    found = []
+    for p in src_dir.glob(f"{prefix}_*.csv"):
+        m = _CSV_RE.match(p.name)
+        if m and m.group("prefix") == prefix:
+            found.append((m.group("fecha"), p))
+    done = set(store.dates())
+    out = []
+    for fecha, p in sorted(found):
+        if fecha in done:
+            continue
+        out.append(store.write(pd.read_csv(p), fecha))
+    return out
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Snapshot store de cobranzas")
+    ap.add_argument("--root", default="artifacts/snapshots")
+    ap.add_argument("--prefix", default="cobranzas")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sp = sub.add_parser("migrate", help="migra snapshots csv planos al store particionado")
+    sp.add_argument("--src", default=None, help="carpeta con <prefix>_YYYY-MM-DD.csv (default: --root)")
+    sp = sub.add_parser("as-of", help="estado a una fecha")
+    sp.add_argument("fecha", nargs="?")
+    sp.add_argument("--out", required=True)
+    sp = sub.add_parser("history", help="historia de proformas")
+    sp.add_argument("codigo_proforma", nargs="+")
+    args = ap.parse_args()
+
+    store = SnapshotStore(Path(args.root), args.prefix)
+    if args.cmd == "migrate":
+        for r in migrate_csv_snapshots(Path(args.src or args.root), store, args.prefix):
+            print(f"{r['fecha']}: {r['rows']} filas ({r['changed']} cambiadas, {r['deleted']} bajas)")
+    elif args.cmd == "as-of":
+        store.as_of(args.fecha).to_csv(args.out, index=False)
+        print(f"OK: {args.out}")
+    else:
+        print(store.history(args.codigo_proforma).to_string(index=False))
@@ -1,24 +1,35 @@
 from __future__ import annotations
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
 from datetime import datetime, date
 import json
 import pandas as pd
 
+from .cobranzas.schema import to_display
+
 @dataclass
 class StageResult:
     name: str
     started_at: str
     finished_at: str
     metrics: dict
+    # nombre lógico -> {"format", "path", "rows", "schema"} (ver write_table)
+    artifacts: dict = field(default_factory=dict)
+    # wall/cpu/memoria/filas de la etapa (ver perf.StagePerf)
+    perf: dict = field(default_factory=dict)
 
-def _ts() -> str:
+def ts() -> str:
     return datetime.utcnow().isoformat(timespec="seconds") + "Z"
 
 def write_stage_artifact(out_dir: Path, result: StageResult) -> None:
     out_dir.mkdir(parents=True, exist_ok=True)
+    payload = dict(result.metrics)
+    if result.artifacts:
+        payload["artifacts"] = result.artifacts
+    if result.perf:
+        payload["perf"] = result.perf
     (out_dir / f"stage_{result.name}.json").write_text(
-        json.dumps(result.metrics, ensure_ascii=False, indent=2),
+        json.dumps(payload, ensure_ascii=False, indent=2, default=str),
         encoding="utf-8"
     )
     md = []
@@ -31,11 +42,121 @@ def write_stage_artifact(out_dir: Path, result: StageResult) -> None:
     md.append("")
     for k, v in result.metrics.items():
         md.append(f"- **{k}**: {v}")
+    if result.artifacts:
+        md.append("")
+        md.append("## Artifacts")
+        md.append("")
+        for k, a in result.artifacts.items():
+            md.append(f"- **{k}**: `{a['path']}` ({a['format']}, {a['rows']} filas)")
+    if result.perf:
+        md.append("")
+        md.append("## Perf")
+        md.append("")
+        for k, v in result.perf.items():
+            md.append(f"- **{k}**: {v}")
     (out_dir / f"stage_{result.name}.md").write_text("\n".join(md), encoding="utf-8")
 
-def save_snapshot(df: pd.DataFrame, out_dir: Path, prefix: str) -> Path:
+ARTIFACT_FORMATS = ("parquet", "arrow", "csv")
+_SUFFIX = {"parquet": ".parquet", "arrow": ".arrow", "csv": ".csv"}
+
+def artifact_path(out_dir: Path, name: str, fmt: str) -> Path:
+    if fmt not in _SUFFIX:
+        raise ValueError(f"Formato de artefacto no soportado: {fmt!r} (usa {', '.join(ARTIFACT_FORMATS)})")
+    return out_dir / f"{name}{_SUFFIX[fmt]}"
+
+def table_schema(df: pd.DataFrame) -> dict:
+    try:
+        import pyarrow as pa
+    except ImportError:
+        return {c: str(t) for c, t in df.dtypes.items()}
+    return {f.name: str(f.type) for f in pa.Schema.from_pandas(df, preserve_index=False)}
+
+def write_table(df: pd.DataFrame, out_dir: Path, name: str, fmt: str = "parquet", csv: bool = False) -> dict:
+    """Escribe `df` como <name>.<fmt> (+ <name>.csv si csv=True); devuelve la entrada para StageResult.artifacts."""
     out_dir.mkdir(parents=True, exist_ok=True)
+    path = artifact_path(out_dir, name, fmt)
+    if fmt == "parquet":
+        df.to_parquet(path, index=False)
+    elif fmt == "arrow":
+        # arrow IPC sin compresión: read_table lo abre con memory-map (zero-copy)
+        import pyarrow.feather as feather
+        feather.write_feather(df.reset_index(drop=True), path, compression="uncompressed")
+    if fmt == "csv" or csv:
+        # el csv es para humanos/excel: montos en soles
+        to_display(df).to_csv(out_dir / f"{name}.csv", index=False)
+    entry = {"format": fmt, "path": str(path), "rows": int(len(df)), "schema": table_schema(df)}
+    if csv and fmt != "csv":
+        entry["csv_path"] = str(out_dir / f"{name}.csv")
+    return entry
+
+def find_table(out_dir: Path, name: str) -> Path | None:
+    for fmt in ARTIFACT_FORMATS:
+        p = artifact_path(out_dir, name, fmt)
+        if p.exists():
+            return p
+    return None
+
+def read_table(path: Path, columns: list[str] | None = None, memory_map: bool = True) -> pd.DataFrame:
+    suffix = path.suffix.lower()
+    if suffix == ".arrow":
+        import pyarrow.feather as feather
+        return feather.read_feather(path, columns=columns, memory_map=memory_map)
+    if suffix == ".parquet":
+        return pd.read_parquet(path, columns=columns, memory_map=memory_map)
+    return pd.read_csv(path, usecols=columns)
+
+def save_snapshot(df: pd.DataFrame, out_dir: Path, prefix: str, fmt: str = "csv") -> Path:
     d = date.today().isoformat()
-    p = out_dir / f"{prefix}_{d}.csv"
-    df.to_csv(p, index=False)
-    return p
+    write_table(df, out_dir, f"{prefix}_{d}", fmt=fmt)
+    return artifact_path(out_dir, f"{prefix}_{d}", fmt)
+
+def write_batches(batches, out_dir: Path, name: str, fmt: str = "parquet", csv: bool = False) -> dict:
+    # escribe tablas arrow a medida que llegan: parquet (un row group por batch) o arrow IPC (un
+    # record batch por batch) + csv opcional; nunca materializa el resultado completo
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    path = artifact_path(out_dir, name, fmt)
+    csv_path = out_dir / f"{name}.csv" if (csv or fmt == "csv") else None
+    writer = None
+    schema = None
+    n_batches = 0
+    rows = 0
+    try:
+        for tbl in batches:
+            if schema is None:
+                schema = tbl.schema
+                if fmt == "parquet":
+                    writer = pq.ParquetWriter(path, schema)
+                elif fmt == "arrow":
+                    writer = pa.ipc.new_file(path, schema)
+            if writer is not None:
+                writer.write_table(tbl)
+            if csv_path is not None:
+                chunk = tbl.to_pandas(types_mapper={pa.int64(): pd.Int64Dtype()}.get)
+                chunk.to_csv(csv_path, index=False, mode="w" if n_batches == 0 else "a", header=n_batches == 0)
+            n_batches += 1
+            rows += tbl.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    entry = {"format": fmt, "path": str(path), "rows": rows,
+             "schema": {} if schema is None else {f.name: str(f.type) for f in schema}}
+    if csv_path is not None and fmt != "csv":
+        entry["csv_path"] = str(csv_path)
+    return {"batches": n_batches, "rows": rows, "artifact": entry}
+
+def process_peak_rss_mb() -> float | None:
+    # high-water mark de RSS de todo el proceso (no baja; con etapas en paralelo es compartido)
+    try:
+        import resource
+    except ImportError:  # windows
+        return None
+    # linux reporta ru_maxrss en KB
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+def row_hash(df: pd.DataFrame, cols: list[str] | None = None) -> pd.Series:
+    # hash uint64 por fila, estable entre csv/parquet/redshift (se hashea la representación texto)
+    cols = list(df.columns) if cols is None else cols
+    return pd.util.hash_pandas_object(df[cols].astype("string"), index=False)
@@ -0,0 +1,200 @@
+from __future__ import annotations
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# vocabularios tomados de las muestras reales (extract_ventas.csv / pagos.xlsx)
+PROYECTOS = {
+    "Edificio Urbanzen": "EEUU",
+    "Matera": "MT",
+    "Sialia": "SL",
+    "Modena": "MD",
+    "Torre Nápoles": "NP-A",
+}
+MEDIOS = ["página web", "caseta de ventas", "paso por la zona", "facebook", "instagram",
+          "contacto web", "nexo", "referido"]
+ASESORES = ["Karlo Vargas", "Nelly Román Villavicencio", "Ricardo Olaya", "Antonio Martinez",
+            "Katy Vasquez", "Lucía Ramos", "Diego Salas", "Mónica Paredes"]
+NOMBRES = ["JOSE", "MARIA", "LUIS", "ANA", "CARLOS", "ROSA", "JORGE", "CARMEN", "PEDRO", "LUCIA",
+           "MIGUEL", "ELENA", "JUAN", "SOFIA", "DANIEL", "NADIA"]
+APELLIDOS = ["QUISPE", "FLORES", "ROJAS", "GARCIA", "TORRES", "RAMIREZ", "CASTILLO", "VARGAS",
+             "MENDOZA", "CHAVEZ", "GUERRA", "SALAZAR", "YANA", "JUNES", "BELTRAN", "PAREDES"]
+METODOS = ["deposito", "transferencia", "yape/plin", "tarjeta"]
+OBSERVACIONES = [None, "cuota", "pago parcial", "anticipo", "regularizacion"]
+MONTOS = np.array([500, 800, 1000, 1500, 2000, 5000, 12000])
+
+# mezcla de tipo_compra: solo depa / + estacionamiento / + estacionamiento + depósito
+TIPO_COMPRA = ["departamento solo", "depa + estacionamiento", "depa + estacionamiento + deposito"]
+TIPO_COMPRA_P = [0.55, 0.35, 0.10]
+
+VENTAS_COLUMNS = [
+    "codigo_proforma", "codigo_unidad", "documento_cliente", "proyecto", "asesor", "cliente",
+    "medio_captacion", "unidad", "dorms", "unidades_adicionales", "precio_venta_depa_soles",
+    "fecha_separacion", "fecha_minuta", "estado_minuta", "codigo_estacionamiento_proforma",
+    "precio_estacionamiento_proforma", "codigo_deposito_proforma", "precio_deposito_proforma",
+    "tipo_compra", "precio_total_venta",
+]
+PAGOS_COLUMNS = [
+    "codigo_proforma", "documento_cliente", "codigo_unidad", "tipo_item", "codigo_item", "fecha_pago",
+    "monto_pagado", "moneda", "metodo_pago", "referencia", "observaciones",
+]
+
+_EPOCH = np.datetime64("2022-01-01")
+_ANCHOR = np.datetime64("2025-12-31")  # fecha fija: mismo seed -> mismos datos, corra cuando corra
+
+def _pick(rng: np.random.Generator, values: list, n: int, p=None) -> np.ndarray:
+    return np.asarray(values, dtype=object)[rng.choice(len(values), size=n, p=p)]
+
+def _zfill(a: np.ndarray, width: int) -> pd.Series:
+    return pd.Series(a).astype(str).str.zfill(width)
+
+def _dates(d: np.ndarray) -> np.ndarray:
+    return np.datetime_as_string(d, unit="D").astype(object)
+
+def _with_nulls(values: pd.Series, mask: np.ndarray) -> np.ndarray:
+    out = values.to_numpy(dtype=object)
+    out[~mask] = np.nan
+    return out
+
+def make_ventas(n: int, seed: int = 0) -> pd.DataFrame:
+    """`n` proformas con las columnas de sql_minutas_base.sql (tipos como al leer extract_ventas.csv)."""
+    rng = np.random.default_rng(seed)
+    proyectos = list(PROYECTOS)
+    proy = _pick(rng, proyectos, n)
+    prefix = pd.Series(proy).map(PROYECTOS)
+
+    piso = rng.integers(1, 26, n)
+    dpto = rng.integers(1, 9, n)
+    unidad = pd.Series(piso * 100 + dpto).astype(str)
+    year = 2022 + rng.integers(0, 4, n)
+
+    tipo = rng.choice(3, size=n, p=TIPO_COMPRA_P)
+    has_est = tipo >= 1
+    has_dep = tipo == 2
+    est_n = pd.Series(rng.integers(1, 120, n)).astype(str)
+    dep_n = pd.Series(rng.integers(1, 40, n)).astype(str)
+    cod_est = "E" + est_n
+    cod_dep = "D" + dep_n
+
+    precio_depa = np.round(rng.uniform(250_000, 700_000, n), 2)
+    precio_est = np.where(has_est, np.round(rng.uniform(25_000, 60_000, n), 2), np.nan)
+    precio_dep = np.where(has_dep, np.round(rng.uniform(8_000, 15_000, n), 2), np.nan)
+
+    adicionales = np.where(has_dep, prefix + "-" + cod_est + "," + prefix + "-" + cod_dep, prefix + "-" + cod_est)
+
+    sep = _EPOCH + rng.integers(0, int((_ANCHOR - _EPOCH).astype(int)) - 60, n).astype("timedelta64[D]")
+    minuta = sep + rng.integers(0, 60, n).astype("timedelta64[D]")
+
+    df = pd.DataFrame({
+        "codigo_proforma": pd.Series(year).astype(str) + "-" + _zfill(np.arange(1, n + 1), 7),
+        "codigo_unidad": prefix + "-" + unidad,
+        "documento_cliente": _zfill(rng.integers(1_000_000, 80_000_000, n), 8),
+        "proyecto": proy,
+        "asesor": _pick(rng, ASESORES, n),
+        "cliente": pd.Series(_pick(rng, NOMBRES, n)) + " " + _pick(rng, APELLIDOS, n) + " " + _pick(rng, APELLIDOS, n),
+        "medio_captacion": _pick(rng, MEDIOS, n),
+        "unidad": unidad,
+        "dorms": rng.integers(1, 4, n).astype(float),
+        "unidades_adicionales": _with_nulls(pd.Series(adicionales), has_est),
+        "precio_venta_depa_soles": precio_depa,
+        "fecha_separacion": _dates(sep),
+        "fecha_minuta": _dates(minuta),
+        "estado_minuta": "Minuta",
+        "codigo_estacionamiento_proforma": _with_nulls(cod_est, has_est),
+        "precio_estacionamiento_proforma": precio_est,
+        "codigo_deposito_proforma": _with_nulls(cod_dep, has_dep),
+        "precio_deposito_proforma": precio_dep,
+        "tipo_compra": np.asarray(TIPO_COMPRA, dtype=object)[tipo],
+        "precio_total_venta": np.round(precio_depa + np.nan_to_num(precio_est) + np.nan_to_num(precio_dep), 2),
+    })
+    return df[VENTAS_COLUMNS]
+
+def make_pagos(ventas: pd.DataFrame, n: int, seed: int = 0, item_share: float = 0.3) -> pd.DataFrame:
+    """`n` pagos sobre proformas de `ventas`; `item_share` de ellos a nivel item (depa/estac/depósito)."""
+    rng = np.random.default_rng(seed + 1)
+    idx = rng.integers(0, len(ventas), n)
+    v = ventas.iloc[idx].reset_index(drop=True)
+
+    # item al que va el pago: solo entre los items que la proforma tiene
+    has_est = v["codigo_estacionamiento_proforma"].notna().to_numpy()
+    has_dep = v["codigo_deposito_proforma"].notna().to_numpy()
+    n_items = 1 + has_est + has_dep
+    which = np.floor(rng.random(n) * n_items).astype(int)
+    is_item = rng.random(n) < item_share
+
+    tipo_item = np.asarray(["departamento", "estacionamiento", "deposito"], dtype=object)[which]
+    codigo_item = np.select(
+        [which == 0, which == 1],
+        [v["codigo_unidad"].to_numpy(dtype=object), v["codigo_estacionamiento_proforma"].to_numpy(dtype=object)],
+        default=v["codigo_deposito_proforma"].to_numpy(dtype=object),
+    )
+    tipo_item[~is_item] = np.nan
+    codigo_item[~is_item] = np.nan
+
+    fecha = _ANCHOR - rng.integers(0, 90, n).astype("timedelta64[D]")
+    df = pd.DataFrame({
+        "codigo_proforma": v["codigo_proforma"].to_numpy(),
+        "documento_cliente": v["documento_cliente"].astype("int64").to_numpy(),
+        "codigo_unidad": v["codigo_unidad"].to_numpy(),
+        "tipo_item": tipo_item,
+        "codigo_item": codigo_item,
+        "fecha_pago": _dates(fecha),
+        "monto_pagado": MONTOS[rng.integers(0, len(MONTOS), n)].astype("int64"),
+        "moneda": "PEN",
+        "metodo_pago": _pick(rng, METODOS, n),
+        "referencia": "OP" + _zfill(rng.integers(0, 1_000_000, n), 6),
+        "observaciones": _pick(rng, OBSERVACIONES, n),
+    })
+    return df[PAGOS_COLUMNS]
+
+def make_dataset(rows: int, seed: int = 0, pagos_per_venta: float = 7.0) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """(ventas, pagos) con `rows` filas de pagos y ~rows / pagos_per_venta proformas (ratio de las muestras)."""
+    n_ventas = max(1, int(rows / pagos_per_venta))
+    ventas = make_ventas(n_ventas, seed)
+    return ventas, make_pagos(ventas, rows, seed)
+
+def make_cuotas(ventas: pd.DataFrame, seed: int = 0, cuotas_por_venta: int = 12) -> pd.DataFrame:
+    """Cronograma mensual por venta (cliente, unidad): precio_total_venta en `cuotas_por_venta` cuotas."""
+    rng = np.random.default_rng(seed + 3)
+    n = len(ventas)
+    k = rng.integers(1, cuotas_por_venta + 1, size=n)
+    idx = np.repeat(np.arange(n), k)
+    nro = np.arange(len(idx)) - np.repeat(np.cumsum(k) - k, k)
+    total = np.round(pd.to_numeric(ventas["precio_total_venta"], errors="coerce").fillna(0).to_numpy() * 100)
+    cuota = np.floor(total / k)
+    # la última cuota se lleva el redondeo: la suma cuadra al céntimo con el precio
+    monto = np.where(nro == np.repeat(k - 1, k), np.repeat(total - cuota * (k - 1), k), np.repeat(cuota, k)) / 100
+    inicio = pd.to_datetime(ventas["fecha_minuta"], errors="coerce").fillna(pd.Timestamp(_EPOCH)).to_numpy()
+    vcto = inicio.astype("datetime64[M]")[idx] + nro.astype("timedelta64[M]")
+    return pd.DataFrame({
+        "cliente": ventas["cliente"].to_numpy(dtype=object)[idx],
+        "unidad": ventas["unidad"].to_numpy(dtype=object)[idx],
+        "numero_cuota": nro + 1,
+        "monto_programado": monto,
+        "fecha_vcto": _dates(vcto.astype("datetime64[D]") + 14),
+    })
+
+def parse_rows(s: str) -> int:
+    # "1k", "100k", "10M" -> int
+    s = s.strip().lower()
+    mult = {"k": 1_000, "m": 1_000_000}.get(s[-1:], 1)
+    return int(float(s[:-1] if mult > 1 else s) * mult)
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Genera ventas/pagos sintéticos con las columnas reales")
+    ap.add_argument("--rows", default="10k", help="filas de pagos (1k .. 10M); proformas = rows / 7")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", required=True)
+    ap.add_argument("--xlsx", action="store_true", help="escribe además pagos.xlsx (hoja 'pagos', máx ~1M filas)")
+    args = ap.parse_args()
+
+    out = Path(args.out)
+    out.mkdir(parents=True, exist_ok=True)
+    ventas, pagos = make_dataset(parse_rows(args.rows), args.seed)
+    ventas.to_parquet(out / "extract_ventas.parquet", index=False)
+    pagos.to_parquet(out / "pagos.parquet", index=False)
+    if args.xlsx:
+        pagos.to_excel(out / "pagos.xlsx", sheet_name="pagos", index=False)
+    print(f"OK: {len(ventas)} proformas, {len(pagos)} pagos en {out} (seed={args.seed})")
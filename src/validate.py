@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from .cobranzas.schema import CENTS, as_cents, parse_dates
+
+KEY = "codigo_proforma"
+SEVERITIES = ("fail", "warn", "off")
+# regla -> (severidad por defecto, qué detecta); se cambian con --validate-rule regla=fail|warn|off
+RULES = {
+    "ventas_codigo_nulo": ("fail", "ventas sin codigo_proforma"),
+    "ventas_codigo_duplicado": ("fail", "codigo_proforma repetido en ventas: multiplica los pagos en el join"),
+    "pagos_codigo_nulo": ("fail", "pagos sin codigo_proforma"),
+    "pagos_huerfanos": ("warn", "pagos cuyo codigo_proforma no está en ventas (no entran al reporte)"),
+    "monto_no_numerico": ("fail", "monto_pagado que no se puede leer como número"),
+    "monto_nulo": ("warn", "monto_pagado nulo tras el tipado (vacío o no numérico)"),
+    "monto_negativo": ("warn", "monto_pagado < 0"),
+    "fecha_pago_invalida": ("warn", "fecha_pago que no se puede leer como fecha"),
+    "fecha_pago_futura": ("warn", "fecha_pago posterior a hoy"),
+}
+# reglas fila a fila sobre pagos: con `sample` se evalúan sobre una muestra y se extrapolan
+SAMPLED = {"pagos_codigo_nulo", "pagos_huerfanos", "monto_nulo", "monto_negativo", "fecha_pago_invalida", "fecha_pago_futura"}
+SAMPLE_KEYS = 10
+
+def parse_rules(specs: list[str] | None) -> dict[str, str]:
+    """["monto_negativo=fail", ...] -> {regla: severidad} (el resto con su default)."""
+    out = {name: sev for name, (sev, _) in RULES.items()}
+    for spec in specs or []:
+        name, sep, sev = spec.partition("=")
+        name, sev = name.strip(), sev.strip().lower()
+        if not sep or name not in RULES or sev not in SEVERITIES:
+            raise ValueError(f"Regla inválida: {spec!r} (usa <regla>=<{'|'.join(SEVERITIES)}>; reglas: {', '.join(RULES)})")
+        out[name] = sev
+    return out
+
+def coercion_failures(raw: pd.DataFrame, typed: pd.DataFrame, cols: list[str], key: str = KEY) -> dict:
+    """Valores no vacíos en `raw` que quedaron nulos al tiparlos (ej. montos con texto); por columna."""
+    out = {}
+    for c in cols:
+        if c not in raw.columns or c not in typed.columns:
+            continue
+        bad = raw[c].notna().to_numpy() & typed[c].isna().to_numpy()
+        if bad.any() and not pd.api.types.is_numeric_dtype(raw[c]):
+            # "" y espacios son vacíos, no texto inválido (solo se miran los candidatos)
+            pos = np.flatnonzero(bad)
+            bad[pos] = raw[c].iloc[pos].astype(str).str.strip().ne("").to_numpy()
+        out[c] = {"rows": int(bad.sum()), "sample": _keys(raw, bad, key)}
+    return out
+
+def _keys(df: pd.DataFrame, mask: np.ndarray, key: str = KEY) -> list:
+    if key not in df.columns or not mask.any():
+        return []
+    pos = np.flatnonzero(mask)[:SAMPLE_KEYS * 10]
+    keys = dict.fromkeys(None if pd.isna(v) else str(v) for v in df[key].to_numpy(dtype=object)[pos])
+    return list(keys)[:SAMPLE_KEYS]
+
+def _row_checks(pagos: pd.DataFrame, ventas_keys: pd.Index, hoy: np.datetime64) -> dict[str, np.ndarray]:
+    # reglas fila a fila sobre pagos como máscaras booleanas
+    masks = {}
+    if KEY in pagos.columns:
+        # una sola pasada de hash sobre la clave: nulos y huérfanos salen de los que no están en ventas
+        fuera = ~pagos[KEY].isin(ventas_keys).to_numpy()
+        pos = np.flatnonzero(fuera)
+        nulo = np.zeros(len(pagos), dtype=bool)
+        nulo[pos] = pagos[KEY].iloc[pos].isna().to_numpy()
+        masks["pagos_codigo_nulo"] = nulo
+        masks["pagos_huerfanos"] = fuera & ~nulo
+    if "monto_pagado" in pagos.columns:
+        monto = as_cents(pagos["monto_pagado"])
+        masks["monto_nulo"] = monto.isna().to_numpy()
+        masks["monto_negativo"] = (monto < 0).fillna(False).to_numpy(dtype=bool)
+    if "fecha_pago" in pagos.columns:
+        d, invalid = parse_dates(pagos["fecha_pago"])
+        masks["fecha_pago_invalida"] = invalid
+        masks["fecha_pago_futura"] = ~np.isnat(d) & (d > hoy)
+    return masks
+
+def validate_frames(ventas: pd.DataFrame, pagos: pd.DataFrame, rules: dict[str, str] | None = None,
+                    sample: int | None = None, hoy=None, coerced: dict | None = None, seed: int = 0) -> dict:
+    """Corre las reglas de RULES sobre ventas/pagos; devuelve {regla: resultado} con filas, % y claves de ejemplo.
+
+    Todo son expresiones por columna (máscaras, isin, duplicated). Con `sample`, las reglas fila a fila sobre
+    pagos (SAMPLED) usan una muestra de ese tamaño y extrapolan `rows`. `coerced` = salida de
+    coercion_failures del extract (montos con texto que el tipado ya convirtió en nulos).
+    """
+    rules = rules or parse_rules(None)
+    hoy = np.datetime64(pd.Timestamp(hoy if hoy is not None else pd.Timestamp.today()).date(), "D")
+    n_ventas, n_pagos = len(ventas), len(pagos)
+    results: dict[str, dict] = {}
+
+    def put(name: str, mask: np.ndarray | None, total: int, frame: pd.DataFrame, scale: float = 1.0, **extra):
+        sev = rules.get(name, RULES[name][0])
+        if sev == "off" or mask is None:
+            results[name] = {"severity": sev, "status": "off" if sev == "off" else "skipped", "rows": 0}
+            return
+        rows = int(mask.sum())
+        est = int(round(rows * scale))
+        results[name] = {"severity": sev, "status": sev if rows else "ok", "rows": est,
+                         "pct": round(100 * est / total, 4) if total else 0.0, "sample_keys": _keys(frame, mask),
+                         **({"sampled": True, "rows_in_sample": rows} if scale != 1.0 else {}), **extra}
+
+    # ventas: claves nulas y duplicadas (exacto: ventas es chico frente a pagos)
+    vkey = ventas[KEY] if KEY in ventas.columns else pd.Series(pd.NA, index=ventas.index, dtype=object)
+    # un factorize da nulos (-1), duplicados (código repetido) y el set de claves para los huérfanos
+    codes, claves = pd.factorize(vkey)
+    put("ventas_codigo_nulo", codes < 0, n_ventas, ventas)
+    dup = (codes >= 0) & (np.bincount(codes[codes >= 0], minlength=len(claves))[np.maximum(codes, 0)] > 1)
+    extra = {}
+    if dup.any():
+        # cuánto se multiplicaría en el join: filas de ventas de más × pagado de esa proforma
+        veces = vkey[dup].value_counts()
+        extra["proformas"] = int(len(veces))
+        extra["filas_extra"] = int((veces - 1).sum())
+        if {KEY, "monto_pagado"}.issubset(pagos.columns):
+            en_dup = pagos[KEY].isin(veces.index)
+            pagado = as_cents(pagos.loc[en_dup, "monto_pagado"]).groupby(pagos.loc[en_dup, KEY], observed=True).sum()
+            extra["monto_multiplicado"] = int((pagado * (veces.reindex(pagado.index) - 1)).sum()) / CENTS
+    put("ventas_codigo_duplicado", dup, n_ventas, ventas, **extra)
+
+    c = (coerced or {}).get("monto_pagado")
+    sev = rules.get("monto_no_numerico", RULES["monto_no_numerico"][0])
+    if c is not None and sev != "off":
+        results["monto_no_numerico"] = {"severity": sev, "status": sev if c["rows"] else "ok", "rows": c["rows"],
+                                        "pct": round(100 * c["rows"] / n_pagos, 4) if n_pagos else 0.0,
+                                        "sample_keys": c["sample"]}
+    else:
+        # sin datos del extract: si el monto sigue crudo se detecta acá
+        raw = pagos["monto_pagado"] if "monto_pagado" in pagos.columns else None
+        bad = None
+        if raw is not None and not pd.api.types.is_numeric_dtype(raw):
+            bad = (raw.notna() & pd.to_numeric(raw, errors="coerce").isna()
+                   & raw.astype(str).str.strip().ne("")).to_numpy()
+        put("monto_no_numerico", bad if raw is not None else None, n_pagos, pagos)
+
+    # reglas fila a fila sobre pagos (muestreables)
+    rows = pagos
+    scale = 1.0
+    if sample and n_pagos > sample:
+        pos = np.sort(np.random.default_rng(seed).choice(n_pagos, size=sample, replace=False))
+        rows = pagos[[c for c in (KEY, "monto_pagado", "fecha_pago") if c in pagos.columns]].iloc[pos]
+        scale = n_pagos / sample
+    active = [r for r in SAMPLED if rules.get(r, RULES[r][0]) != "off"]
+    masks = _row_checks(rows, pd.Index(claves), hoy) if active else {}
+    for name in sorted(SAMPLED, key=list(RULES).index):
+        put(name, masks.get(name), n_pagos, rows, scale)
+    return {name: results[name] for name in RULES if name in results}
+
+def failures(results: dict) -> list[str]:
+    return [name for name, r in results.items() if r["status"] == "fail"]
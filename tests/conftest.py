@@ -0,0 +1,37 @@
+import sys
+from pathlib import Path
+
+# los tests importan `src.*` desde la raíz del repo (igual que `python -m src.pipeline`)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import json
+
+import pandas as pd
+import pytest
+
+@pytest.fixture
+def run_pipeline(tmp_path, monkeypatch):
+    """`run(ventas, pagos, *flags)` corre `python -m src.cobranzas run` con un lector falso de ventas
+    (sin warehouse) y devuelve los estados de stage_dag.json; la salida queda en tmp_path / "out"."""
+    from src import pipeline
+
+    extract = pipeline.extract_minutas
+    monkeypatch.delenv("REDSHIFT_CACHE_DIR", raising=False)
+
+    def run(ventas: pd.DataFrame, pagos: pd.DataFrame, *flags: str) -> dict:
+        excel = tmp_path / "pagos.xlsx"
+        if not excel.exists():
+            pagos.to_excel(excel, sheet_name="pagos", index=False)
+        def fake_extract(sql, out, read=None, **kw):
+            # por proyecto (--by-project) el lector devuelve solo las ventas de ese proyecto
+            p = kw.get("proyecto")
+            return extract(sql, out, read=lambda q: (ventas if p is None else ventas[ventas["proyecto"] == p]).copy(),
+                           **kw)
+
+        monkeypatch.setattr(pipeline, "extract_minutas", fake_extract)
+        pipeline.main(["--excel", str(excel), "--out", str(tmp_path / "out"), "--excel-workers", "1",
+                       "--render-workers", "1", "--cashflow-scenarios", "50", *flags])
+        stages = json.loads((tmp_path / "out" / "stage_dag.json").read_text(encoding="utf-8"))["stages"]
+        return {name: s["status"] for name, s in stages.items()}
+
+    return run
@@ -0,0 +1,106 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.cobranzas.aging import TRAMO_COLUMNS, aging_summary, allocate_fifo
+
+HOY = date(2025, 12, 31)
+
+def _cuotas(rows: list[tuple]) -> pd.DataFrame:
+    # (cliente, unidad, monto_programado en soles, fecha_vcto)
+    return pd.DataFrame(rows, columns=["cliente", "unidad", "monto_programado", "fecha_vcto"])
+
+def _pagos(rows: list[tuple]) -> pd.DataFrame:
+    return pd.DataFrame(rows, columns=["cliente", "unidad", "monto", "fecha_pago"])
+
+def test_fifo_by_due_date():
+    # cronograma desordenado: se paga primero lo que vence primero
+    cuotas = _cuotas([("Ana", "101", 100.0, "2025-10-15"), ("Ana", "101", 100.0, "2025-08-15"),
+                      ("Ana", "101", 100.0, "2025-09-15"), ("Luis", "202", 50.0, None)])
+    pagos = _pagos([("Ana", "101", 100.0, "2025-10-05"), ("Ana", "101", 150.0, "2025-08-10")])
+    out = allocate_fifo(cuotas, pagos, hoy=HOY)
+    ana = out[out["cliente"] == "Ana"]
+    assert ana["fecha_vcto"].tolist() == ["2025-08-15", "2025-09-15", "2025-10-15"]
+    assert ana["pagado_cuota"].tolist() == [10_000, 10_000, 5_000]
+    assert ana["saldo_cuota"].tolist() == [0, 0, 5_000]
+    # la segunda cuota se completa con el pago de octubre (acumulado 150 -> 250)
+    assert ana["fecha_cancelacion"].dt.strftime("%Y-%m-%d").fillna("").tolist() == ["2025-08-10", "2025-10-05", ""]
+    assert ana["dias_vencido"].tolist() == [0, 0, (HOY - date(2025, 10, 15)).days]
+    assert ana["tramo"].astype(str).tolist() == ["cancelada", "cancelada", "61-90"]
+    # sin fecha de vencimiento y sin pagos: saldo por vencer
+    luis = out[out["cliente"] == "Luis"].iloc[0]
+    assert (luis["saldo_cuota"], luis["dias_vencido"], luis["tramo"]) == (5_000, 0, "por_vencer")
+
+def _fifo_loop(cuotas: pd.DataFrame, pagos: pd.DataFrame) -> pd.DataFrame:
+    # oráculo: cuota por cuota y pago por pago, por clave
+    rows = []
+    for (cliente, unidad), cs in cuotas.groupby(["cliente", "unidad"], sort=False):
+        ps = pagos[(pagos["cliente"] == cliente) & (pagos["unidad"] == unidad)].sort_values("fecha_pago", kind="stable")
+        montos = [round(m * 100) for m in ps["monto"]]
+        restante, acumulado_c = sum(montos), 0
+        for _, c in cs.sort_values("fecha_vcto", kind="stable").iterrows():
+            monto = round(c["monto_programado"] * 100)
+            asignado = min(max(restante, 0), monto)
+            restante -= asignado
+            acumulado_c += monto
+            cancel, acumulado_p = None, 0
+            if asignado == monto and monto > 0:
+                for m, f in zip(montos, ps["fecha_pago"]):
+                    acumulado_p += m
+                    if acumulado_p >= acumulado_c:
+                        cancel = f
+                        break
+            rows.append((cliente, unidad, c["fecha_vcto"], asignado, monto - asignado, cancel))
+    return pd.DataFrame(rows, columns=["cliente", "unidad", "fecha_vcto", "pagado_cuota", "saldo_cuota",
+                                       "fecha_cancelacion"])
+
+def _random(seed: int) -> tuple[pd.DataFrame, pd.DataFrame]:
+    rng = np.random.default_rng(seed)
+    keys = [(f"C{i}", str(100 + i)) for i in range(int(rng.integers(1, 15)))]
+    cuotas, pagos = [], []
+    for cliente, unidad in keys:
+        base = date(2025, 1, 1) + timedelta(days=int(rng.integers(0, 60)))
+        for j in range(int(rng.integers(1, 8))):
+            vcto = (base + timedelta(days=30 * j)).isoformat()
+            cuotas.append((cliente, unidad, float(rng.choice([0, 99.99, 500, 1234.56])), vcto))
+        for j in range(int(rng.integers(0, 6))):
+            fecha = (base + timedelta(days=int(rng.integers(0, 300)))).isoformat()
+            pagos.append((cliente, unidad, float(rng.choice([-50, 100, 250.5, 999.99, 5000])), fecha))
+    # pagos de una clave sin cronograma: no afectan a nadie
+    pagos.append(("Sin", "000", 700.0, "2025-03-01"))
+    return _cuotas(cuotas), _pagos(pagos)
+
+@pytest.mark.parametrize("seed", range(20))
+def test_fifo_matches_loop(seed):
+    cuotas, pagos = _random(seed)
+    out = allocate_fifo(cuotas, pagos, hoy=HOY)
+    got = pd.DataFrame({
+        "cliente": out["cliente"], "unidad": out["unidad"], "fecha_vcto": out["fecha_vcto"],
+        "pagado_cuota": out["pagado_cuota"].astype("int64"), "saldo_cuota": out["saldo_cuota"].astype("int64"),
+        "fecha_cancelacion": out["fecha_cancelacion"].dt.strftime("%Y-%m-%d").astype(object).where(
+            out["fecha_cancelacion"].notna(), None),
+    })
+    key = ["cliente", "unidad", "fecha_vcto"]
+    pd.testing.assert_frame_equal(got.sort_values(key, kind="stable").reset_index(drop=True),
+                                  _fifo_loop(cuotas, pagos).sort_values(key, kind="stable").reset_index(drop=True))
+
+@pytest.mark.parametrize("seed", range(10))
+def test_summary_adds_up(seed):
+    cuotas, pagos = _random(seed)
+    alloc = allocate_fifo(cuotas, pagos, hoy=HOY)
+    summary = aging_summary(alloc, pagos).set_index(["cliente", "unidad"])
+    by_key = alloc.groupby(["cliente", "unidad"], sort=False)
+    pd.testing.assert_series_equal(summary["saldo_cuotas"], by_key["saldo_cuota"].sum().astype("Int64"),
+                                   check_names=False, check_index=False)
+    # el saldo se reparte entero en los tramos (una cuota cancelada no tiene saldo)
+    tramos = summary[list(TRAMO_COLUMNS.values())].sum(axis=1)
+    assert (tramos == summary["saldo_cuotas"]).all()
+    assert (summary["saldo_vencido"] == summary["saldo_cuotas"] - summary["por_vencer"]).all()
+    assert (summary["total_asignado"] + summary["saldo_cuotas"] == summary["total_programado"]).all()
+    # excedente: lo pagado por encima de lo asignado a cuotas
+    pagado = pagos.assign(c=(pagos["monto"] * 100).round()).groupby(["cliente", "unidad"])["c"].sum()
+    expected = (pagado.reindex(summary.index).fillna(0) - summary["total_asignado"].astype(float)).clip(lower=0)
+    assert (summary["excedente"].astype(float) == expected).all()
+    assert (summary["dias_mora"] == by_key["dias_vencido"].max().reindex(summary.index)).all()
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.allocation import POLICIES, allocate_proforma_payments
+from src.pipeline import transform_cobranzas
+from src.stages import read_table
+from src.synth import make_dataset
+
+TIPOS = ["departamento", "estacionamiento", "deposito"]
+
+def _items(rows: list[tuple]) -> pd.DataFrame:
+    # (codigo_proforma, tipo_item, precio_item, pagado_directo) en céntimos
+    return pd.DataFrame(rows, columns=["codigo_proforma", "tipo_item", "precio_item", "pagado_directo"])
+
+def _random(seed: int) -> tuple[pd.DataFrame, pd.Series]:
+    rng = np.random.default_rng(seed)
+    n_pf = int(rng.integers(1, 40))
+    per = rng.integers(1, 4, n_pf)
+    pf = np.repeat([f"P-{i:03d}" for i in range(n_pf)], per)
+    n = len(pf)
+    precio = rng.choice([0, 1, 3, 999, 1_000_001, 35_000_000], n)
+    directo = np.where(rng.random(n) < 0.3, (precio * rng.uniform(0, 1.3, n)).astype(np.int64), 0)
+    items = pd.DataFrame({"codigo_proforma": pf, "tipo_item": rng.choice(TIPOS, n),
+                          "precio_item": precio, "pagado_directo": directo}).sample(frac=1, random_state=seed)
+    pagado = pd.Series(rng.choice([-500, 0, 1, 7, 12_345, 40_000_000, 10**9], n_pf),
+                       index=[f"P-{i:03d}" for i in range(n_pf)])
+    return items.reset_index(drop=True), pagado
+
+@pytest.mark.parametrize("policy", POLICIES)
+@pytest.mark.parametrize("seed", range(25))
+def test_allocation_is_exact_and_bounded(policy, seed):
+    items, pagado = _random(seed)
+    out = allocate_proforma_payments(items, pagado, policy, priority=["deposito", "departamento"])
+    saldo = (items["precio_item"] - items["pagado_directo"]).clip(lower=0).to_numpy()
+    assert out.dtype == np.int64
+    assert (out >= 0).all() and (out <= saldo).all()
+    # por proforma: se asigna exacto lo pagado, hasta el saldo total de sus items
+    got = pd.Series(out).groupby(items["codigo_proforma"]).sum()
+    cap = pd.Series(saldo).groupby(items["codigo_proforma"]).sum()
+    expected = np.minimum(pagado.clip(lower=0).reindex(got.index).fillna(0), cap).astype(np.int64)
+    pd.testing.assert_series_equal(got, expected, check_names=False)
+
+def test_prorrata_follows_precio_item():
+    items = _items([("P-1", "departamento", 30_000_000, 0), ("P-1", "estacionamiento", 2_000_000, 0),
+                    ("P-1", "deposito", 1_000_001, 0)])
+    out = allocate_proforma_payments(items, pd.Series({"P-1": 10_000_000}), "prorrata")
+    assert out.sum() == 10_000_000
+    ideal = 10_000_000 * items["precio_item"].to_numpy() / items["precio_item"].sum()
+    # floor de los acumulados: cada item a menos de un céntimo de su parte exacta
+    assert np.all(np.abs(out - ideal) < 1)
+
+def test_prorrata_caps_at_saldo_and_redistributes():
+    # el depa ya está casi pagado con pagos propios: su parte por precio no entra y pasa a los otros
+    items = _items([("P-1", "departamento", 9_000, 8_900), ("P-1", "estacionamiento", 1_000, 0),
+                    ("P-1", "deposito", 1_000, 0)])
+    # por precio: 900 / 100 / 100 -> el depa solo admite 100, los 800 restantes van en orden a los libres
+    out = allocate_proforma_payments(items, pd.Series({"P-1": 1_100}), "prorrata")
+    assert out.tolist() == [100, 900, 100]
+    # 818 / 91 / 91 -> 718 recortados al depa
+    out = allocate_proforma_payments(items, pd.Series({"P-1": 1_000}), "prorrata")
+    assert out.tolist() == [100, 809, 91]
+
+@pytest.mark.parametrize("policy, priority, expected", [
+    ("departamento_primero", None, [6_500, 0, 0]),
+    # los tipos que no están en la prioridad van al final
+    ("prioridad", ["deposito", "estacionamiento"], [3_500, 2_000, 1_000]),
+])
+def test_cascade_order(policy, priority, expected):
+    items = _items([("P-1", "departamento", 10_000, 0), ("P-1", "estacionamiento", 2_000, 0),
+                    ("P-1", "deposito", 1_000, 0)])
+    out = allocate_proforma_payments(items, pd.Series({"P-1": 6_500}), policy, priority)
+    assert out.tolist() == expected
+
+def test_allocation_is_opt_in(tmp_path):
+    ventas, pagos = make_dataset(300, seed=4)
+    transform_cobranzas(ventas, pagos, tmp_path / "default")
+    items = read_table(tmp_path / "default" / "cobranzas_items_report.parquet")
+    assert not {"pagado_directo", "pagado_asignado"} & set(items.columns)
+
+    transform_cobranzas(ventas, pagos, tmp_path / "prorrata", allocation_policy="prorrata")
+    alloc = read_table(tmp_path / "prorrata" / "cobranzas_items_report.parquet")
+    assert (alloc["pagado_directo"] + alloc["pagado_asignado"] == alloc["total_pagado"]).all()
+    pd.testing.assert_series_equal(alloc["pagado_directo"], items["total_pagado"], check_names=False)
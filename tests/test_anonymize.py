@@ -0,0 +1,84 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import anonymize
+from src.anonymize import anon_client, anon_unit
+from src.pipeline import map_tipo_item, run
+
+SALT = "sal-de-prueba"
+
+def _cuentas(n: int = 400, seed: int = 0) -> pd.DataFrame:
+    # claves repetidas por cuota y documentos vacíos / nulos / numéricos (-> nombre completo o str(x))
+    rng = np.random.default_rng(seed)
+    pick = lambda vals: [vals[i] for i in rng.integers(0, len(vals), n)]
+    return pd.DataFrame({
+        "codigo_proforma": pick(["PF-001", "PF-002", "PF-003", 1004, "PF-005"]),
+        "nombres_cliente": pick(["Ana", "Luis", " María ", None]),
+        "apellidos_cliente": pick(["Pérez", "Quispe", None]),
+        "documento_cliente": pick(["12345678", " 87654321 ", "", "  ", None, 44556677]),
+        "tipo": pick(["departamento", "Estacionamiento", "depósito", "deposito", None]),
+        "estado": pick(["pendiente", "por_cobrar", "pagado"]),
+        "monto_programado": rng.uniform(100, 5000, n).round(2),
+        "fecha_vcto": pick(["2025-01-31", "2025-02-28", "2025-03-31"]),
+    })
+
+def _golden(csv_path) -> pd.DataFrame:
+    # el run fila a fila anterior al batch (df.apply con anon_client / anon_unit)
+    df = pd.read_csv(csv_path)
+    df = df[df["estado"].isin(["pendiente", "por_cobrar"])].copy()
+    df["cliente_anon"] = df.apply(
+        lambda r: anon_client(str(r.get("nombres_cliente", "")), str(r.get("apellidos_cliente", "")),
+                              None if pd.isna(r.get("documento_cliente")) else str(r.get("documento_cliente")),
+                              SALT),
+        axis=1,
+    )
+    df["unidad_anon"] = df["codigo_proforma"].astype(str).apply(lambda x: anon_unit(x, SALT))
+    df["tipo_item"] = df["tipo"].astype(str).apply(map_tipo_item)
+    return (df.groupby(["cliente_anon", "unidad_anon", "tipo_item"], as_index=False)
+              .agg(total_por_cobrar=("monto_programado", "sum"), fecha_vencimiento=("fecha_vcto", "max")))
+
+@pytest.fixture
+def cuentas_csv(tmp_path, monkeypatch):
+    monkeypatch.setenv("ANON_SALT", SALT)
+    path = tmp_path / "cuentas.csv"
+    _cuentas().to_csv(path, index=False)
+    return path
+
+def _report(out_dir) -> pd.DataFrame:
+    return pd.read_parquet(out_dir / "cuentas_por_cobrar_anon.parquet")
+
+def test_stable_hash_is_pinned():
+    # cambiar el hash invalida todos los ids anonimizados ya publicados
+    assert anonymize.stable_hash("12345678", SALT) == "2159aede144cbfce8421c40b"
+    assert anon_unit("PF-001", SALT) == "a6d897865ff80374b267dd8a"
+
+def test_run_matches_golden_frame(tmp_path, cuentas_csv):
+    run(cuentas_csv, tmp_path / "out")
+    golden = _golden(cuentas_csv)
+    pd.testing.assert_frame_equal(_report(tmp_path / "out"), golden)
+    csv = pd.read_csv(tmp_path / "out" / "cuentas_por_cobrar_anon.csv")
+    pd.testing.assert_frame_equal(csv, golden)
+
+def test_run_with_cache_matches_golden_frame(tmp_path, cuentas_csv):
+    cache = tmp_path / "anon_cache"
+    run(cuentas_csv, tmp_path / "first", anon_cache=cache)
+    run(cuentas_csv, tmp_path / "second", anon_cache=cache)
+    meta = json.loads((tmp_path / "second" / "run_meta.json").read_text(encoding="utf-8"))
+    assert meta["anon_cache"]["misses"] == 0 and meta["anon_cache"]["hits"] > 0
+    for out in ("first", "second"):
+        pd.testing.assert_frame_equal(_report(tmp_path / out), _golden(cuentas_csv))
+
+def test_run_process_pool_matches_golden_frame(tmp_path, cuentas_csv, monkeypatch):
+    monkeypatch.setattr(anonymize, "POOL_MIN_KEYS", 1)
+    run(cuentas_csv, tmp_path / "out", workers=2)
+    pd.testing.assert_frame_equal(_report(tmp_path / "out"), _golden(cuentas_csv))
+
+def test_run_without_name_columns(tmp_path, monkeypatch):
+    monkeypatch.setenv("ANON_SALT", SALT)
+    path = tmp_path / "cuentas.csv"
+    _cuentas(seed=1).drop(columns=["nombres_cliente", "apellidos_cliente"]).to_csv(path, index=False)
+    run(path, tmp_path / "out")
+    pd.testing.assert_frame_equal(_report(tmp_path / "out"), _golden(path))
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.bench import check_parity, check_regressions, run_bench
+from src.synth import PAGOS_COLUMNS, VENTAS_COLUMNS, make_cuotas, make_dataset, parse_rows
+
+@pytest.mark.parametrize("s, expected", [("1k", 1_000), ("100K", 100_000), ("2.5m", 2_500_000), (" 700 ", 700)])
+def test_parse_rows(s, expected):
+    assert parse_rows(s) == expected
+
+def test_make_dataset_is_deterministic_and_consistent():
+    ventas, pagos = make_dataset(7_000, seed=3)
+    again_v, again_p = make_dataset(7_000, seed=3)
+    pd.testing.assert_frame_equal(ventas, again_v)
+    pd.testing.assert_frame_equal(pagos, again_p)
+    assert not make_dataset(7_000, seed=4)[1].equals(pagos)
+
+    assert list(ventas.columns) == VENTAS_COLUMNS and list(pagos.columns) == PAGOS_COLUMNS
+    assert (len(ventas), len(pagos)) == (1_000, 7_000)
+    assert ventas["codigo_proforma"].is_unique
+    assert pagos["codigo_proforma"].isin(ventas["codigo_proforma"]).all()
+    partes = ventas[["precio_venta_depa_soles", "precio_estacionamiento_proforma", "precio_deposito_proforma"]]
+    np.testing.assert_allclose(partes.fillna(0).sum(axis=1), ventas["precio_total_venta"], atol=0.011)
+
+    # un pago a nivel item va a un item que la proforma tiene
+    items = pagos.dropna(subset=["tipo_item"]).merge(ventas, on="codigo_proforma", suffixes=("", "_v"))
+    esperado = np.select([items["tipo_item"] == "departamento", items["tipo_item"] == "estacionamiento"],
+                         [items["codigo_unidad_v"], items["codigo_estacionamiento_proforma"]],
+                         default=items["codigo_deposito_proforma"])
+    assert len(items) and (items["codigo_item"].to_numpy() == esperado).all()
+
+def test_cuotas_add_up_to_price():
+    ventas, _ = make_dataset(700, seed=1)
+    cuotas = make_cuotas(ventas, seed=1)
+    total = cuotas.groupby(["cliente", "unidad"])["monto_programado"].sum().mul(100).round()
+    precio = ventas.groupby(["cliente", "unidad"])["precio_total_venta"].sum().mul(100).round()
+    pd.testing.assert_series_equal(total, precio, check_names=False)
+
+def _r(stage, scale, wall):
+    return {"stage": stage, "scale": scale, "wall_s": wall}
+
+def test_check_regressions():
+    results = [_r("transform", 1_000, 0.1), _r("transform", 10_000, 1.0), _r("render", 1_000, 0.1),
+               _r("render", 10_000, 10.0), _r("validate", 1_000, 0.001), _r("validate", 10_000, 0.04)]
+    baseline = [_r("transform", 10_000, 0.5), _r("render", 10_000, 9.0), _r("validate", 10_000, 0.01)]
+    out = check_regressions(results, baseline, threshold=1.25, max_exponent=1.5, min_seconds=0.05)
+    # transform: 2× el baseline (lineal entre escalas); render: cuadrático; validate: ruido
+    assert [(r["kind"], r["stage"]) for r in out] == [("baseline", "transform"), ("scaling", "render")]
+    assert out[0]["ratio"] == 2.0 and out[1]["exponent"] == 2.0
+
+def test_parity_and_bench_cover_every_stage(tmp_path, monkeypatch):
+    assert check_parity([700], seed=2) == []
+    monkeypatch.chdir(tmp_path)
+    results = run_bench([700], seed=2, repeat=1, memory=False, engines=("pandas", "duckdb"))
+    stages = [r["stage"] for r in results]
+    assert len(stages) == len(set(stages))
+    assert {"transform_cobranzas", "transform_cobranzas_duckdb", "build_cube", "render_reports",
+            "snapshot_write", "aging_fifo", "cashflow_forecast", "risk_scores"} <= set(stages)
+    assert all(r["scale"] == 700 and r["ventas"] == 100 and r["wall_s"] >= 0 for r in results)
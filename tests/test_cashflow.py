@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.cashflow import BLOCK, estimate_timing, horizon_totals, simulate, summarize
+from src.pipeline import transform_cobranzas
+from src.synth import make_dataset
+
+HOY = "2025-12-31"
+
+@pytest.fixture(scope="module")
+def data(tmp_path_factory):
+    ventas, pagos = make_dataset(1400, seed=12)
+    report = transform_cobranzas(ventas, pagos, tmp_path_factory.mktemp("transform"))
+    return report, pagos
+
+@pytest.fixture(scope="module")
+def timing(data):
+    return estimate_timing(*data, hoy=HOY)
+
+def test_timing(data, timing):
+    report, pagos = data
+    assert len(timing) > 2 * BLOCK
+    assert (timing["deuda"] > 0).all() and timing["q_semanal"].between(0, 1, inclusive="neither").all()
+    assert (timing["monto_medio"] <= timing["deuda"]).all()
+    deuda = report.set_index("codigo_proforma")["deuda_pendiente"].astype(float) / 100
+    assert np.allclose(timing["deuda"], deuda.loc[timing["codigo_proforma"]])
+    # los pagos con fecha posterior a hoy no cuentan
+    futuro = pagos.head(50).assign(fecha_pago="2026-06-01")
+    pd.testing.assert_frame_equal(estimate_timing(report, pd.concat([pagos, futuro]), hoy=HOY), timing)
+
+def test_simulation_is_deterministic_and_chunk_independent(timing):
+    proyectos, acc, info = simulate(timing, scenarios=40, weeks=12, seed=3)
+    again = simulate(timing, scenarios=40, weeks=12, seed=3)[1]
+    np.testing.assert_array_equal(acc, again)
+    # chunks de BLOCK proformas: mismos streams aleatorios, mismos cobros
+    small, acc_small, info_small = simulate(timing, scenarios=40, weeks=12, seed=3, memory_mb=0.01)
+    assert info["chunks"] == 1 and info_small["chunks"] > 1 and info_small["chunk_rows"] == BLOCK
+    assert small == proyectos
+    np.testing.assert_allclose(acc_small, acc, rtol=1e-9)
+    assert not np.array_equal(simulate(timing, scenarios=40, weeks=12, seed=4)[1], acc)
+
+def test_collections_never_exceed_debt(timing):
+    proyectos, acc, _ = simulate(timing, scenarios=40, weeks=26, seed=0)
+    assert (acc >= 0).all()
+    deuda = timing.groupby("proyecto")["deuda"].sum().reindex(proyectos).to_numpy()
+    assert (acc.sum(axis=2) <= deuda[:, None] * (1 + 1e-5)).all()
+
+def test_certain_payer_collects_full_debt():
+    timing = pd.DataFrame({"codigo_proforma": ["P-1", "P-2"], "proyecto": ["Sialia", "Matera"],
+                           "deuda": [1000.0, 500.0], "q_semanal": [1.0, 1e-9], "monto_medio": [1000.0, 500.0]})
+    timing.attrs["sigma"] = 0.05
+    proyectos, acc, _ = simulate(timing, scenarios=200, weeks=8)
+    tot = horizon_totals(proyectos, acc)
+    # paga todas las semanas: llega a la deuda (cortada ahí); casi nunca paga: nada
+    assert tot["Sialia"]["p10"] == pytest.approx(1000.0, rel=1e-5)
+    assert tot["Matera"]["p90"] == 0.0
+    assert tot["TOTAL"]["esperado"] == pytest.approx(1000.0, rel=1e-5)
+
+def test_summary_percentiles_are_ordered(timing):
+    proyectos, acc, _ = simulate(timing, scenarios=60, weeks=10, seed=1)
+    summary = summarize(proyectos, acc, hoy=HOY)
+    assert len(summary) == (len(proyectos) + 1) * 10
+    assert (summary["cobro_p10"] <= summary["cobro_p50"]).all() and (summary["cobro_p50"] <= summary["cobro_p90"]).all()
+    assert summary["semana_inicio"].iloc[1] - summary["semana_inicio"].iloc[0] == pd.Timedelta(days=7)
+    # TOTAL = suma de proyectos escenario a escenario: el esperado cuadra (al redondeo por semana)
+    por_semana = summary.pivot(index="semana", columns="proyecto", values="cobro_esperado").astype("int64")
+    diff = por_semana["TOTAL"] - por_semana[proyectos].sum(axis=1)
+    assert (diff.abs() <= len(proyectos)).all()
+    tot = horizon_totals(proyectos, acc)
+    for name in [*proyectos, "TOTAL"]:
+        assert tot[name]["p10"] <= tot[name]["p50"] <= tot[name]["p90"]
+    assert tot["TOTAL"]["esperado"] == pytest.approx(sum(tot[p]["esperado"] for p in proyectos), abs=0.01 * len(proyectos))
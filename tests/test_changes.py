@@ -0,0 +1,52 @@
+import pandas as pd
+import pytest
+
+from src.changes import CHANGE_TYPES, detect_changes, summarize_changes
+
+def _report(rows: list[tuple]) -> pd.DataFrame:
+    # (codigo_proforma, proyecto, cliente, asesor, pagado, deuda, n_pagos, prioridad); montos en soles
+    df = pd.DataFrame(rows, columns=["codigo_proforma", "proyecto", "cliente", "asesor", "total_pagado",
+                                     "deuda_pendiente", "n_pagos", "prioridad"])
+    return df.assign(precio_total_venta=df["total_pagado"] + df["deuda_pendiente"])
+
+PREV = _report([
+    ("P-1", "Sialia", "Ana", "A1", 1000.0, 9000.0, 1, "media"),
+    ("P-2", "Matera", "Luis", "A2", 500.0, 500.0, 1, "baja"),
+    ("P-3", "Sialia", "Eva", "A1", 0.0, 30000.0, 0, "alta"),
+])
+TODAY = _report([
+    ("P-1", "Sialia", "Ana", "A1", 4000.0, 6000.0, 2, "media"),
+    ("P-2", "Matera", "Luis", "A2", 500.0, 500.0, 1, "baja"),
+    ("P-4", "Matera", "Rosa", "A2", 0.0, 25000.0, 0, "alta"),
+])
+
+def _by_key(changes: pd.DataFrame) -> dict:
+    return changes.set_index("codigo_proforma")["tipo_cambio"].to_dict()
+
+def test_classifies_each_change():
+    changes = detect_changes(TODAY, PREV)
+    assert _by_key(changes) == {"P-1": "nuevo_pago", "P-3": "proforma_desaparecida", "P-4": "nueva_venta"}
+    p1 = changes.set_index("codigo_proforma").loc["P-1"]
+    assert (p1["deuda_prev"], p1["deuda_hoy"], p1["delta_deuda"], p1["delta_pagado"]) == (900000, 600000, -300000, 300000)
+    assert p1["cambio_deuda"] and not p1["cambio_prioridad"]
+    # las desaparecidas toman las dimensiones del snapshot
+    assert changes.set_index("codigo_proforma").loc["P-3", "cliente"] == "Eva"
+    assert summarize_changes(changes)["n_nuevo_pago"] == 1
+
+@pytest.mark.parametrize("side", ["prev", "today"])
+def test_dimension_missing_in_one_snapshot(side):
+    # snapshot anterior a la columna asesor (o reporte de hoy sin ella)
+    today, prev = (TODAY, PREV.drop(columns=["asesor"])) if side == "prev" else (TODAY.drop(columns=["asesor"]), PREV)
+    changes = detect_changes(today, prev)
+    assert _by_key(changes) == {"P-1": "nuevo_pago", "P-3": "proforma_desaparecida", "P-4": "nueva_venta"}
+    asesor = changes.set_index("codigo_proforma")["asesor"]
+    if side == "prev":
+        assert asesor["P-4"] == "A2" and pd.isna(asesor["P-3"])
+    else:
+        assert asesor["P-3"] == "A1" and pd.isna(asesor["P-4"])
+    assert list(changes.columns[:4]) == ["codigo_proforma", "proyecto", "cliente", "asesor"]
+
+def test_dimension_missing_in_both_is_left_out():
+    changes = detect_changes(TODAY.drop(columns=["asesor"]), PREV.drop(columns=["asesor"]))
+    assert "asesor" not in changes.columns
+    assert set(CHANGE_TYPES) <= set(changes.columns)
@@ -0,0 +1,27 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+HEAVY = {"pandas", "numpy", "pyarrow"}
+
+def _cli(*args: str, importtime: bool = False) -> subprocess.CompletedProcess:
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [str(ROOT), os.environ.get("PYTHONPATH")]))}
+    flags = ["-X", "importtime"] if importtime else []
+    return subprocess.run([sys.executable, *flags, "-m", "src.cobranzas", *args], cwd=ROOT, env=env,
+                          capture_output=True, text=True, check=True)
+
+@pytest.mark.parametrize("args", [["--help"], ["status", "--out", "no-existe"]])
+def test_cli_does_not_import_heavy_modules(args):
+    trace = _cli(*args, importtime=True).stderr
+    # -X importtime: "import time: self | cumulative | modulo" por cada import
+    imported = {line.rsplit("|", 1)[-1].strip().split(".")[0] for line in trace.splitlines() if "|" in line}
+    assert not HEAVY & imported
+
+@pytest.mark.parametrize("command", ["run", "diff", "transform", "cuentas", "bench"])
+def test_subcommand_help_shows_its_name(command):
+    usage = _cli(command, "--help").stdout
+    assert usage.startswith(f"usage: python -m src.cobranzas {command} ")
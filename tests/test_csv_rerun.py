@@ -0,0 +1,26 @@
+import pandas as pd
+
+from src.stages import read_table
+from src.synth import make_dataset
+
+def test_csv_format_rerun_from_rollup(tmp_path, run_pipeline):
+    ventas, pagos = make_dataset(300, seed=3)
+    first = run_pipeline(ventas, pagos, "--format", "csv")
+    assert set(first.values()) == {"ran"}
+    cube = read_table(tmp_path / "out" / "cobranzas_cube.csv")
+    top = read_table(tmp_path / "out" / "cobranzas_cube_top.csv")
+
+    # transform se recarga del csv (soles) y rollup / summary / render lo reciben en céntimos
+    again = run_pipeline(ventas, pagos, "--format", "csv", "--from-stage", "rollup")
+    assert again["transform"] == "reused" and again["rollup"] == "ran"
+    pd.testing.assert_frame_equal(read_table(tmp_path / "out" / "cobranzas_cube.csv"), cube)
+    pd.testing.assert_frame_equal(read_table(tmp_path / "out" / "cobranzas_cube_top.csv"), top)
+
+def test_csv_format_rerun_transform_duckdb(tmp_path, run_pipeline):
+    ventas, pagos = make_dataset(300, seed=4)
+    run_pipeline(ventas, pagos, "--format", "csv")
+    report = read_table(tmp_path / "out" / "cobranzas_report.csv")
+    # extracts recargados del csv (soles) -> transform duckdb
+    again = run_pipeline(ventas, pagos, "--format", "csv", "--from-stage", "transform", "--engine", "duckdb")
+    assert again["extract_ventas"] == again["extract_pagos"] == "reused"
+    pd.testing.assert_frame_equal(read_table(tmp_path / "out" / "cobranzas_report.csv"), report)
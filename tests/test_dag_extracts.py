@@ -0,0 +1,74 @@
+import json
+import time
+
+import pandas as pd
+import pytest
+
+from src import pipeline
+from src.io_redshift import QueryCancelled
+from src.pipeline import extract_minutas
+
+VENTAS = pd.DataFrame({
+    "codigo_proforma": ["2025-0001", "2025-0002"],
+    "proyecto": ["Sialia", "Matera"],
+    "asesor": ["A1", "A2"],
+    "precio_total_venta": [350000.0, 420000.0],
+    "fecha_minuta": ["2025-06-01", "2025-07-15"],
+})
+
+@pytest.fixture
+def slow_extract(monkeypatch):
+    """Reemplaza el extract de ventas por uno con lector falso que tarda `sleep` s (interrumpible por el token)."""
+    calls = {"sleep": 1.0, "tokens": []}
+
+    def read(cancel):
+        def _read(query):
+            # como psycopg2 tras conn.cancel(): la query en curso corta con error
+            if cancel.wait(calls["sleep"]):
+                raise QueryCancelled("Extracción cancelada.")
+            return VENTAS.copy()
+        return _read
+
+    def fake(sql_path, out_dir, **kw):
+        calls["tokens"].append(kw["cancel"])
+        return extract_minutas(sql_path, out_dir, read=read(kw["cancel"]), **kw)
+
+    monkeypatch.delenv("REDSHIFT_CACHE_DIR", raising=False)
+    monkeypatch.setattr(pipeline, "extract_minutas", fake)
+    return calls
+
+def _pagos_xlsx(path, **drop):
+    pagos = pd.DataFrame({"codigo_proforma": ["2025-0001", "2025-0001", "2025-0002"],
+                          "monto_pagado": [1000.0, 2500.5, 700.0],
+                          "fecha_pago": ["2025-06-10", "2025-07-10", "2025-08-01"]})
+    pagos.drop(columns=[c for c, v in drop.items() if v]).to_excel(path, sheet_name="pagos", index=False)
+    return path
+
+def _run(tmp_path, excel):
+    return pipeline.main(["--excel", str(excel), "--out", str(tmp_path / "out"), "--excel-workers", "1",
+                          "--only", "extract_ventas", "extract_pagos"])
+
+def _dag(tmp_path) -> dict:
+    return json.loads((tmp_path / "out" / "stage_dag.json").read_text(encoding="utf-8"))["stages"]
+
+def test_extracts_overlap(tmp_path, slow_extract):
+    assert _run(tmp_path, _pagos_xlsx(tmp_path / "pagos.xlsx")) == 0
+    st = _dag(tmp_path)
+    ventas, pagos = st["extract_ventas"], st["extract_pagos"]
+    assert ventas["status"] == pagos["status"] == "ran"
+    assert ventas["seconds"] >= slow_extract["sleep"]
+    # intervalos [start, start + seconds] de los dos extracts se solapan
+    assert ventas["start_s"] < pagos["start_s"] + pagos["seconds"]
+    assert pagos["start_s"] < ventas["start_s"] + ventas["seconds"]
+
+def test_bad_pagos_cancels_extract(tmp_path, slow_extract):
+    slow_extract["sleep"] = 10.0
+    excel = _pagos_xlsx(tmp_path / "pagos.xlsx", monto_pagado=True)
+    t0 = time.perf_counter()
+    with pytest.raises(ValueError, match="columnas requeridas"):
+        _run(tmp_path, excel)
+    assert time.perf_counter() - t0 < slow_extract["sleep"] / 2
+    assert [t.cancelled for t in slow_extract["tokens"]] == [True]
+    st = _dag(tmp_path)
+    assert st["extract_pagos"]["status"] == "failed"
+    assert st["extract_ventas"]["status"] == "cancelled"
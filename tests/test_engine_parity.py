@@ -0,0 +1,50 @@
+import pandas as pd
+import pytest
+
+pytest.importorskip("duckdb")
+
+from src import engine_duckdb
+from src.cobranzas.schema import apply_schema
+from src.cobranzas.transform import compute_cobranzas
+from src.pipeline import ALLOCATIONS, _transform_pandas, transform_cobranzas
+from src.stages import read_table
+from src.synth import make_dataset
+
+def _xcobrar(ventas: pd.DataFrame, pagos: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    # entradas de compute_cobranzas desde el dataset sintético (como bench._xcobrar)
+    keys = ventas[["codigo_proforma", "cliente", "unidad"]]
+    xcobrar = ventas[["cliente", "unidad", "precio_total_venta"]].rename(columns={"precio_total_venta": "total_por_cobrar"})
+    p = pagos.merge(keys, on="codigo_proforma", how="left").rename(columns={"monto_pagado": "monto"})
+    return xcobrar, p[["cliente", "unidad", "monto", "fecha_pago"]]
+
+@pytest.mark.parametrize("rows, seed", [(1, 0), (300, 0), (300, 1), (2000, 7)])
+def test_transform_frames_match_pandas(rows, seed):
+    ventas, pagos = make_dataset(rows, seed)
+    v, p = apply_schema(ventas), apply_schema(pagos)
+    (df_a, items_a), (df_b, items_b) = _transform_pandas(v, p), engine_duckdb.transform_frames(v, p)
+    pd.testing.assert_frame_equal(df_a, df_b)
+    assert (items_a is None) == (items_b is None)
+    if items_a is not None:
+        pd.testing.assert_frame_equal(items_a, items_b)
+
+def test_transform_frames_without_item_payments():
+    ventas, pagos = make_dataset(300, seed=2)
+    v, p = apply_schema(ventas), apply_schema(pagos.drop(columns=["tipo_item", "codigo_item"]))
+    (df_a, items_a), (df_b, items_b) = _transform_pandas(v, p), engine_duckdb.transform_frames(v, p)
+    pd.testing.assert_frame_equal(df_a, df_b)
+    assert items_a is None and items_b is None
+
+@pytest.mark.parametrize("seed", [0, 5])
+def test_compute_cobranzas_matches_pandas(seed):
+    xcobrar, xpagos = _xcobrar(*make_dataset(500, seed))
+    pd.testing.assert_frame_equal(compute_cobranzas(xcobrar, xpagos),
+                                  compute_cobranzas(xcobrar, xpagos, engine="duckdb"))
+
+@pytest.mark.parametrize("policy", ALLOCATIONS)
+def test_transform_artifacts_match_across_engines(tmp_path, policy):
+    ventas, pagos = make_dataset(400, seed=11)
+    for engine in ("pandas", "duckdb"):
+        transform_cobranzas(ventas, pagos, tmp_path / engine, engine=engine, allocation_policy=policy)
+    for name in ("cobranzas_report", "cobranzas_items_report"):
+        pd.testing.assert_frame_equal(read_table(tmp_path / "pandas" / f"{name}.parquet"),
+                                      read_table(tmp_path / "duckdb" / f"{name}.parquet"))
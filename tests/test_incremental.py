@@ -0,0 +1,87 @@
+import json
+import re
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from src import incremental
+from src.incremental import load_watermark, sync_base
+
+QUERY = "select * from minutas fb where fb.fecha_minuta >= DATE '2022-01-01'"
+TODAY = date(2025, 8, 1)
+
+class Warehouse:
+    """Lector falso: aplica la cota inferior de la SQL sobre `rows`."""
+
+    def __init__(self, rows: pd.DataFrame):
+        self.rows = rows
+        self.queries = []
+
+    def __call__(self, query: str) -> pd.DataFrame:
+        self.queries.append(query)
+        since = re.search(r"DATE '(\d{4}-\d{2}-\d{2})'", query).group(1)
+        return self.rows[self.rows["fecha_minuta"] >= since].reset_index(drop=True)
+
+def _ventas(n: int, start: str = "2025-01-01") -> pd.DataFrame:
+    return pd.DataFrame({"codigo_proforma": [f"P-{i:03d}" for i in range(n)],
+                         "fecha_minuta": pd.date_range(start, periods=n, freq="7D").strftime("%Y-%m-%d"),
+                         "precio_total_venta": [100000.0 + i for i in range(n)]})
+
+def _leftovers(cache_dir) -> list[str]:
+    return sorted(p.name for p in cache_dir.iterdir() if p.name.endswith(".tmp"))
+
+def test_incremental_upserts_delta(tmp_path):
+    wh = Warehouse(_ventas(20))
+    base, m = sync_base(QUERY, tmp_path, wh, today=TODAY)
+    assert m["mode"] == "full_refresh" and len(base) == 20
+    # una venta nueva y una cambiada dentro de la ventana del watermark
+    rows = wh.rows.copy()
+    rows.loc[19, "precio_total_venta"] = 1.0
+    wh.rows = pd.concat([rows, _ventas(1, "2025-05-25").assign(codigo_proforma="P-NEW")], ignore_index=True)
+    base, m = sync_base(QUERY, tmp_path, wh, today=TODAY)
+    assert (m["mode"], m["rows_new"], m["rows_changed"], m["base_rows"]) == ("incremental", 1, 1, 21)
+    assert "DATE '2022-01-01'" not in wh.queries[-1]
+    assert base.set_index("codigo_proforma").loc["P-019", "precio_total_venta"] == 1.0
+    assert load_watermark(tmp_path)["rows"] == 21
+    assert _leftovers(tmp_path) == []
+
+def test_failed_write_keeps_previous_files(tmp_path, monkeypatch):
+    wh = Warehouse(_ventas(20))
+    sync_base(QUERY, tmp_path, wh, today=TODAY)
+    before = {p.name: p.read_bytes() for p in tmp_path.iterdir()}
+    wh.rows = pd.concat([wh.rows, _ventas(1, "2025-05-25").assign(codigo_proforma="P-NEW")], ignore_index=True)
+
+    def broken(self, path, **kw):
+        # escritura cortada a la mitad
+        path.write_bytes(b"PAR1")
+        raise OSError("disco lleno")
+
+    monkeypatch.setattr(pd.DataFrame, "to_parquet", broken)
+    with pytest.raises(OSError, match="disco lleno"):
+        sync_base(QUERY, tmp_path, wh, today=TODAY)
+    assert {p.name: p.read_bytes() for p in tmp_path.iterdir()} == before
+
+def test_watermark_written_last(tmp_path, monkeypatch):
+    wh = Warehouse(_ventas(20))
+    sync_base(QUERY, tmp_path, wh, today=TODAY)
+    state = json.loads((tmp_path / "ventas_watermark.json").read_text(encoding="utf-8"))
+    wh.rows = pd.concat([wh.rows, _ventas(1, "2025-05-25").assign(codigo_proforma="P-NEW")], ignore_index=True)
+    replace = incremental.os.replace
+
+    def cut_after_base(src, dst):
+        # el proceso muere después de reemplazar la base y antes de hashes / watermark
+        replace(src, dst)
+        if str(dst).endswith("ventas_base.parquet"):
+            raise KeyboardInterrupt
+
+    monkeypatch.setattr(incremental.os, "replace", cut_after_base)
+    with pytest.raises(KeyboardInterrupt):
+        sync_base(QUERY, tmp_path, wh, today=TODAY)
+    monkeypatch.setattr(incremental.os, "replace", replace)
+    assert json.loads((tmp_path / "ventas_watermark.json").read_text(encoding="utf-8")) == state
+    assert _leftovers(tmp_path) == []
+    # la base ya no es la del watermark: el próximo run no confía en el cache y rehace todo
+    assert load_watermark(tmp_path) is None
+    base, m = sync_base(QUERY, tmp_path, wh, today=TODAY)
+    assert m["mode"] == "full_refresh" and len(base) == 21
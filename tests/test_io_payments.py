@@ -0,0 +1,64 @@
+import os
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from src.cobranzas import io_payments
+from src.cobranzas.io_payments import file_digests, load_pagos
+
+def _xlsx(path, montos):
+    pd.DataFrame({"codigo_proforma": ["P-1"] * len(montos), "monto_pagado": montos}).to_excel(
+        path, sheet_name="pagos", index=False)
+    return path
+
+@pytest.fixture
+def pagos_dir(tmp_path):
+    d = tmp_path / "pagos"
+    d.mkdir()
+    _xlsx(d / "2025-11.xlsx", [100.0, 200.0])
+    _xlsx(d / "2025-12.xlsx", [300.0])
+    return d
+
+def test_file_digests_reuse_manifest_hashes(tmp_path, pagos_dir, monkeypatch):
+    cache = tmp_path / "cache"
+    files = io_payments.list_payment_files(pagos_dir)
+    expected = [[f.name, io_payments._sha256(f)] for f in files]
+    load_pagos(pagos_dir, cache, workers=1)
+
+    def no_hash(path):
+        raise AssertionError(f"releyó {path.name}")
+    monkeypatch.setattr(io_payments, "_sha256", no_hash)
+    assert file_digests(files, cache) == expected
+
+def test_file_digests_rehash_changed_file(tmp_path, pagos_dir, monkeypatch):
+    cache = tmp_path / "cache"
+    load_pagos(pagos_dir, cache, workers=1)
+    changed = _xlsx(pagos_dir / "2025-12.xlsx", [300.0, 50.0])
+    st = changed.stat()
+    os.utime(changed, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+    hashed = []
+    real = io_payments._sha256
+    monkeypatch.setattr(io_payments, "_sha256", lambda p: hashed.append(p.name) or real(p))
+    digests = dict(file_digests(io_payments.list_payment_files(pagos_dir), cache))
+    assert hashed == ["2025-12.xlsx"]
+    assert digests["2025-12.xlsx"] == real(changed)
+
+def test_file_digests_without_manifest(tmp_path, pagos_dir):
+    files = io_payments.list_payment_files(pagos_dir)
+    assert file_digests(files, tmp_path / "sin_cache") == [[f.name, io_payments._sha256(f)] for f in files]
+
+def test_interrupted_parse_leaves_no_cache_file(tmp_path, pagos_dir, monkeypatch):
+    cache = tmp_path / "cache"
+    cache.mkdir()
+    dst = cache / "abc.v1.parquet"
+
+    def broken(self, path, **kw):
+        # escritura cortada a mitad de archivo
+        Path(path).write_bytes(b"PAR1 a medias")
+        raise OSError("disco lleno")
+    monkeypatch.setattr(pd.DataFrame, "to_parquet", broken)
+    with pytest.raises(OSError):
+        io_payments._parse_to_cache(str(pagos_dir / "2025-11.xlsx"), str(dst))
+    assert list(cache.iterdir()) == []
@@ -0,0 +1,84 @@
+import json
+import sqlite3
+from pathlib import Path
+
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from src import io_redshift
+from src.cobranzas.schema import to_display
+from src.pipeline import extract_minutas
+from src.stages import read_table, write_batches
+
+@pytest.fixture(autouse=True)
+def _isolated_client(monkeypatch):
+    # cliente por defecto propio del test (no toca el del proceso)
+    monkeypatch.setattr(io_redshift, "_CLIENT", None)
+    monkeypatch.setattr(io_redshift, "_CLIENT_ARGS", {})
+    yield
+    if io_redshift._CLIENT is not None:
+        io_redshift._CLIENT.close()
+
+def _sqlite():
+    return sqlite3.connect(":memory:", check_same_thread=False)
+
+def test_configure_keeps_connect_and_pool(tmp_path):
+    io_redshift.configure(connect=_sqlite, pool_size=1)
+    # lo que hace build_dag / _run_project: solo opciones de cache
+    client = io_redshift.configure(cache_dir=str(tmp_path / "queries"), cache_ttl=60)
+    assert client.connect is _sqlite
+    assert client.pool.size == 1
+    assert client.cache is not None
+    assert io_redshift.get_client() is client
+    assert client.query("select 1 as x")["x"].tolist() == [1]
+
+def test_configure_same_options_reuses_client(tmp_path):
+    opts = {"cache_dir": str(tmp_path / "queries"), "cache_ttl": 60}
+    first = io_redshift.configure(connect=_sqlite, **opts)
+    assert io_redshift.configure(**opts) is first
+
+def test_configure_reset_drops_previous_options():
+    io_redshift.configure(connect=_sqlite, pool_size=1)
+    client = io_redshift.configure(reset=True, pool_size=3)
+    assert client.connect is io_redshift._connect
+    assert client.pool.size == 3
+
+# --- extracción en streaming: cursor sqlite -> iter_batches -> write_batches ---
+ROWS = [(f"P-{i:03d}", ["Sialia", "Matera"][i % 2], 300000.0 + i * 0.25 if i % 4 else None) for i in range(11)]
+
+def _ventas_db(tmp_path):
+    path = tmp_path / "ventas.db"
+    with sqlite3.connect(path) as conn:
+        conn.execute("create table ventas (codigo_proforma text, proyecto text, precio_total_venta real)")
+        conn.executemany("insert into ventas values (?, ?, ?)", ROWS)
+    return lambda: sqlite3.connect(path, check_same_thread=False)
+
+def _expected() -> pd.DataFrame:
+    return pd.DataFrame(ROWS, columns=["codigo_proforma", "proyecto", "precio_total_venta"])
+
+@pytest.mark.parametrize("fmt", ["parquet", "arrow", "csv"])
+def test_iter_batches_into_write_batches(tmp_path, fmt):
+    client = io_redshift.RedshiftClient(_ventas_db(tmp_path), pool_size=1)
+    stats = write_batches(client.iter_batches("select * from ventas order by codigo_proforma", 4),
+                          tmp_path / "out", "extract_ventas", fmt, csv=True)
+    assert (stats["batches"], stats["rows"]) == (3, len(ROWS))
+    art = stats["artifact"]
+    assert art["rows"] == len(ROWS) and Path(art["path"]).exists()
+    if fmt == "parquet":
+        assert pq.ParquetFile(art["path"]).metadata.num_row_groups == 3
+    pd.testing.assert_frame_equal(read_table(Path(art["path"])), _expected())
+    # csv: montos crudos de la SQL = soles (sin pasar por céntimos)
+    pd.testing.assert_frame_equal(pd.read_csv(tmp_path / "out" / "extract_ventas.csv"), _expected())
+
+def test_stream_extract_types_in_memory_and_keeps_soles_in_csv(tmp_path):
+    sql = tmp_path / "ventas.sql"
+    sql.write_text("select * from ventas order by codigo_proforma", encoding="utf-8")
+    df = extract_minutas(sql, tmp_path / "out", batch_size=4, connect=_ventas_db(tmp_path), csv=True)
+    meta = json.loads((tmp_path / "out" / "stage_extract_redshift_ventas.json").read_text(encoding="utf-8"))
+    assert (meta["mode"], meta["batches"], meta["rows"]) == ("stream", 3, len(ROWS))
+    cents = pd.array([None if p is None else round(p * 100) for _, _, p in ROWS], dtype="Int64")
+    pd.testing.assert_extension_array_equal(df["precio_total_venta"].array, cents)
+    csv = pd.read_csv(tmp_path / "out" / "extract_ventas.csv")
+    pd.testing.assert_frame_equal(csv, _expected())
+    pd.testing.assert_frame_equal(to_display(df)[csv.columns].astype({"proyecto": object}), csv)
@@ -0,0 +1,45 @@
+import json
+
+import pandas as pd
+import pytest
+
+from src.lookup import LookupIndex
+from src.pipeline import transform_cobranzas
+
+def _inputs(precio_extra: float = 0.0):
+    ventas = pd.DataFrame({
+        "codigo_proforma": ["P-1", "P-2", "P-3"],
+        "documento_cliente": ["06801645", "41112250", "06801645"],
+        "proyecto": ["Sialia", "Matera", "Sialia"],
+        "asesor": ["A1", "A2", "A1"],
+        "precio_total_venta": [1000.5 + precio_extra, 2000.0, 300.0],
+    })
+    pagos = pd.DataFrame({"codigo_proforma": ["P-1", "P-3"], "monto_pagado": [100.25, 300.0],
+                          "fecha_pago": ["2025-01-10", "2025-02-10"]})
+    return ventas, pagos
+
+def _search(index: LookupIndex, **filters) -> dict:
+    return json.loads(index.search(filters))
+
+@pytest.mark.parametrize("fmt", ["csv", "parquet", "arrow"])
+def test_load_report_any_format(tmp_path, fmt):
+    transform_cobranzas(*_inputs(), tmp_path, fmt=fmt)
+    index = LookupIndex.load(tmp_path)
+    assert index.source.endswith(f"cobranzas_report.{fmt}")
+    res = _search(index)
+    assert res["deuda_pendiente"] == 900.25 + 2000.0
+    # orden por deuda desc; montos en soles en la respuesta
+    assert [r["codigo_proforma"] for r in res["rows"]] == ["P-2", "P-1", "P-3"]
+    assert res["rows"][1]["deuda_pendiente"] == 900.25
+    # documento con ceros a la izquierda (en csv se lee como texto)
+    assert _search(index, documento_cliente="06801645")["total"] == 2
+    assert len(index.select({"documento_cliente": "06801645"}, con_deuda=True)) == 1
+
+def test_load_uses_latest_stage_artifact_after_format_switch(tmp_path):
+    transform_cobranzas(*_inputs(), tmp_path, fmt="parquet")
+    # corrida nueva en csv: el parquet viejo sigue en la carpeta
+    transform_cobranzas(*_inputs(precio_extra=1000.0), tmp_path, fmt="csv")
+    assert (tmp_path / "cobranzas_report.parquet").exists()
+    index = LookupIndex.load(tmp_path)
+    assert index.source.endswith("cobranzas_report.csv")
+    assert _search(index, codigo_proforma="P-1")["deuda_pendiente"] == 1900.25
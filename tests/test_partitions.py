@@ -0,0 +1,69 @@
+import json
+import shutil
+import time
+
+import pandas as pd
+import pytest
+
+from src.partitions import run_partitions
+from src.pipeline import merge_projects
+from src.stages import read_table
+from src.synth import make_dataset
+
+PROJECTS = ["Sialia", "Matera", "Urbanzen"]
+
+def _work(task: dict) -> dict:
+    # los primeros terminan últimos: el resultado igual sale en el orden de las tasks
+    time.sleep(0.05 * (3 - task["i"]))
+    if task["i"] == 1:
+        raise ValueError("partición rota")
+    return {"rows": task["i"] * 10}
+
+def test_run_partitions_keeps_order_and_isolates_failures():
+    results = run_partitions(_work, [{"i": i} for i in range(4)], workers=2)
+    assert [r["i"] for r in results] == [0, 1, 2, 3]
+    assert [r["status"] for r in results] == ["ok", "failed", "ok", "ok"]
+    assert [r.get("rows") for r in results] == [0, None, 20, 30]
+    assert results[1]["error"] == "ValueError: partición rota"
+    assert all(r["seconds"] >= 0 for r in results)
+
+def _dataset():
+    ventas, pagos = make_dataset(1400, seed=8)
+    ventas = ventas.assign(proyecto=[PROJECTS[i % 3] for i in range(len(ventas))])
+    return ventas, pagos
+
+def _sorted(df: pd.DataFrame) -> pd.DataFrame:
+    return df.sort_values("codigo_proforma", kind="stable").reset_index(drop=True)
+
+@pytest.fixture
+def by_project(tmp_path, run_pipeline):
+    # mismo dataset: primero en un solo run, después por proyecto en un pool de 2 procesos
+    ventas, pagos = _dataset()
+    run_pipeline(ventas, pagos)
+    shutil.move(tmp_path / "out", tmp_path / "single")
+    st = run_pipeline(ventas, pagos, "--by-project", "--projects", *PROJECTS, "--project-workers", "2")
+    assert st["projects"] == st["transform"] == "ran"
+    return tmp_path / "out", tmp_path / "single"
+
+def test_merged_report_matches_single_run(by_project):
+    merged_dir, single_dir = by_project
+    merged = _sorted(read_table(merged_dir / "cobranzas_report.parquet"))
+    single = _sorted(read_table(single_dir / "cobranzas_report.parquet"))
+    assert set(merged["proyecto"]) == set(PROJECTS)
+    pd.testing.assert_frame_equal(merged, single, check_categorical=False)
+    merged_items = read_table(merged_dir / "cobranzas_items_report.parquet")
+    single_items = read_table(single_dir / "cobranzas_items_report.parquet")
+    key = list(merged_items.columns[:3])
+    pd.testing.assert_frame_equal(merged_items.sort_values(key, kind="stable").reset_index(drop=True),
+                                  single_items.sort_values(key, kind="stable").reset_index(drop=True),
+                                  check_categorical=False)
+
+def test_merge_skips_failed_partitions(by_project):
+    merged_dir, _ = by_project
+    parts = json.loads((merged_dir / "stage_projects.json").read_text(encoding="utf-8"))["partitions"]
+    results = [{**p, "status": "failed" if p["proyecto"] == "Matera" else p["status"]} for p in parts]
+    df = merge_projects(results, merged_dir)
+    assert set(df["proyecto"]) == {"Sialia", "Urbanzen"}
+    assert len(df) == sum(p["rows"] for p in parts if p["proyecto"] != "Matera")
+    metrics = json.loads((merged_dir / "stage_transform_cobranzas.json").read_text(encoding="utf-8"))
+    assert metrics["projects_failed"] == ["Matera"] and metrics["rows_out"] == len(df)
@@ -0,0 +1,29 @@
+import json
+
+import numpy as np
+
+from src import perf
+from src.perf import StagePerf, run_profile, write_run_profile
+
+def test_stage_perf_reports_process_peak_and_growth():
+    p = StagePerf("etapa", rows_in=10)
+    # el pico del proceso puede venir de antes (otros tests): basta con que no baje
+    buf = np.ones(64 * 2**20 // 8)
+    m = p.stop(rows_out=int(buf[:10].sum()))
+    assert "peak_rss_mb" not in m
+    assert m["process_peak_rss_mb"] >= p._rss0
+    assert m["rss_growth_mb"] == round(m["process_peak_rss_mb"] - p._rss0, 1) >= 0
+
+def test_run_profile_and_trend_read_old_history(tmp_path):
+    # corridas viejas guardaron `peak_rss_mb`; la tabla de tendencia las sigue mostrando
+    old = {"started_at": "2026-01-01T00:00:00Z", "wall_seconds": 1.0, "peak_rss_mb": 321.0,
+           "stages": {"transform": {"status": "ran", "wall_s": 1.0}}}
+    (tmp_path / perf.HISTORY_FILE).write_text(json.dumps(old) + "\n", encoding="utf-8")
+    report = {"transform": {"status": "ran", "start_s": 0.0, "seconds": 0.5}}
+    payloads = {"transform": {"perf": {"wall_s": 0.5, "process_peak_rss_mb": 456.0, "rss_growth_mb": 12.0}}}
+    profile = run_profile(report, payloads, "2026-01-02T00:00:00Z", 0.5)
+    assert profile["process_peak_rss_mb"] == 456.0
+    write_run_profile(tmp_path, profile)
+    index = (tmp_path / "INDEX.md").read_text(encoding="utf-8")
+    assert "Peak RSS proceso (MB)" in index
+    assert "| 456.0 |" in index and "| 321.0 |" in index
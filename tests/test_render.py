@@ -0,0 +1,64 @@
+import hashlib
+import json
+
+import pandas as pd
+import pytest
+
+from src.cobranzas.render import MANIFEST, render_reports
+from src.pipeline import transform_cobranzas
+from src.synth import make_dataset
+
+@pytest.fixture(scope="module")
+def report(tmp_path_factory) -> pd.DataFrame:
+    ventas, pagos = make_dataset(300, seed=21)
+    return transform_cobranzas(ventas, pagos, tmp_path_factory.mktemp("transform"))
+
+def _manifest(out) -> dict:
+    return json.loads((out / MANIFEST).read_text(encoding="utf-8"))
+
+def _mtimes(out) -> dict:
+    return {p.relative_to(out).as_posix(): p.stat().st_mtime_ns for p in out.rglob("*.*") if p.name != MANIFEST}
+
+def test_manifest_is_sha_of_each_report(report, tmp_path):
+    # bloques chicos: el hash por bloques es el del archivo entero
+    m = render_reports(report, tmp_path, workers=2, chunk_rows=7)
+    manifest = _manifest(tmp_path)
+    assert m["written"] == m["reports"] == len(manifest) and m["skipped"] == 0
+    for rel, digest in manifest.items():
+        assert hashlib.sha256((tmp_path / rel).read_bytes()).hexdigest() == digest
+    assert not list(tmp_path.rglob("*.tmp"))
+
+def test_unchanged_reports_are_not_rewritten(report, tmp_path):
+    render_reports(report, tmp_path, workers=2)
+    before, manifest = _mtimes(tmp_path), _manifest(tmp_path)
+    m = render_reports(report, tmp_path, workers=2, chunk_rows=5)
+    assert (m["written"], m["skipped"], m["removed"]) == (0, m["reports"], 0)
+    assert _mtimes(tmp_path) == before and _manifest(tmp_path) == manifest
+
+def test_only_changed_partitions_are_rewritten(report, tmp_path):
+    render_reports(report, tmp_path, workers=2)
+    before = _manifest(tmp_path)
+    # un pago nuevo en una venta: cambian su proyecto y su asesor, en md y html
+    changed = report.copy()
+    i = changed.index[changed["deuda_pendiente"] > 100_00][0]
+    changed.loc[i, ["total_pagado", "deuda_pendiente"]] += [100_00, -100_00]
+    m = render_reports(changed, tmp_path, workers=2)
+    after = _manifest(tmp_path)
+    diff = sorted(r for r in after if after[r] != before[r])
+    assert m["written"] == len(diff) == 4
+    assert {r.split("/")[0] for r in diff} == {"asesor", "proyecto"}
+    assert {r.rsplit(".", 1)[1] for r in diff} == {"md", "html"}
+
+def test_missing_file_is_rewritten_and_gone_partitions_removed(report, tmp_path):
+    render_reports(report, tmp_path, workers=2)
+    manifest = _manifest(tmp_path)
+    lost = sorted(manifest)[0]
+    (tmp_path / lost).unlink()
+    assert render_reports(report, tmp_path, workers=2)["written"] == 1
+    assert (tmp_path / lost).exists()
+
+    proyecto = report["proyecto"].astype(str).iloc[0]
+    m = render_reports(report[report["proyecto"].astype(str) != proyecto], tmp_path, workers=2)
+    gone = set(manifest) - set(_manifest(tmp_path))
+    assert m["removed"] == len(gone) >= 2
+    assert all(not (tmp_path / r).exists() for r in gone)
@@ -0,0 +1,80 @@
+import json
+import math
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.pipeline import transform_cobranzas
+from src.risk import DEFAULT_MODEL, RiskModel, load_model, score
+from src.synth import make_dataset
+
+HOY = "2025-12-31"
+
+@pytest.fixture(scope="module")
+def report(tmp_path_factory) -> pd.DataFrame:
+    ventas, pagos = make_dataset(1400, seed=9)
+    return transform_cobranzas(ventas, pagos, tmp_path_factory.mktemp("transform"))
+
+def _score_row(row: dict, model: dict) -> float:
+    # oráculo: la regresión logística fila por fila
+    if row["deuda_pendiente"] <= 0:
+        return 0.0
+    ultimo = next(row[c] for c in ("fecha_ultimo_pago", "fecha_minuta") if not pd.isna(row[c]))
+    feats = {"avance_pct": row["avance_pct"], "n_pagos": row["n_pagos"],
+             "dias_sin_pago": max((pd.Timestamp(HOY) - pd.Timestamp(ultimo)).days, 0)}
+    z = model["intercept"]
+    for name, spec in model["numeric"].items():
+        x = feats[name]
+        if "clip" in spec:
+            x = min(max(x, spec["clip"][0]), spec["clip"][1])
+        if spec.get("transform") == "log1p":
+            x = math.log1p(max(x, 0))
+        z += spec["coef"] * (x - spec["center"]) / spec["scale"]
+    for col, weights in model["categorical"].items():
+        z += weights.get(row[col], 0.0)
+    return 1 / (1 + math.exp(-z))
+
+def test_score_matches_row_by_row(report):
+    scored = score(report, hoy=HOY).set_index("codigo_proforma")
+    for row in report.to_dict("records"):
+        assert scored.loc[row["codigo_proforma"], "risk_score"] == pytest.approx(
+            _score_row(row, DEFAULT_MODEL), abs=5e-5)
+    assert (np.diff(scored["risk_score"].to_numpy()) <= 0).all()
+    assert (scored["model_version"] == "base-1").all()
+
+def test_bands(report):
+    # unas ventas ya canceladas
+    report = report.copy()
+    report.loc[report.index[:5], "deuda_pendiente"] = 0
+    scored = score(report, hoy=HOY)
+    sin_deuda = scored["deuda_pendiente"] <= 0
+    assert (scored.loc[sin_deuda, "risk_band"] == "sin_deuda").all()
+    assert sin_deuda.sum() == 5 and (scored.loc[sin_deuda, "risk_score"] == 0).all()
+    low, high = DEFAULT_MODEL["bands"]
+    p = scored.loc[~sin_deuda, "risk_score"]
+    expected = np.where(p < low, "bajo", np.where(p < high, "medio", "alto"))
+    assert (scored.loc[~sin_deuda, "risk_band"].astype(str).to_numpy() == expected).all()
+
+def test_categorical_weights_and_dtype(report, tmp_path):
+    model = {**DEFAULT_MODEL, "version": "cal-2", "categorical": {"asesor": {report["asesor"].iloc[0]: 1.5}}}
+    path = tmp_path / "model.json"
+    path.write_text(json.dumps(model), encoding="utf-8")
+    m = load_model(path)
+    as_object = score(report.assign(asesor=report["asesor"].astype(object)), m, hoy=HOY)
+    as_category = score(report.assign(asesor=report["asesor"].astype("category")), m, hoy=HOY)
+    pd.testing.assert_series_equal(as_object["risk_score"], as_category["risk_score"])
+    scored = as_object.set_index("codigo_proforma")
+    for row in report.head(50).to_dict("records"):
+        assert scored.loc[row["codigo_proforma"], "risk_score"] == pytest.approx(_score_row(row, model), abs=5e-5)
+
+def test_load_model_reloads_changed_file(tmp_path):
+    path = tmp_path / "model.json"
+    path.write_text(json.dumps({**DEFAULT_MODEL, "version": "v1"}), encoding="utf-8")
+    assert load_model(path) is load_model(path)
+    path.write_text(json.dumps({**DEFAULT_MODEL, "version": "v2"}), encoding="utf-8")
+    os.utime(path, ns=(path.stat().st_atime_ns, path.stat().st_mtime_ns + 10**9))
+    assert load_model(path).version == "v2"
+    with pytest.raises(ValueError, match="no soportadas"):
+        RiskModel.from_dict({"numeric": {"edad": {"coef": 1.0}}})
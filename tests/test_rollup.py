@@ -0,0 +1,95 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.pipeline import _load_cube, rollup_cobranzas, transform_cobranzas
+from src.rollup import CUBE_DIMS, MEASURES, build_cube, grouping_name, grouping_sets
+from src.synth import make_dataset
+
+@pytest.fixture(scope="module")
+def report(tmp_path_factory) -> pd.DataFrame:
+    ventas, pagos = make_dataset(600, seed=11)
+    return transform_cobranzas(ventas, pagos, tmp_path_factory.mktemp("transform"))
+
+@pytest.fixture(scope="module")
+def cube(report):
+    return build_cube(report, k=10)
+
+def _flat(report: pd.DataFrame) -> pd.DataFrame:
+    # oráculo: el reporte plano (str, céntimos int), una fila por venta
+    deuda = report["deuda_pendiente"].astype("int64")
+    out = pd.DataFrame({d: report[d].astype(object) for d in CUBE_DIMS if d != "mes"})
+    out["mes"] = pd.to_datetime(report["fecha_minuta"]).dt.strftime("%Y-%m")
+    out["ventas"] = 1
+    out["con_deuda"] = (deuda > 0).astype("int64")
+    out["deuda_pendiente"] = deuda
+    for c in ("total_pagado", "precio_total_venta"):
+        out[c] = report[c].astype("int64")
+    out["codigo_proforma"] = report["codigo_proforma"].to_numpy()
+    return out
+
+def _group_frame(frame: pd.DataFrame, dims) -> pd.DataFrame:
+    frame = frame[[*dims, *MEASURES]].copy()
+    for d in dims:
+        frame[d] = frame[d].astype(object).astype(str)
+    return frame.sort_values(list(dims)).reset_index(drop=True) if dims else frame.reset_index(drop=True)
+
+@pytest.mark.parametrize("dims", grouping_sets(), ids=grouping_name)
+def test_totals_per_grouping_set(report, cube, dims):
+    flat = _flat(report)
+    if dims:
+        expected = flat.groupby(list(dims), dropna=False)[MEASURES].sum().reset_index()
+    else:
+        expected = flat[MEASURES].sum().to_frame().T
+    got = cube.aggs[cube.aggs["agrupacion"] == grouping_name(dims)]
+    got = got.assign(**{m: got[m].astype("int64") for m in MEASURES})
+    pd.testing.assert_frame_equal(_group_frame(got, dims), _group_frame(expected, dims), check_dtype=False)
+
+def test_total_lookup(report, cube):
+    flat = _flat(report)
+    assert cube.total()["ventas"] == len(report)
+    assert cube.total()["deuda_pendiente"] == flat["deuda_pendiente"].sum()
+    proyecto, mes = flat.iloc[0][["proyecto", "mes"]]
+    sub = flat[(flat["proyecto"] == proyecto) & (flat["mes"] == mes)]
+    got = cube.total(mes=mes, proyecto=proyecto)
+    assert [got[m] for m in MEASURES] == [sub[m].sum() for m in MEASURES]
+    assert got["avance_pct"] == pytest.approx(sub["total_pagado"].sum() / sub["precio_total_venta"].sum())
+    # grupo inexistente = ceros; dimensión fuera del cubo = error
+    assert cube.total(proyecto="No existe")["ventas"] == 0
+    with pytest.raises(ValueError, match="fuera del cubo"):
+        cube.total(cliente="Ana")
+
+@pytest.mark.parametrize("dims", [(), ("proyecto",), ("asesor", "prioridad"), tuple(CUBE_DIMS)],
+                         ids=grouping_name)
+@pytest.mark.parametrize("k", [1, 3, 10])
+def test_top_k_is_largest_debt_per_group(report, cube, dims, k):
+    flat = _flat(report)
+    # k mayores deudas del grupo, desempate por orden en el reporte
+    ranked = flat.sort_values("deuda_pendiente", ascending=False, kind="stable")
+    groups = ranked.groupby(list(dims), dropna=False, sort=False) if dims else [((), ranked)]
+    for key, rows in list(groups)[:25]:
+        key = key if isinstance(key, tuple) else (key,)
+        filters = {d: (None if pd.isna(v) else v) for d, v in zip(dims, key)}
+        top = cube.top(k, **filters)
+        assert top["codigo_proforma"].tolist() == rows["codigo_proforma"].head(k).tolist()
+        assert top["deuda_pendiente"].astype("int64").tolist() == rows["deuda_pendiente"].head(k).tolist()
+
+def test_top_k_bounds(report):
+    cube = build_cube(report, k=3)
+    assert (cube.top_rows["rank"] <= 3).all()
+    with pytest.raises(ValueError, match="top 3"):
+        cube.top(4)
+    top = cube.slice("proyecto")
+    assert np.all(np.diff(top["deuda_pendiente"].astype("int64").to_numpy()) <= 0)
+    assert "asesor" not in top.columns
+
+def test_cube_round_trips_through_artifacts(report, tmp_path):
+    cube = rollup_cobranzas(report, tmp_path, k=5)
+    loaded = _load_cube(json.loads((tmp_path / "stage_rollup_cobranzas.json").read_text(encoding="utf-8")))
+    assert loaded.k == 5
+    proyecto = str(report["proyecto"].iloc[0])
+    pd.testing.assert_series_equal(loaded.total(proyecto=proyecto), cube.total(proyecto=proyecto))
+    pd.testing.assert_frame_equal(loaded.top(5, proyecto=proyecto), cube.top(5, proyecto=proyecto),
+                                  check_categorical=False)
@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+
+from src import validate
+from src.cobranzas.schema import epoch_days, parse_dates
+
+def test_parse_dates_text():
+    s = pd.Series(["2025-01-02", "", " x", None, "2025-01-02T10:00", "02/03/2025"], dtype=object)
+    d, invalid = parse_dates(s)
+    assert d.dtype == "datetime64[D]"
+    assert [str(x) for x in d] == ["2025-01-02", "NaT", "NaT", "NaT", "2025-01-02", "2025-02-03"]
+    # vacíos y nulos faltan; solo el texto que no es fecha es inválido
+    assert invalid.tolist() == [False, False, True, False, False, False]
+
+def test_parse_dates_datetime_column():
+    s = pd.Series(pd.to_datetime(["2025-01-02 13:45", None]))
+    d, invalid = parse_dates(s)
+    assert [str(x) for x in d] == ["2025-01-02", "NaT"]
+    assert not invalid.any()
+
+def test_parse_dates_all_null_text_column():
+    d, invalid = parse_dates(pd.Series([None, None], dtype=object))
+    assert np.isnat(d).all() and not invalid.any()
+    assert len(parse_dates(pd.Series([], dtype=object))[0]) == 0
+
+def test_epoch_days():
+    s = pd.Series(["1970-01-11", None, "nope"], dtype=object)
+    assert np.array_equal(epoch_days(s), [10.0, np.nan, np.nan], equal_nan=True)
+
+def test_validate_all_null_fecha_pago():
+    ventas = pd.DataFrame({"codigo_proforma": ["P-1"]})
+    pagos = pd.DataFrame({"codigo_proforma": ["P-1"], "monto_pagado": [10.0],
+                          "fecha_pago": pd.Series([None], dtype=object)})
+    res = validate.validate_frames(ventas, pagos, hoy="2026-01-01")
+    assert res["fecha_pago_invalida"]["rows"] == 0
+    assert res["fecha_pago_futura"]["rows"] == 0
@@ -0,0 +1,113 @@
+import json
+
+import pandas as pd
+import pytest
+
+from src.changes import detect_changes
+from src.cobranzas.schema import apply_schema
+from src.pipeline import diff_cobranzas, snapshot_cobranzas, transform_cobranzas
+from src.snapshots import SnapshotStore
+from src.synth import make_dataset
+
+def _report() -> pd.DataFrame:
+    # reporte en soles float, como los snapshots escritos antes del esquema en céntimos
+    return pd.DataFrame({
+        "codigo_proforma": ["2024-0001", "2024-0002", "2025-0003"],
+        "proyecto": ["Sialia", "Matera", "Sialia"],
+        "precio_total_venta": [350000.0, 420000.5, 289999.99],
+        "total_pagado": [35000.0, 0.0, 12345.67],
+        "n_pagos": [2, 0, 1],
+        "deuda_pendiente": [315000.0, 420000.5, 277654.32],
+        "prioridad": ["alta", "alta", "alta"],
+    })
+
+@pytest.fixture
+def mixed_store(tmp_path, monkeypatch) -> SnapshotStore:
+    # partición vieja en soles float (sin normalizar al escribir) + partición nueva en céntimos Int64
+    store = SnapshotStore(tmp_path / "snapshots", "cobranzas")
+    with monkeypatch.context() as m:
+        m.setattr(SnapshotStore, "_money_as_cents", staticmethod(lambda df: df))
+        store.write(_report(), "2025-12-30")
+    assert pd.read_parquet(store._part_path("2025-12-30"))["deuda_pendiente"].dtype == "float64"
+    store.write(apply_schema(_report()), "2025-12-31")
+    assert isinstance(pd.read_parquet(store._part_path("2025-12-31"))["deuda_pendiente"].dtype, pd.Int64Dtype)
+    return store
+
+@pytest.mark.parametrize("fecha", ["2025-12-30", "2025-12-31"])
+def test_as_of_reads_float_and_int64_partitions_as_cents(mixed_store, fecha):
+    snap = mixed_store.as_of(fecha).sort_values("codigo_proforma").reset_index(drop=True)
+    assert isinstance(snap["deuda_pendiente"].dtype, pd.Int64Dtype)
+    assert snap["deuda_pendiente"].tolist() == [31500000, 42000050, 27765432]
+    assert snap["total_pagado"].tolist() == [3500000, 0, 1234567]
+
+def test_detect_changes_on_mixed_store_finds_nothing(mixed_store):
+    today = apply_schema(_report())
+    for fecha in ("2025-12-30", "2025-12-31"):
+        changes = detect_changes(today, mixed_store.as_of(fecha))
+        assert changes.empty, changes
+
+def test_history_reads_float_partitions_as_cents(mixed_store):
+    h = mixed_store.history("2024-0002", columns=["deuda_pendiente"])
+    assert h["deuda_pendiente"].tolist() == [42000050, 42000050]
+
+def test_write_stores_soles_input_as_cents(tmp_path):
+    store = SnapshotStore(tmp_path / "snapshots", "cobranzas")
+    store.write(_report(), "2025-12-30")
+    part = pd.read_parquet(store._part_path("2025-12-30"))
+    assert isinstance(part["deuda_pendiente"].dtype, pd.Int64Dtype)
+    assert part["deuda_pendiente"].tolist() == [31500000, 42000050, 27765432]
+
+@pytest.fixture(scope="module")
+def days(tmp_path_factory) -> dict[str, pd.DataFrame]:
+    # tres cortes de un mismo reporte: ventas nuevas, pagos, bajas y un cambio de prioridad
+    ventas, pagos = make_dataset(1400, seed=6)
+    report = transform_cobranzas(ventas, pagos, tmp_path_factory.mktemp("transform"))
+    assert len(report) == 200
+    d1 = report.iloc[:190].reset_index(drop=True)
+    d2 = report.iloc[5:].copy()
+    pago = d2.index[(d2["deuda_pendiente"] > 1000_00) & (d2.index >= 10)][:5]
+    d2.loc[pago, ["total_pagado", "deuda_pendiente", "n_pagos"]] += [1000_00, -1000_00, 1]
+    d3 = d2.iloc[3:].copy()
+    d3.loc[d3.index[-1], "prioridad"] = "baja" if d3["prioridad"].iloc[-1] != "baja" else "alta"
+    return {"2025-12-29": d1, "2025-12-30": d2.reset_index(drop=True), "2025-12-31": d3.reset_index(drop=True)}
+
+def _changes_key(changes: pd.DataFrame) -> pd.DataFrame:
+    cols = ["codigo_proforma", "tipo_cambio", "deuda_prev", "deuda_hoy", "pagado_prev", "pagado_hoy", "prioridad_prev"]
+    return changes[cols].astype(object).sort_values("codigo_proforma").reset_index(drop=True)
+
+@pytest.mark.parametrize("checkpoint_every", [1, 2, 30])
+def test_as_of_rebuilds_each_day_from_deltas(tmp_path, days, checkpoint_every):
+    store = SnapshotStore(tmp_path / "snapshots", "cobranzas", checkpoint_every=checkpoint_every)
+    for fecha, df in days.items():
+        store.write(df, fecha)
+    today = days["2025-12-31"]
+    for fecha, df in days.items():
+        snap = store.as_of(fecha)
+        assert sorted(snap["codigo_proforma"]) == sorted(df["codigo_proforma"])
+        # el diff contra el estado reconstruido es el mismo que contra el reporte de ese día
+        pd.testing.assert_frame_equal(_changes_key(detect_changes(today, snap)),
+                                      _changes_key(detect_changes(today, df)))
+
+def test_diff_cobranzas_reads_previous_snapshot_from_store(tmp_path, days):
+    (d1, r1), (d2, r2), (d3, r3) = days.items()
+    assert diff_cobranzas(r1, tmp_path, fecha=d1) is None
+    assert json.loads((tmp_path / "stage_diff_cobranzas.json").read_text(encoding="utf-8"))["previous_snapshot"] is None
+    for fecha, df in days.items():
+        snapshot_cobranzas(df, tmp_path, fecha=fecha)
+    parts = SnapshotStore(tmp_path / "snapshots", "cobranzas")._manifest()["partitions"]
+    assert parts[d2]["changed"] < len(r2) and parts[d3]["deleted"] == 3
+
+    changes = diff_cobranzas(r3, tmp_path, fecha=d3)
+    assert changes.attrs["previous_snapshot"] == d2
+    tipos = changes.set_index("codigo_proforma")["tipo_cambio"]
+    assert (tipos == "proforma_desaparecida").sum() == 3
+    assert tipos[r3["codigo_proforma"].iloc[-1]] == "cambio_prioridad"
+    pd.testing.assert_frame_equal(_changes_key(changes), _changes_key(detect_changes(r3, r2)))
+    # re-correr el día de un snapshot compara contra el anterior, no contra sí mismo
+    changes = diff_cobranzas(r2, tmp_path, fecha=d2)
+    assert changes.attrs["previous_snapshot"] == d1
+    assert (changes["tipo_cambio"] == "nuevo_pago").sum() == 5
+    assert (changes["tipo_cambio"] == "nueva_venta").sum() == 10
+    assert (changes["tipo_cambio"] == "proforma_desaparecida").sum() == 5
+    metrics = json.loads((tmp_path / "stage_diff_cobranzas.json").read_text(encoding="utf-8"))
+    assert metrics["previous_snapshot"] == d1 and metrics["proformas_con_cambios"] == len(changes)
@@ -0,0 +1,167 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.cobranzas.schema import to_display
+from src.pipeline import _build_items, _safe_div, _ventas_schema, transform_cobranzas
+
+# --- oráculo: el builder fila a fila anterior a la versión columnar ---
+def _safe_num(x):
+    try:
+        return float(x) if x is not None else 0.0
+    except Exception:
+        return 0.0
+
+def _build_items_loop(df: pd.DataFrame) -> pd.DataFrame:
+    items = []
+    for _, r in df.iterrows():
+        pf = r.get("codigo_proforma")
+        cliente = r.get("cliente", "")
+        proyecto = r.get("proyecto", "")
+        asesor = r.get("asesor", "")
+        items.append({"codigo_proforma": pf, "tipo_item": "departamento", "codigo_item": r.get("codigo_unidad", ""),
+                      "precio_item": _safe_num(r.get("precio_venta_depa_soles", 0)),
+                      "cliente": cliente, "proyecto": proyecto, "asesor": asesor})
+        if pd.notna(r.get("codigo_estacionamiento_proforma")) and str(r.get("codigo_estacionamiento_proforma")).strip() != "":
+            items.append({"codigo_proforma": pf, "tipo_item": "estacionamiento",
+                          "codigo_item": str(r.get("codigo_estacionamiento_proforma")),
+                          "precio_item": _safe_num(r.get("precio_estacionamiento_proforma", 0)),
+                          "cliente": cliente, "proyecto": proyecto, "asesor": asesor})
+        if pd.notna(r.get("codigo_deposito_proforma")) and str(r.get("codigo_deposito_proforma")).strip() != "":
+            items.append({"codigo_proforma": pf, "tipo_item": "deposito",
+                          "codigo_item": str(r.get("codigo_deposito_proforma")),
+                          "precio_item": _safe_num(r.get("precio_deposito_proforma", 0)),
+                          "cliente": cliente, "proyecto": proyecto, "asesor": asesor})
+    return pd.DataFrame(items)
+
+def _safe_div_apply(num: pd.Series, den: pd.Series) -> pd.Series:
+    df = pd.DataFrame({"num": num, "den": den})
+    return df.apply(lambda r: (r["num"] / r["den"]) if r["den"] else 0.0, axis=1)
+
+# --- entradas aleatorias ---
+PRECIOS = [np.nan, None, "abc", "", " ", "12.5", "0", 0, 0.0, 1, 250.75, -3, "1e3", True]
+CODIGOS = [np.nan, None, "", "  ", "E-01", "D-7", 17, 3.0, "0"]
+ITEM_COLS = ["codigo_unidad", "precio_venta_depa_soles", "codigo_estacionamiento_proforma",
+             "precio_estacionamiento_proforma", "codigo_deposito_proforma", "precio_deposito_proforma",
+             "cliente", "proyecto", "asesor"]
+
+def _ventas(seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(1, 60))
+    pick = lambda vals: [vals[i] for i in rng.integers(0, len(vals), n)]
+    df = pd.DataFrame({
+        "codigo_proforma": [f"P-{i:04d}" for i in rng.permutation(n)],
+        "codigo_unidad": pick(["U-101", "U-202", None, "", np.nan]),
+        "precio_venta_depa_soles": pick(PRECIOS) if seed % 3 else rng.uniform(0, 5e5, n).round(2),
+        "codigo_estacionamiento_proforma": pick(CODIGOS),
+        "precio_estacionamiento_proforma": pick(PRECIOS),
+        "codigo_deposito_proforma": pick(CODIGOS),
+        "precio_deposito_proforma": pick(PRECIOS) if seed % 2 else rng.uniform(0, 9e3, n).round(2),
+        "cliente": pick(["Ana", "Luis", None, np.nan, ""]),
+        "proyecto": pick(["Sialia", "Matera"]),
+        "asesor": pick(["A1", "A2", None]),
+    })
+    # columnas de items que faltan en algunos extracts
+    drop = [c for c in ITEM_COLS if rng.random() < 0.2]
+    return df.drop(columns=drop)
+
+def _csv(df: pd.DataFrame) -> bytes:
+    return df.to_csv(index=False).encode("utf-8")
+
+@pytest.mark.parametrize("seed", range(40))
+def test_build_items_matches_loop_oracle(seed):
+    # el oráculo trabaja en soles sobre el extract crudo; _build_items en céntimos sobre el tipado
+    ventas = _ventas(seed)
+    assert _csv(to_display(_build_items(_ventas_schema(ventas)))) == _csv(_build_items_loop(ventas))
+
+def test_build_items_without_item_columns():
+    ventas = pd.DataFrame({"codigo_proforma": ["P-1", "P-2"]})
+    assert _csv(to_display(_build_items(_ventas_schema(ventas)))) == _csv(_build_items_loop(ventas))
+
+@pytest.mark.parametrize("seed", range(10))
+def test_safe_div_matches_apply(seed):
+    rng = np.random.default_rng(seed)
+    n = 50
+    num = pd.Series(rng.choice([0.0, 1.5, 100.0, np.nan, -2.0], n))
+    den = pd.Series(rng.choice([0.0, 3.0, 250.0, np.nan, -4.0], n))
+    assert _csv(_safe_div(num, den).to_frame("x")) == _csv(_safe_div_apply(num, den).to_frame("x"))
+
+# --- transform completo: el transform fila a fila anterior a los céntimos, mismo input ---
+def _transform_loop(ventas: pd.DataFrame, pagos: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    item = (pagos["tipo_item"].fillna("").astype(str).str.strip() != "") & \
+           (pagos["codigo_item"].fillna("").astype(str).str.strip() != "")
+    pagos_pf = (pagos.loc[~item].assign(fecha_pago=lambda p: pd.to_datetime(p["fecha_pago"], errors="coerce"))
+                .groupby(["codigo_proforma"], as_index=False)
+                .agg(total_pagado=("monto_pagado", "sum"), n_pagos=("monto_pagado", "count"),
+                     fecha_ultimo_pago=("fecha_pago", "max")))
+    df = ventas.merge(pagos_pf, on="codigo_proforma", how="left")
+    df["total_pagado"] = df["total_pagado"].fillna(0.0)
+    df["n_pagos"] = df["n_pagos"].fillna(0).astype(int)
+    df["precio_total_venta"] = pd.to_numeric(df.get("precio_total_venta"), errors="coerce").fillna(0.0)
+    df["deuda_pendiente"] = (df["precio_total_venta"] - df["total_pagado"]).clip(lower=0.0)
+    df["avance_pct"] = _safe_div_apply(df["total_pagado"], df["precio_total_venta"])
+    df["prioridad"] = pd.cut(df["deuda_pendiente"], bins=[-0.1, 0, 5000, 20000, 1e18],
+                             labels=["sin_deuda", "baja", "media", "alta"])
+
+    p2 = pagos.loc[item].assign(tipo_item=lambda p: p["tipo_item"].astype(str).str.strip().str.lower(),
+                                codigo_item=lambda p: p["codigo_item"].astype(str).str.strip(),
+                                fecha_pago=lambda p: pd.to_datetime(p["fecha_pago"], errors="coerce"))
+    pagos_item = (p2.groupby(["codigo_proforma", "tipo_item", "codigo_item"], as_index=False)
+                  .agg(total_pagado=("monto_pagado", "sum"), n_pagos=("monto_pagado", "count"),
+                       fecha_ultimo_pago=("fecha_pago", "max")))
+    items = _build_items_loop(df).merge(pagos_item, on=["codigo_proforma", "tipo_item", "codigo_item"], how="left")
+    items["total_pagado"] = items["total_pagado"].fillna(0.0)
+    items["n_pagos"] = items["n_pagos"].fillna(0).astype(int)
+    items["deuda_item"] = (items["precio_item"] - items["total_pagado"]).clip(lower=0.0)
+    items["avance_item_pct"] = _safe_div_apply(items["total_pagado"], items["precio_item"])
+    return df, items
+
+def _pagos(ventas: pd.DataFrame, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    n = 3 * len(ventas)
+    pf = ventas["codigo_proforma"].to_numpy()[rng.integers(0, len(ventas), n)]
+    tipo = rng.choice(["", "departamento", "Estacionamiento ", "deposito"], n)
+    return pd.DataFrame({
+        "codigo_proforma": pf,
+        "monto_pagado": rng.uniform(0, 2e4, n).round(2),
+        "fecha_pago": pd.Timestamp("2025-01-01") + pd.to_timedelta(rng.integers(0, 365, n), unit="D"),
+        "tipo_item": tipo,
+        "codigo_item": np.where(tipo == "", "", rng.choice(["U-101", "E-01", "D-7", "17"], n)),
+    })
+
+def _read_csv(data: bytes) -> pd.DataFrame:
+    import io
+    return pd.read_csv(io.BytesIO(data))
+
+def _ventas_sql(seed: int) -> pd.DataFrame:
+    # como llega de Redshift: códigos varchar (o nulos) y precios con nulos / texto
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(1, 60))
+    pick = lambda vals: pd.Series([vals[i] for i in rng.integers(0, len(vals), n)], dtype=object)
+    return pd.DataFrame({
+        "codigo_proforma": [f"P-{i:04d}" for i in rng.permutation(n)],
+        "codigo_unidad": pick(["U-101", "U-202", None]),
+        "precio_venta_depa_soles": pick(PRECIOS),
+        "codigo_estacionamiento_proforma": pick([None, "", "E-01", "17"]),
+        "precio_estacionamiento_proforma": pick(PRECIOS),
+        "codigo_deposito_proforma": pick([None, "  ", "D-7"]),
+        "precio_deposito_proforma": pick(PRECIOS),
+        "precio_total_venta": pick([np.nan, None, "abc", 0.0, 150000.0, "98000.5"]),
+        "cliente": pick(["Ana", "Luis", None]),
+        "proyecto": pick(["Sialia", "Matera"]),
+        "asesor": pick(["A1", "A2", None]),
+    })
+
+@pytest.mark.parametrize("seed", range(12))
+def test_transform_matches_loop_baseline(tmp_path, seed):
+    ventas = _ventas_sql(seed)
+    pagos = _pagos(ventas, seed)
+    transform_cobranzas(ventas, pagos, tmp_path, fmt="csv", allocation_policy="ninguna")
+    report, items = _transform_loop(ventas, pagos)
+    # reporte: columnas calculadas (las de ventas se pasan ya tipadas); items: completo
+    # los montos salen de céntimos exactos (tolerancia solo en los ratios)
+    computed = ["codigo_proforma", "total_pagado", "n_pagos", "fecha_ultimo_pago", "precio_total_venta",
+                "deuda_pendiente", "avance_pct", "prioridad"]
+    for name, expected in (("cobranzas_report", report[computed]), ("cobranzas_items_report", items)):
+        got = pd.read_csv(tmp_path / f"{name}.csv")[list(expected.columns)]
+        pd.testing.assert_frame_equal(got, _read_csv(_csv(expected)), check_dtype=False, rtol=1e-9)
@@ -0,0 +1,42 @@
+import json
+
+import pandas as pd
+import pytest
+
+from src.synth import make_dataset
+
+PROJECTS = ["Sialia", "Matera"]
+
+def _dataset():
+    ventas, pagos = make_dataset(400, seed=5)
+    ventas = ventas[ventas["proyecto"].isin(PROJECTS)].reset_index(drop=True)
+    return ventas, pagos[pagos["codigo_proforma"].isin(ventas["codigo_proforma"])]
+
+def _json(path) -> dict:
+    return json.loads(path.read_text(encoding="utf-8"))
+
+def _by_project(run_pipeline, ventas, pagos):
+    return run_pipeline(ventas, pagos, "--by-project", "--projects", *PROJECTS, "--project-workers", "1")
+
+def test_each_project_validates_its_extracts(tmp_path, run_pipeline):
+    st = _by_project(run_pipeline, *_dataset())
+    assert st["projects"] == st["validate"] == st["transform"] == "ran"
+    for slug in ("sialia", "matera"):
+        assert _json(tmp_path / "out" / "projects" / slug / "stage_validate.json")["failed"] == []
+    assert _json(tmp_path / "out" / "stage_validate.json")["failed"] == []
+
+def test_duplicate_in_one_project_stops_before_its_join(tmp_path, run_pipeline):
+    ventas, pagos = _dataset()
+    dup = ventas[ventas["proyecto"] == "Sialia"].head(1)
+    with pytest.raises(ValueError, match="ventas_codigo_duplicado"):
+        _by_project(run_pipeline, pd.concat([ventas, dup], ignore_index=True), pagos)
+    out = tmp_path / "out"
+    parts = {p["proyecto"]: p for p in _json(out / "stage_projects.json")["partitions"]}
+    assert parts["Sialia"]["status"] == "failed" and "ventas_codigo_duplicado" in parts["Sialia"]["error"]
+    assert parts["Matera"]["status"] == "ok"
+    # el transform del proyecto nunca corrió y el consolidado tampoco
+    assert _json(out / "projects" / "sialia" / "stage_validate.json")["failed"] == ["ventas_codigo_duplicado"]
+    assert not (out / "projects" / "sialia" / "stage_transform_cobranzas.json").exists()
+    stages = _json(out / "stage_dag.json")["stages"]
+    assert stages["validate"]["status"] == "failed"
+    assert stages.get("transform", {}).get("status") != "ran"